@@ -0,0 +1,67 @@
+"""
+Columnar read path for user_activities (admin analytics).
+
+Analytics needs a few columns of many rows, so rows are read by projection (no ORM
+objects) in chunks of ANALYTICS_CHUNK_ROWS and turned into NumPy structured arrays:
+
+    ts         datetime64[s]
+    type       int8    index into ACTIVITY_TYPES (OTHER_TYPE for anything else)
+    user       int64   user id; anonymous rows get a negative key derived from the name
+    file_hash  S64     resume_blobs.sha256 for uploads, b"" otherwise
+
+Consumers aggregate chunk by chunk with vectorized NumPy (visitor_sketches.py builds the
+daily visitor bitmaps this way), so memory stays bounded by the chunk size whatever the
+window.
+"""
+import os
+import zlib
+
+import numpy as np
+from sqlalchemy import String, select, type_coerce
+
+from partitions import segments, activity_streams
+
+SCAN_CHUNK_ROWS = int(os.getenv("ANALYTICS_CHUNK_ROWS", "50000"))
+
+ACTIVITY_TYPES = ("visit", "login", "resume_upload", "ats_resume_upload", "interview_prep_upload",
+                  "ats_check", "interview_attempt")
+UPLOAD_TYPES = ("resume_upload", "ats_resume_upload", "interview_prep_upload")
+OTHER_TYPE = len(ACTIVITY_TYPES)
+_TYPE_CODES = {name: code for code, name in enumerate(ACTIVITY_TYPES)}
+
+ACTIVITY_DTYPE = np.dtype([("ts", "datetime64[s]"), ("type", "i1"), ("user", "i8"), ("file_hash", "S64")])
+
+
+def user_key(user_id, user_name):
+    # Anonymous visitors are only distinguishable by name
+    return user_id if user_id is not None else -1 - zlib.crc32((user_name or "").encode())
+
+def to_columns(rows):
+    """(timestamp, activity_type, user_id, user_name, file_hash) rows -> ACTIVITY_DTYPE array."""
+    cols = np.empty(len(rows), ACTIVITY_DTYPE)
+    if not rows:
+        return cols
+    ts, types, user_ids, user_names, hashes = zip(*rows)
+    cols["ts"] = np.array(ts, dtype="datetime64[s]")
+    cols["type"] = np.fromiter((_TYPE_CODES.get(t, OTHER_TYPE) for t in types), np.int8, len(rows))
+    cols["user"] = np.fromiter(map(user_key, user_ids, user_names), np.int64, len(rows))
+    cols["file_hash"] = [h or "" for h in hashes]
+    return cols
+
+def scan(db, since=None, until=None, types=None, chunk_rows=SCAN_CHUNK_ROWS):
+    """Yield ACTIVITY_DTYPE chunks for activities in [since, until), optionally limited to some types."""
+    # The hot table (or the Postgres parent), then any archived months in range (partitions.py)
+    for table in segments(db, "user_activities", since, until, activity_streams(types)):
+        # Timestamps come back raw (ISO text on SQLite) and are parsed by NumPy in one call
+        stmt = select(type_coerce(table.c.timestamp, String), table.c.activity_type, table.c.user_id,
+                      table.c.user_name, table.c.file_hash)
+        if since is not None:
+            stmt = stmt.where(table.c.timestamp >= since)
+        if until is not None:
+            stmt = stmt.where(table.c.timestamp < until)
+        if types is not None:
+            stmt = stmt.where(table.c.activity_type.in_(types))
+        # Core execution on the session's connection: plain tuples, no ORM row processing
+        result = db.connection().execute(stmt.execution_options(yield_per=chunk_rows))
+        for rows in result.partitions():
+            yield to_columns(rows)
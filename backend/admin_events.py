@@ -0,0 +1,254 @@
+"""
+Admin event stream: GET /admin/events (Server-Sent Events).
+
+Write paths don't publish by hand: ORM session hooks collect what a transaction wrote
+(new system logs, activities and messages, user sign-ups / deletes / restores, job CRUD)
+and publish it after the commit; Core job ingest/expiry publishes through job_ingest's
+listener hook. Each event names the /admin/snapshot sections it touches, so the
+dashboard can fetch just those instead of polling.
+
+Fan-out:
+  EventBus      in-process pub/sub; each SSE client gets a bounded queue
+                (EVENTS_CLIENT_BUFFER). A client that falls behind has its backlog
+                dropped and gets one "resync" event instead, which tells it to refetch
+                the snapshot.
+  broker        optional cross-worker bridge selected by EVENTS_BACKEND:
+                  redis://...  Redis pub/sub (needs the optional `redis` package)
+                  memory://    in-process stand-in with the same interface
+                Every worker publishes to the broker and delivers what the others sent.
+"""
+import asyncio
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+
+from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from admin_snapshot import TABLE_SECTIONS
+from job_ingest import add_job_listener
+from metrics import Counter, Gauge
+
+EVENTS_BACKEND = os.getenv("EVENTS_BACKEND")
+CLIENT_BUFFER = int(os.getenv("EVENTS_CLIENT_BUFFER", "256"))
+KEEPALIVE_SECONDS = 15
+CHANNEL = "launchpad:admin_events"
+
+EVENTS_PUBLISHED = Counter("admin_events_published_total", "Admin events published, by type.", ("type",))
+EVENTS_DROPPED = Counter("admin_events_dropped_total", "Events dropped from slow SSE clients' buffers.")
+EVENT_CLIENTS = Gauge("admin_event_clients", "Connected /admin/events clients.")
+
+
+# --- BROKERS (cross-worker bridge) ---
+
+class MemoryBroker:
+    """Stand-in for a shared channel: every bus attached to it receives the messages of the others."""
+
+    def __init__(self):
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def publish(self, message):
+        with self._lock:
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            callback(message)
+
+    def subscribe(self, callback):
+        with self._lock:
+            self._callbacks.append(callback)
+
+
+class RedisBroker:
+    def __init__(self, url):
+        import redis # optional dependency, only needed when EVENTS_BACKEND=redis://...
+        self._redis = redis.Redis.from_url(url)
+
+    def publish(self, message):
+        self._redis.publish(CHANNEL, message)
+
+    def subscribe(self, callback):
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{CHANNEL: lambda msg: callback(msg["data"])})
+        pubsub.run_in_thread(sleep_time=0.5, daemon=True)
+
+
+def _make_broker(url):
+    if not url:
+        return None
+    if url.startswith("memory://"):
+        return MemoryBroker()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBroker(url)
+    raise ValueError(f"Unsupported EVENTS_BACKEND: {url}")
+
+
+# --- BUS ---
+
+class Subscription:
+    def __init__(self, loop, maxsize):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def offer(self, evt):
+        # Runs on the subscriber's loop
+        try:
+            self.queue.put_nowait(evt)
+        except asyncio.QueueFull:
+            dropped = self.queue.qsize()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            EVENTS_DROPPED.inc(amount=dropped)
+            self.queue.put_nowait({"type": "resync", "data": {"dropped": dropped}, "sections": []})
+
+
+class EventBus:
+    def __init__(self, broker=None, buffer=CLIENT_BUFFER):
+        self.worker = uuid.uuid4().hex
+        self.buffer = buffer
+        self.broker = broker
+        self._subs = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        if broker is not None:
+            broker.subscribe(self._from_broker)
+
+    def subscribe(self) -> Subscription:
+        sub = Subscription(asyncio.get_running_loop(), self.buffer)
+        with self._lock:
+            self._subs.add(sub)
+        EVENT_CLIENTS.inc()
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            if sub not in self._subs:
+                return
+            self._subs.discard(sub)
+        EVENT_CLIENTS.dec()
+
+    def publish(self, type, data=None, sections=()):
+        """Thread-safe; callable from sync route handlers, session hooks and background jobs."""
+        evt = {"type": type, "data": data or {}, "sections": list(sections), "ts": time.time(), "worker": self.worker}
+        EVENTS_PUBLISHED.inc((type,))
+        self._deliver(evt)
+        if self.broker is not None:
+            try:
+                self.broker.publish(json.dumps(evt, default=str))
+            except Exception as e:
+                print(f"Event broker publish failed: {e}")
+
+    def _from_broker(self, message):
+        evt = json.loads(message)
+        if evt.get("worker") != self.worker: # our own events were delivered locally already
+            self._deliver(evt)
+
+    def _deliver(self, evt):
+        evt = dict(evt, id=next(self._ids))
+        with self._lock:
+            subs = list(self._subs)
+        for sub in subs:
+            try:
+                sub.loop.call_soon_threadsafe(sub.offer, evt)
+            except RuntimeError:
+                self.unsubscribe(sub) # loop closed
+
+
+bus = EventBus(_make_broker(EVENTS_BACKEND))
+
+
+# --- WRITE TRACKING (ORM session hooks) ---
+
+def _iso(ts):
+    return (ts.isoformat() + "Z") if ts else None
+
+def _describe(obj, op):
+    """(type, data) for an ORM object written in a flush, or None if admins don't care about it."""
+    table = getattr(obj, "__tablename__", None)
+    if table == "system_logs" and op == "new":
+        return "log", {"id": obj.id, "level": obj.level, "message": obj.message, "timestamp": _iso(obj.timestamp)}
+    if table == "user_activities" and op == "new":
+        return "activity", {"id": obj.id, "user_id": obj.user_id, "user_name": obj.user_name,
+                            "activity_type": obj.activity_type, "timestamp": _iso(obj.timestamp)}
+    if table == "messages" and op == "new":
+        return "message", {"id": obj.id, "user_name": obj.user_name, "user_email": obj.user_email,
+                           "timestamp": _iso(obj.timestamp)}
+    if table == "users":
+        if op == "dirty" and not inspect(obj).attrs.is_deleted.history.has_changes():
+            return None # last_active / profile edits are not status changes
+        status = {"new": "registered", "deleted": "removed"}.get(op) or ("deleted" if obj.is_deleted else "restored")
+        return "user", {"id": obj.id, "status": status, "role": obj.role}
+    if table == "jobs":
+        return "job", {"id": obj.id, "action": {"new": "created", "dirty": "updated", "deleted": "deleted"}[op],
+                       "title": obj.title}
+    return None
+
+def _pending(session):
+    return session.info.setdefault("admin_events", [])
+
+@event.listens_for(Session, "after_flush")
+def _collect(session, flush_context):
+    for op, objs in (("new", session.new), ("dirty", session.dirty), ("deleted", session.deleted)):
+        for obj in objs:
+            described = _describe(obj, op)
+            if described:
+                _pending(session).append((*described, obj.__tablename__))
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk(state):
+    if state.bind_mapper is None or not (state.is_insert or state.is_delete):
+        return # bulk UPDATEs are heartbeat flushes
+    table = state.bind_mapper.local_table.name
+    kind = {"system_logs": "log", "user_activities": "activity", "messages": "message"}.get(table)
+    if kind:
+        data = {"bulk": "insert" if state.is_insert else "delete"}
+        if isinstance(state.parameters, list):
+            data["rows"] = len(state.parameters)
+        _pending(state.session).append((kind, data, table))
+
+@event.listens_for(Session, "after_commit")
+def _publish(session):
+    for type, data, table in session.info.pop("admin_events", ()):
+        bus.publish(type, data, TABLE_SECTIONS.get(table, ()))
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session):
+    session.info.pop("admin_events", None)
+
+add_job_listener(lambda upserted_ids, removed_ids: bus.publish(
+    "job", {"action": "synced", "upserted": len(upserted_ids), "removed": len(removed_ids)}, ("jobs",)))
+
+
+# --- SSE ROUTE ---
+
+router = APIRouter()
+
+def _sse(evt):
+    return f"id: {evt['id']}\nevent: {evt['type']}\ndata: {json.dumps(evt, default=str)}\n\n"
+
+@router.get("/admin/events")
+async def admin_events(request: Request):
+    sub = bus.subscribe()
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    evt = await asyncio.wait_for(sub.queue.get(), timeout=KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                yield _sse(evt)
+        finally:
+            bus.unsubscribe(sub)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -0,0 +1,106 @@
+"""
+Versioned sections for the admin dashboard snapshot (GET /admin/snapshot).
+
+The dashboard polled seven endpoints every 5 s. The snapshot returns all of them in
+one response, each section with a version: a short hash of its JSON, so the same data
+has the same version in every worker. Clients send back the versions they hold and
+only sections that differ are re-sent; If-None-Match with the combined ETag gets a 304.
+
+Built sections are cached (namespace "admin_snapshot", shared between workers when
+CACHE_BACKEND is set) until a write invalidates them. Writes are picked up from the ORM
+session instead of by hand in every route: after a commit, each table the session
+wrote to bumps the sections built from it (TABLE_SECTIONS). Core writes outside the ORM
+(job ingest / expiry) come in through job_ingest's listener hook. Without a shared
+backend, writes made by another worker show up within SNAPSHOT_MAX_AGE seconds.
+"""
+import hashlib
+import itertools
+import json
+import os
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from cache import get_cache, MB
+from job_ingest import add_job_listener
+
+SNAPSHOT_MAX_AGE = float(os.getenv("SNAPSHOT_MAX_AGE", "60"))
+
+TABLE_SECTIONS = {
+    "users": ("users", "deleted_users"),
+    "jobs": ("jobs",),
+    "system_logs": ("logs",),
+    "messages": ("messages",),
+    "user_activities": ("analytics",),
+    "resume_blobs": ("analytics",),
+}
+
+section_cache = get_cache("admin_snapshot", ttl=SNAPSHOT_MAX_AGE, max_bytes=32 * MB, shared=True)
+_sections = {} # name -> (builder(db), cached)
+
+
+def register_section(name, builder, cached=True):
+    """builder(db) returns the section payload; cached=False rebuilds it on every poll (cheap, in-memory sections)."""
+    _sections[name] = (builder, cached)
+
+def bump(*names):
+    for name in names:
+        section_cache.delete(name)
+
+def _version(payload):
+    raw = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(raw.encode()).hexdigest()[:12]
+
+def _load(name, db):
+    builder, cached = _sections[name]
+
+    def build():
+        payload = jsonable_encoder(builder(db))
+        return _version(payload), payload
+
+    return section_cache.get_or_load(name, build) if cached else build()
+
+def build_snapshot(db, known=None):
+    """
+    Returns (etag, versions, sections). known is {section: version} as held by the client;
+    sections only contains the ones that differ from it.
+    """
+    known = known or {}
+    entries = {name: _load(name, db) for name in _sections}
+    versions = {name: version for name, (version, _) in entries.items()}
+    sections = {name: payload for name, (version, payload) in entries.items() if known.get(name) != version}
+    return f'"{_version(versions)}"', versions, sections
+
+
+# --- WRITE TRACKING ---
+
+def _touched(session):
+    return session.info.setdefault("admin_snapshot_tables", set())
+
+@event.listens_for(Session, "after_flush")
+def _after_flush(session, flush_context):
+    for obj in itertools.chain(session.new, session.dirty, session.deleted):
+        table = getattr(obj, "__tablename__", None)
+        if table in TABLE_SECTIONS:
+            _touched(session).add(table)
+
+@event.listens_for(Session, "do_orm_execute")
+def _after_bulk(state):
+    # insert(Model) executemany, query(...).update()/.delete()
+    if (state.is_insert or state.is_update or state.is_delete) and state.bind_mapper is not None:
+        table = state.bind_mapper.local_table.name
+        if table in TABLE_SECTIONS:
+            _touched(state.session).add(table)
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    tables = session.info.pop("admin_snapshot_tables", None)
+    if tables:
+        bump(*{name for table in tables for name in TABLE_SECTIONS[table]})
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session):
+    session.info.pop("admin_snapshot_tables", None)
+
+add_job_listener(lambda upserted_ids, removed_ids: bump("jobs"))
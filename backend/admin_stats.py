@@ -0,0 +1,105 @@
+"""
+Counters behind /admin/stats.
+
+Every open admin tab polls /admin/stats, and each poll used to run COUNT queries over
+users plus a last_active range scan. Now everything is kept in memory:
+
+  total_users    non-admin, non-deleted users: seeded with one COUNT, then adjusted by
+                 register, soft/permanent delete and restore
+  active_users   non-admin users seen in the last ACTIVE_WINDOW_MINUTES, and
+  online_users   in the last PRESENCE_ONLINE_SECONDS, both from presence.py
+  total_resumes  distinct stored resumes that are referenced: seeded with one COUNT, then
+                 adjusted by blob_store after commits that add or release references
+                 (blobs deleted by upload_retention are picked up by the reconcile)
+
+A worker only sees its own writes, so the counters are re-seeded from the database
+every STATS_RECONCILE_SECONDS (on an admin read, never on the heartbeat path). The
+assembled response is cached for STATS_TTL_SECONDS; all admin polls share it.
+"""
+import os
+import threading
+import time
+
+from blob_store import count_resumes, add_resume_listener
+from cache import get_cache, MB
+from database import SessionLocal, User
+from presence import presence
+
+STATS_RECONCILE_SECONDS = float(os.getenv("STATS_RECONCILE_SECONDS", "60"))
+STATS_TTL_SECONDS = float(os.getenv("STATS_TTL_SECONDS", "2"))
+
+
+class AdminStats:
+    def __init__(self):
+        self.view = get_cache("admin_stats", ttl=STATS_TTL_SECONDS, max_bytes=MB)
+        self._lock = threading.Lock()
+        self._total_users = None      # None until the first sync
+        self._total_resumes = 0
+        self._last_sync = 0.0
+
+    # --- WRITE PATHS ---
+
+    def user_added(self, role):
+        """Register / restore."""
+        self._adjust(1, role)
+
+    def user_removed(self, role):
+        """Soft delete, or permanent delete of a user that was not soft-deleted first."""
+        self._adjust(-1, role)
+
+    def resumes_changed(self, delta):
+        """Stored resumes that became referenced (+) or unreferenced (-), from blob_store."""
+        with self._lock:
+            self._total_resumes = max(self._total_resumes + delta, 0)
+        self.view.clear()
+
+    def _adjust(self, delta, role):
+        if role == "admin":
+            return
+        with self._lock:
+            if self._total_users is not None:
+                self._total_users += delta
+        self.view.clear()
+
+    # --- RECONCILE ---
+
+    def sync(self):
+        db = SessionLocal()
+        try:
+            total_users = db.query(User).filter(User.role != "admin", User.is_deleted == False).count()
+            total_resumes = count_resumes(db)
+        except Exception as e:
+            print(f"Admin stats sync failed: {e}")
+            return
+        finally:
+            db.close()
+        with self._lock:
+            self._total_users = total_users
+            self._total_resumes = total_resumes
+            self._last_sync = time.monotonic()
+
+    def reset(self):
+        """Forget everything (database reset); the next read re-seeds."""
+        with self._lock:
+            self._total_users = None
+            self._last_sync = 0.0
+        self.view.clear()
+
+    # --- READ PATH ---
+
+    def snapshot(self):
+        return self.view.get_or_load("stats", self._build)
+
+    def _build(self):
+        if self._total_users is None or time.monotonic() - self._last_sync >= STATS_RECONCILE_SECONDS:
+            self.sync()
+        return {
+            "total_users": self._total_users or 0,
+            "active_users": presence.count("active"),
+            "online_users": presence.count("online"),
+            "total_resumes": self._total_resumes,
+        }
+
+
+admin_stats = AdminStats()
+add_resume_listener(admin_stats.resumes_changed)
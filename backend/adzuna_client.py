@@ -1,33 +1,238 @@
-import requests
+import asyncio
 import os
+import random
+import time
+
+import httpx
 from dotenv import load_dotenv
 
+from cache import get_cache, MB
+
 load_dotenv()
 
 ADZUNA_APP_ID = os.getenv("ADZUNA_APP_ID")
 ADZUNA_APP_KEY = os.getenv("ADZUNA_APP_KEY")
-BASE_URL = "https://api.adzuna.com/v1/api/jobs"
+# Overridable so the client can be pointed at a local stub server (see self_check below for an in-process one)
+BASE_URL = os.getenv("ADZUNA_BASE_URL", "https://api.adzuna.com/v1/api/jobs")
+
+RESULTS_PER_PAGE = 50 # Adzuna maximum
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Pages are shared by every client instance (and every worker when CACHE_BACKEND is set)
+adzuna_cache = get_cache("adzuna", ttl=600, max_bytes=32 * MB, shared=True)
+
+
+class AdzunaError(Exception):
+    pass
+
+
+class AdzunaClient:
+    """
+    Async Adzuna search client.
+
+    One pooled keep-alive connection set is shared by every request made through the
+    instance. Pages and queries are fetched concurrently (capped by max_concurrency),
+    transient failures are retried with exponential backoff, and successful pages are
+    cached for cache_ttl seconds keyed by the full query (the "adzuna" cache namespace).
+
+        async with AdzunaClient() as client:
+            jobs = await client.search_many([("python", "london"), ("react", "")], pages=3)
+    """
+
+    def __init__(self, app_id=None, app_key=None, base_url=None, max_concurrency=20,
+                 timeout=10.0, retries=3, backoff=0.5, cache_ttl=600, transport=None):
+        self.app_id = app_id or ADZUNA_APP_ID
+        self.app_key = app_key or ADZUNA_APP_KEY
+        self.base_url = (base_url or BASE_URL).rstrip("/")
+        self.retries = retries
+        self.backoff = backoff
+        self.cache_ttl = cache_ttl
+        self._cache = adzuna_cache
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._http = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+            transport=transport,
+        )
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.app_id and self.app_key)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self):
+        await self._http.aclose()
+
+    # --- HTTP ---
+
+    async def _get(self, url, params):
+        last_error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                delay = self.backoff * (2 ** (attempt - 1)) * (1 + random.random() * 0.25)
+                await asyncio.sleep(delay)
+            try:
+                async with self._semaphore:
+                    response = await self._http.get(url, params=params)
+            except httpx.TransportError as e:
+                last_error = e
+                continue
+
+            if response.status_code in RETRY_STATUSES:
+                last_error = AdzunaError(f"HTTP {response.status_code} from {url}")
+                retry_after = response.headers.get("Retry-After")
+                if retry_after and retry_after.isdigit():
+                    await asyncio.sleep(min(int(retry_after), 30))
+                continue
+            if response.status_code >= 400:
+                raise AdzunaError(f"HTTP {response.status_code} from {url}: {response.text[:200]}")
+            try:
+                return response.json()
+            except ValueError as e:
+                raise AdzunaError(f"Invalid JSON from {url}: {e}")
 
-def fetch_adzuna_jobs(country="gb", what="", where=""):
+        raise AdzunaError(f"Adzuna request failed after {self.retries + 1} attempts: {last_error}")
+
+    async def search_page(self, country="gb", what="", where="", page=1, results_per_page=RESULTS_PER_PAGE, max_days_old=None):
+        """Return the raw Adzuna response dict for one page ({"count": N, "results": [...]})."""
+        if not self.configured:
+            raise AdzunaError("Adzuna credentials not found (ADZUNA_APP_ID / ADZUNA_APP_KEY).")
+
+        key = (country, what, where, page, results_per_page, max_days_old)
+        params = {
+            "app_id": self.app_id,
+            "app_key": self.app_key,
+            "results_per_page": results_per_page,
+            "what": what,
+            "where": where,
+            "content-type": "application/json"
+        }
+        if max_days_old:
+            # Incremental refreshes only ask for postings newer than their high-water mark
+            params["max_days_old"] = max_days_old
+            params["sort_by"] = "date"
+        # Concurrent identical page requests share one fetch
+        return await self._cache.aget_or_load(
+            key, lambda: self._get(f"{self.base_url}/{country}/search/{page}", params), ttl=self.cache_ttl)
+
+    async def search(self, country="gb", what="", where="", pages=1, results_per_page=RESULTS_PER_PAGE, max_days_old=None):
+        """Fetch up to `pages` pages for one query. Page 1 tells us how many pages actually exist."""
+        first = await self.search_page(country, what, where, 1, results_per_page, max_days_old)
+        results = list(first.get("results", []))
+
+        total = first.get("count") or 0
+        available = -(-total // results_per_page) if total else 1
+        last_page = min(pages, available)
+        if last_page > 1:
+            rest = await asyncio.gather(*[
+                self.search_page(country, what, where, p, results_per_page, max_days_old) for p in range(2, last_page + 1)
+            ])
+            for payload in rest:
+                results.extend(payload.get("results", []))
+        return results
+
+    async def search_many(self, queries, country="gb", pages=1, results_per_page=RESULTS_PER_PAGE, max_days_old=None):
+        """
+        Run many (what, where) queries concurrently.
+        Returns {(what, where): results or AdzunaError}; one failing query does not sink the run.
+        """
+        queries = list(dict.fromkeys(queries))
+        outcomes = await asyncio.gather(
+            *[self.search(country, what, where, pages, results_per_page, max_days_old) for what, where in queries],
+            return_exceptions=True,
+        )
+        return dict(zip(queries, outcomes))
+
+
+def fetch_adzuna_jobs(country="gb", what="", where="", pages=1):
+    """Blocking convenience wrapper kept for scripts; async callers should use AdzunaClient directly."""
     if not ADZUNA_APP_ID or not ADZUNA_APP_KEY:
         print("Warning: Adzuna credentials not found.")
         return []
 
-    url = f"{BASE_URL}/{country}/search/1"
-    params = {
-        "app_id": ADZUNA_APP_ID,
-        "app_key": ADZUNA_APP_KEY,
-        "results_per_page": 10,
-        "what": what,
-        "where": where,
-        "content-type": "application/json"
-    }
-    
+    async def run():
+        async with AdzunaClient() as client:
+            return await client.search(country, what, where, pages)
+
     try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        data = response.json()
-        return data.get("results", [])
-    except Exception as e:
+        return asyncio.run(run())
+    except AdzunaError as e:
         print(f"Error fetching from Adzuna: {e}")
         return []
+
+
+# --- SELF-CHECK ---
+
+def self_check():
+    """
+    Drive retries, backoff, pagination and the page cache against an in-process stub
+    (httpx.MockTransport) instead of the real API. Raises AssertionError on a mismatch.
+    """
+    calls = []
+    flaky = {"503": 1, "reset": 1} # failures left before the query succeeds
+
+    def handler(request):
+        what = request.url.params.get("what")
+        page = int(request.url.path.rsplit("/", 1)[-1])
+        calls.append((what, page))
+        if what == "down":
+            return httpx.Response(500)
+        if what == "missing":
+            return httpx.Response(404, text="no such search")
+        if flaky.get(what):
+            flaky[what] -= 1
+            if what == "reset":
+                raise httpx.ConnectError("connection reset", request=request)
+            return httpx.Response(503, headers={"Retry-After": "0"})
+        per_page = int(request.url.params["results_per_page"])
+        total = 120
+        first = (page - 1) * per_page
+        return httpx.Response(200, json={"count": total, "results": [
+            {"id": i, "title": f"{what} {i}"} for i in range(first, min(first + per_page, total))]})
+
+    async def run():
+        adzuna_cache.clear()
+        report = {}
+        async with AdzunaClient("stub", "stub", base_url="http://adzuna.stub", transport=httpx.MockTransport(handler),
+                                retries=2, backoff=0.05) as client:
+            # Pagination: 120 results / 50 per page -> pages 1..3 only, even when 5 are asked for
+            results = await client.search(what="python", pages=5)
+            assert len(results) == 120 and sorted(p for w, p in calls if w == "python") == [1, 2, 3], calls
+            # Cache: the same query again makes no requests
+            before = len(calls)
+            assert await client.search(what="python", pages=5) == results and len(calls) == before
+            # Retries: a 503 (with Retry-After) and a transport error are retried, then succeed
+            for what in ("503", "reset"):
+                assert len(await client.search(what=what, pages=1)) == 50
+                assert [p for w, p in calls if w == what] == [1, 1], calls
+            # Exhausted retries: retries + 1 attempts, then AdzunaError; 4xx is not retried
+            started = time.perf_counter()
+            outcomes = await client.search_many([("down", ""), ("missing", ""), ("python", "")], pages=1)
+            # Backoff: two retries of "down" wait at least backoff * (1 + 2)
+            assert time.perf_counter() - started >= 0.15
+            assert isinstance(outcomes[("down", "")], AdzunaError) and isinstance(outcomes[("missing", "")], AdzunaError)
+            assert sum(w == "down" for w, _ in calls) == 3 and sum(w == "missing" for w, _ in calls) == 1, calls
+            assert len(outcomes[("python", "")]) == 50
+            report["requests"] = len(calls)
+        adzuna_cache.clear()
+        return report
+
+    return asyncio.run(run())
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Adzuna client utilities.")
+    parser.add_argument("--self-check", action="store_true",
+                        help="Exercise retries, backoff, pagination and caching against an in-process stub")
+    args = parser.parse_args()
+    if args.self_check:
+        print(f"Adzuna client self-check passed: {self_check()}")
+    else:
+        parser.print_help()
@@ -0,0 +1,416 @@
+"""
+ATS scoring: /ats_check (one shot) and ATS sessions (/ats/session) for iterative editing.
+
+The resume and the job description are kept as blocks (paragraphs, split on blank lines),
+each with its n-gram counts (1-3 grams, English stop words removed, as CountVectorizer
+produced before). The session holds the summed count vectors and running totals:
+
+    dot = sum(jd[g] * resume[g]),  jd_sq = sum(jd[g]^2),  resume_sq = sum(resume[g]^2)
+
+plus the matched / missing phrase sets. An edit replaces a range of blocks; only those
+blocks are re-tokenized and only their n-grams touch the totals, so the cosine and the
+keyword lists cost O(changed text) instead of a full re-vectorization. Resume counts are
+weighted per section (resume_sections.SECTION_WEIGHTS, multiples of 1/4), so every sum
+stays exact in floating point and no drift builds up over a long session.
+
+Sessions live in this worker's memory for ATS_SESSION_TTL_SECONDS after the last edit;
+a client that hits another worker or an expired session gets 410 and starts a new one.
+/ats_check scores through a throwaway session, so both give the same numbers.
+
+Sessions time their own stages and report them per endpoint (report_stages), under the
+stage names /ats_check used before sessions: text_cleaning (clean + n-grams of the changed
+blocks), vectorizer_fit (count/total updates), cosine_similarity and keyword_diff.
+"""
+import heapq
+import math
+import os
+import re
+import secrets
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import List, NamedTuple, Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from cache import get_cache, MB
+from database import get_db, UserActivity
+from documents import get_document, derived
+from metrics import stage_timer, observe_stage
+from resume_sections import segment, SECTION_WEIGHTS
+from skills import TECHNICAL_SKILLS
+
+ATS_SESSION_TTL_SECONDS = float(os.getenv("ATS_SESSION_TTL_SECONDS", "1800"))
+SHORT_JD_CHARS = 150
+MAX_MATCHED = 25
+MAX_MISSING = 20
+
+_BLOCK_RE = re.compile(r"\n\s*\n")
+
+session_cache = get_cache("ats_sessions", ttl=ATS_SESSION_TTL_SECONDS, max_bytes=64 * MB)
+
+
+# --- TEXT ---
+
+def clean_text(text):
+    text = text.lower()
+    # Remove special chars but keep vital tech symbols (e.g., c++, node.js)
+    text = re.sub(r'[^a-z0-9\s\+\#\.]', ' ', text)
+    # Collapse multiple spaces
+    return re.sub(r'\s+', ' ', text).strip()
+
+def split_blocks(text):
+    return _BLOCK_RE.split(text) if text else []
+
+@lru_cache(maxsize=1)
+def _analyzer():
+    from sklearn.feature_extraction.text import CountVectorizer
+    # Unigrams to trigrams (e.g. "machine learning"); standard 'english' stop words drop 'and', 'the', etc.
+    return CountVectorizer(ngram_range=(1, 3), stop_words='english').build_analyzer()
+
+def ngram_counts(clean):
+    return Counter(_analyzer()(clean)) if clean else Counter()
+
+def expand_short_jd(clean_jd):
+    """
+    Inferred requirements for a short JD ("Software Development"): the skills of the
+    TECHNICAL_SKILLS categories it names. Returns the extra text ("" if none).
+    """
+    if len(clean_jd) >= SHORT_JD_CHARS:
+        return ""
+    expanded_context = []
+    for category, skills in TECHNICAL_SKILLS.items():
+        # If the category roughly matches the input
+        if category.lower() in clean_jd or clean_jd in category.lower():
+            expanded_context.extend(skills)
+
+        # Or if specific high-level terms match
+        if "frontend" in clean_jd and category == "Frontend": expanded_context.extend(skills)
+        if "backend" in clean_jd and category == "Backend": expanded_context.extend(skills)
+        if "scien" in clean_jd and category == "Data Science": expanded_context.extend(skills) # Data Scientist
+        if "design" in clean_jd and category == "Design": expanded_context.extend(skills)
+
+    # Fallback: If "Software" or "Developer" generally, dump common langs
+    if ("software" in clean_jd or "developer" in clean_jd) and not expanded_context:
+        expanded_context.extend(["python", "javascript", "java", "react", "sql", "git", "communication", "problem solving"])
+    return " ".join(expanded_context).lower()
+
+def score_from_similarity(raw_similarity):
+    # Generous curve (market-standard ATS: a decent match gets 60+), minimum 50:
+    # 0.05 sim -> 50, 0.2 sim -> 85, 0.4 sim -> 95
+    if raw_similarity > 0.4:
+        base_score = 95
+    elif raw_similarity < 0.05:
+        base_score = 50
+    else:
+        base_score = 55 + (raw_similarity * 150)
+    return int(min(max(base_score, 50), 100))
+
+def _reportable(phrase):
+    return len(phrase) > 3 and not phrase.isdigit()
+
+
+# --- BLOCKS ---
+
+class JDBlock(NamedTuple):
+    raw: str
+    clean: str
+    counts: Counter
+
+class ResumeBlock(NamedTuple):
+    raw: str
+    kind_in: str      # section the block starts in (inherited from the previous block)
+    kind_out: str     # section it ends in
+    has_text: bool
+    counts: Counter   # section-weighted
+
+def jd_block(raw):
+    clean = clean_text(raw)
+    return JDBlock(raw, clean, ngram_counts(clean))
+
+def resume_block(raw, kind="header"):
+    sections = segment(raw, kind)
+    counts, has_text = Counter(), False
+    for section, start, end in sections:
+        clean = clean_text(raw[start:end])
+        if clean:
+            has_text = True
+            weight = SECTION_WEIGHTS.get(section, 1.0)
+            for gram, count in ngram_counts(clean).items():
+                counts[gram] += weight * count
+    return ResumeBlock(raw, kind, sections[-1][0], has_text, counts)
+
+def resume_blocks(text):
+    blocks, kind = [], "header"
+    for raw in split_blocks(text):
+        block = resume_block(raw, kind)
+        blocks.append(block)
+        kind = block.kind_out
+    return blocks
+
+def _splice(old, new):
+    """(start, end, replacement) turning the raw texts old into new, trimming the common prefix / suffix."""
+    start = 0
+    while start < len(old) and start < len(new) and old[start] == new[start]:
+        start += 1
+    tail = 0
+    while tail < len(old) - start and tail < len(new) - start and old[-1 - tail] == new[-1 - tail]:
+        tail += 1
+    return start, len(old) - tail, new[start:len(new) - tail]
+
+
+# --- SESSION ---
+
+class ATSSession:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.jd_blocks = []
+        self.resume_blocks = []
+        self.expansion = jd_block("")
+        self.jd = {}          # gram -> count
+        self.resume = {}      # gram -> weighted count
+        self.dot = 0.0
+        self.jd_sq = 0.0
+        self.resume_sq = 0.0
+        self.matched = set()  # JD grams present in the resume
+        self.missing = set()  # reportable JD grams absent from it
+        self.timings = Counter() # stage -> seconds since the last report_stages()
+
+    @contextmanager
+    def timed(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[stage] += time.perf_counter() - started
+
+    def report_stages(self, endpoint):
+        for stage, seconds in self.timings.items():
+            observe_stage(endpoint, stage, seconds)
+        self.timings.clear()
+
+    # --- vector updates ---
+
+    def _add_jd(self, counts, sign):
+        for gram, count in counts.items():
+            old = self.jd.get(gram, 0)
+            new = old + sign * count
+            self.jd_sq += new * new - old * old
+            in_resume = self.resume.get(gram, 0)
+            self.dot += in_resume * (new - old)
+            if new:
+                self.jd[gram] = new
+                if not old:
+                    if in_resume:
+                        self.matched.add(gram)
+                    elif _reportable(gram):
+                        self.missing.add(gram)
+            else:
+                del self.jd[gram]
+                self.matched.discard(gram)
+                self.missing.discard(gram)
+
+    def _add_resume(self, counts, sign):
+        for gram, count in counts.items():
+            old = self.resume.get(gram, 0)
+            new = old + sign * count
+            self.resume_sq += new * new - old * old
+            in_jd = self.jd.get(gram, 0)
+            self.dot += in_jd * (new - old)
+            if new:
+                self.resume[gram] = new
+            else:
+                del self.resume[gram]
+            if in_jd and bool(old) != bool(new):
+                if new:
+                    self.missing.discard(gram)
+                    self.matched.add(gram)
+                else:
+                    self.matched.discard(gram)
+                    if _reportable(gram):
+                        self.missing.add(gram)
+
+    # --- edits ---
+
+    def edit_jd(self, start, end, raws):
+        with self.timed("text_cleaning"):
+            new = [jd_block(raw) for raw in raws]
+        with self.timed("vectorizer_fit"):
+            for block in self.jd_blocks[start:end]:
+                self._add_jd(block.counts, -1)
+            for block in new:
+                self._add_jd(block.counts, 1)
+        self.jd_blocks[start:end] = new
+        # Short JDs get inferred requirements; the expansion depends on the whole (short) text
+        with self.timed("text_cleaning"):
+            expansion = jd_block(expand_short_jd(" ".join(b.clean for b in self.jd_blocks if b.clean)))
+        if expansion.raw != self.expansion.raw:
+            with self.timed("vectorizer_fit"):
+                self._add_jd(self.expansion.counts, -1)
+                self._add_jd(expansion.counts, 1)
+            self.expansion = expansion
+
+    def edit_resume(self, start, end, raws, blocks=None):
+        """Replace resume blocks [start:end] with raws (or prebuilt blocks, see resume_blocks)."""
+        kind = self.resume_blocks[start - 1].kind_out if start else "header"
+        new = []
+        with self.timed("text_cleaning"):
+            for i, raw in enumerate(raws):
+                block = blocks[i] if blocks is not None else resume_block(raw, kind)
+                new.append(block)
+                kind = block.kind_out
+        with self.timed("vectorizer_fit"):
+            for block in self.resume_blocks[start:end]:
+                self._add_resume(block.counts, -1)
+            for block in new:
+                self._add_resume(block.counts, 1)
+        self.resume_blocks[start:end] = new
+        # A heading added or removed changes the section the following blocks inherit
+        i = start + len(new)
+        while i < len(self.resume_blocks) and self.resume_blocks[i].kind_in != kind:
+            old = self.resume_blocks[i]
+            with self.timed("text_cleaning"):
+                block = resume_block(old.raw, kind)
+            with self.timed("vectorizer_fit"):
+                self._add_resume(old.counts, -1)
+                self._add_resume(block.counts, 1)
+            self.resume_blocks[i] = block
+            kind = block.kind_out
+            i += 1
+
+    def set_jd(self, text):
+        self.edit_jd(*_splice([b.raw for b in self.jd_blocks], split_blocks(text)))
+
+    def set_resume(self, text):
+        self.edit_resume(*_splice([b.raw for b in self.resume_blocks], split_blocks(text)))
+
+    # --- result ---
+
+    def result(self):
+        has_jd = any(b.clean for b in self.jd_blocks) or bool(self.expansion.clean)
+        if not has_jd or not any(b.has_text for b in self.resume_blocks):
+            return {"score": 0, "matched_keywords": [], "missing_keywords": ["Content empty or unreadable"]}
+        if not self.jd and not self.resume:
+            # Stop words ate everything
+            return {"score": 0, "matched_keywords": [], "missing_keywords": ["No keywords found internally"]}
+        with self.timed("cosine_similarity"):
+            raw_similarity = self.dot / math.sqrt(self.jd_sq * self.resume_sq) if self.jd_sq and self.resume_sq else 0.0
+        by_length = lambda phrase: (-len(phrase), phrase)
+        with self.timed("keyword_diff"):
+            matched = heapq.nsmallest(MAX_MATCHED, self.matched, key=by_length)
+            missing = heapq.nsmallest(MAX_MISSING, self.missing, key=by_length)
+        return {"score": score_from_similarity(raw_similarity), "matched_keywords": matched, "missing_keywords": missing}
+
+    def approx_bytes(self):
+        # Cache budget: dominated by the gram dicts and the per-block counters
+        grams = len(self.jd) + len(self.resume) + sum(len(b.counts) for b in self.resume_blocks + self.jd_blocks)
+        return 200 * grams + sum(len(b.raw) for b in self.resume_blocks + self.jd_blocks)
+
+
+def build_session(job_description, resume_text=None, document_id=None):
+    """Session for a JD and either resume_text or a /scan-resume document (its blocks are tokenized once)."""
+    if resume_text is None and not document_id:
+        raise HTTPException(status_code=422, detail="Provide resume_text or a document_id from /scan-resume.")
+    session = ATSSession()
+    if document_id:
+        doc = get_document(document_id)
+        with session.timed("text_cleaning"):
+            blocks = derived(document_id, doc, "ats_blocks", lambda d: resume_blocks(d["text"]))
+        session.edit_resume(0, 0, [b.raw for b in blocks], blocks)
+    else:
+        session.set_resume(resume_text or "")
+    session.set_jd(job_description or "")
+    return session
+
+def log_ats_check(db, score, job_description, user_id=None, user_name=None, user_email=None):
+    try:
+        email_info = f" [Email: {user_email}]" if user_email else ""
+        db.add(UserActivity(
+            user_id=user_id,
+            user_name=user_name or "Candidate",
+            activity_type="ats_check",
+            details=f"Score: {score}%{email_info} (Job: {job_description[:30]}...)"
+        ))
+        with stage_timer("ats_check", "db_commit"):
+            db.commit()
+    except Exception as e:
+        print(f"Logging failed: {e}")
+
+
+# --- SESSION ROUTES ---
+
+router = APIRouter()
+
+class ATSSessionCreate(BaseModel):
+    resume_text: Optional[str] = None
+    document_id: Optional[str] = None
+    job_description: str
+    user_id: Optional[int] = None
+    user_name: Optional[str] = None
+    user_email: Optional[str] = None
+
+class ATSEdit(BaseModel):
+    start: int          # replace blocks [start:end) ...
+    end: int
+    blocks: List[str] = []   # ... with these (blank-line separated paragraphs)
+
+class ATSSessionUpdate(BaseModel):
+    # Either the full new text (the server diffs it against its blocks) or block edits, applied in order
+    job_description: Optional[str] = None
+    job_description_edits: Optional[List[ATSEdit]] = None
+    resume_text: Optional[str] = None
+    resume_edits: Optional[List[ATSEdit]] = None
+
+def _response(session_id, session):
+    return {"session_id": session_id, "expires_in": ATS_SESSION_TTL_SECONDS,
+            "jd_blocks": len(session.jd_blocks), "resume_blocks": len(session.resume_blocks), **session.result()}
+
+def _check_range(blocks, edit):
+    if not 0 <= edit.start <= edit.end <= len(blocks):
+        raise HTTPException(status_code=400, detail=f"Edit range {edit.start}:{edit.end} is outside 0:{len(blocks)}.")
+
+def _get_session(session_id):
+    session = session_cache.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=410, detail="ATS session expired. Start a new check.")
+    return session
+
+@router.post("/ats/session")
+def create_ats_session(data: ATSSessionCreate, db: Session = Depends(get_db)):
+    with stage_timer("ats_session", "create"):
+        session = build_session(data.job_description, data.resume_text, data.document_id)
+    session_id = secrets.token_urlsafe(16)
+    session_cache.set(session_id, session, size=session.approx_bytes())
+    response = _response(session_id, session)
+    session.report_stages("ats_session")
+    # Logged once per session; edits are not separate checks
+    log_ats_check(db, response["score"], data.job_description, data.user_id, data.user_name, data.user_email)
+    return response
+
+@router.patch("/ats/session/{session_id}")
+def update_ats_session(session_id: str, data: ATSSessionUpdate):
+    session = _get_session(session_id)
+    with session.lock, stage_timer("ats_session", "update"):
+        if data.resume_text is not None:
+            session.set_resume(data.resume_text)
+        for edit in data.resume_edits or ():
+            _check_range(session.resume_blocks, edit)
+            session.edit_resume(edit.start, edit.end, edit.blocks)
+        if data.job_description is not None:
+            session.set_jd(data.job_description)
+        for edit in data.job_description_edits or ():
+            _check_range(session.jd_blocks, edit)
+            session.edit_jd(edit.start, edit.end, edit.blocks)
+        response = _response(session_id, session)
+        session.report_stages("ats_session")
+    session_cache.set(session_id, session, size=session.approx_bytes()) # refreshes the TTL and the size
+    return response
+
+@router.delete("/ats/session/{session_id}")
+def delete_ats_session(session_id: str):
+    session_cache.delete(session_id)
+    return {"message": "ATS session closed"}
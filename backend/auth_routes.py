@@ -2,6 +2,9 @@ from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import RedirectResponse
 from sqlalchemy.orm import Session
 from database import get_db, User, init_db
+from cache import get_cache, MB
+from admin_stats import admin_stats
+from presence import presence
 from datetime import datetime
 import os
 import random
@@ -27,6 +30,7 @@ async def google_callback(code: str, db: Session = Depends(get_db)):
     
     # Check if user exists
     user = db.query(User).filter(User.email == google_email).first()
+    created = user is None
     if not user:
         user = User(
             email=google_email,
@@ -43,6 +47,9 @@ async def google_callback(code: str, db: Session = Depends(get_db)):
     
     db.commit()
     db.refresh(user)
+    if created:
+        admin_stats.user_added(user.role)
+        presence.user_added(user.id, user.role)
     
     # Redirect to Frontend with token (Simulated)
     # In real app, we would send a Secure HTTPOnly Cookie or a short-lived token
@@ -61,6 +68,7 @@ async def github_callback(code: str, db: Session = Depends(get_db)):
     github_name = "Octocat Mock"
     
     user = db.query(User).filter(User.email == github_email).first()
+    created = user is None
     if not user:
         user = User(
             email=github_email,
@@ -76,6 +84,9 @@ async def github_callback(code: str, db: Session = Depends(get_db)):
 
     db.commit()
     db.refresh(user)
+    if created:
+        admin_stats.user_added(user.role)
+        presence.user_added(user.id, user.role)
         
     return RedirectResponse(
         url=f"/?token=mock-oauth-jwt-token&role={user.role}&email={user.email}&id={user.id}&full_name={user.full_name}"
@@ -93,8 +104,8 @@ class ResetRequest(BaseModel):
     otp: str
     new_password: str
 
-# In-memory OTP store (for demo)
-otp_store = {}
+# OTP codes expire after 10 minutes; shared between workers when CACHE_BACKEND is set
+otp_store = get_cache("otp", ttl=600, max_bytes=MB, shared=True)
 
 @router.post("/auth/forgot-password")
 async def forgot_password(req: ForgotRequest, db: Session = Depends(get_db)):
@@ -105,7 +116,7 @@ async def forgot_password(req: ForgotRequest, db: Session = Depends(get_db)):
     
     # Generate Mock 6-digit OTP
     otp = "".join(random.choices(string.digits, k=6))
-    otp_store[req.email] = otp
+    otp_store.set(req.email, otp)
     
     print(f"========================================")
     print(f" [MOCK EMAIL] Password Reset for {req.email}")
@@ -134,21 +145,22 @@ async def reset_password(req: ResetRequest, db: Session = Depends(get_db)):
     db.commit()
     
     # Clear OTP
-    del otp_store[req.email]
+    otp_store.delete(req.email)
     
     return {"message": "Password reset successfully"}
 
 @router.get("/auth/verify/{user_id}")
-async def verify_user_status(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == user_id).first()
+def verify_user_status(user_id: int):
+    # Answered from presence.py's in-memory directory; no DB session on this path
+    user = presence.lookup(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    if user.is_deleted:
+    is_deleted, role = user
+    if is_deleted:
         raise HTTPException(status_code=403, detail="Account deleted")
         
-    # HEARTBEAT UPDATE
-    user.last_active = datetime.utcnow()
-    db.commit()
+    # HEARTBEAT UPDATE: last_active is written in batches by the presence flusher
+    presence.heartbeat(user_id, role)
     
-    return {"status": "active", "role": user.role}
+    return {"status": "active", "role": role}
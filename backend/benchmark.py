@@ -0,0 +1,408 @@
+"""
+Reproducible benchmarks for the backend hot paths.
+
+Generates a seeded synthetic corpus (PDF/DOCX resumes of 1-4 pages, job descriptions
+from a one-liner to a few thousand words), seeds a dedicated database with N activity
+and job rows, then times the real functions:
+
+    extract_text_from_pdf, extract_text_from_docx, skill_extraction, parse_resume,
+    classify_document, reject_non_resume, ats_check, search_jobs, evaluate_interview, get_analytics
+
+classify_document also reports accuracy over a labelled mix of resumes, offer letters,
+other documents and scanned (image-only) pages; reject_non_resume times parse_resume
+on the non-resume PDFs, which are turned away after the first page.
+
+and reports throughput and p50/p95/p99 per benchmark as JSON, so runs can be diffed
+between commits (--compare). The same --seed always produces the same corpus and rows.
+
+Usage (from backend/):
+    python benchmark.py --rows 10000                       # seeds benchmark_data/bench_10000_10000_42.db once, then reuses it
+    python benchmark.py --rows 100000 --out before.json
+    python benchmark.py --rows 100000 --compare before.json
+    python benchmark.py --rows 1000000 --only get_analytics search_jobs
+
+PDF generation needs reportlab (as generate_sample_resume.py does).
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_data")
+BENCHMARKS = ["extract_text_from_pdf", "extract_text_from_docx", "skill_extraction", "parse_resume",
+              "classify_document", "reject_non_resume", "ats_check", "search_jobs", "evaluate_interview", "get_analytics"]
+
+FIRST_NAMES = ["Aarav", "Diya", "Kabir", "Meera", "Rohan", "Sara", "Vikram", "Anika", "Liam", "Olivia",
+               "Noah", "Emma", "Arjun", "Priya", "Ethan", "Zara", "Ishaan", "Nina", "Leo", "Maya"]
+LAST_NAMES = ["Sharma", "Menon", "Nair", "Patel", "Iyer", "Smith", "Brown", "Garcia", "Khan", "Das"]
+ROLES = ["Software Engineer", "Backend Developer", "Frontend Developer", "Data Scientist", "DevOps Engineer",
+         "Full Stack Developer", "Machine Learning Engineer", "QA Engineer", "Mobile Developer", "Cloud Engineer"]
+LEVELS = ["Junior", "", "Senior", "Lead", "Intern"]
+CITIES = ["Bangalore", "Kochi", "Chennai", "Hyderabad", "Pune", "Remote", "London", "Berlin", "Toronto", "Singapore"]
+FILLER = ("designed built shipped maintained improved scalable reliable services team stakeholders customers "
+          "latency throughput deployment pipeline testing review mentoring ownership delivered features migrated "
+          "legacy platform integrated monitoring reduced costs automated workflows collaborated cross functional "
+          "product requirements documentation performance optimization architecture microservices data").split()
+JD_ONELINERS = ["Software Development", "Frontend developer", "Backend role", "Data Scientist", "UI Design"]
+OTHER_DOCS = ["Invoice", "Meeting Minutes", "Project Proposal", "Lease Agreement", "Research Abstract"]
+
+
+# --- CORPUS ---
+
+def _skills_pool():
+    from skills import ALL_SKILLS
+    return sorted(ALL_SKILLS)
+
+def _sentence(rng, skills, n_words=18):
+    words = [rng.choice(FILLER) for _ in range(n_words)]
+    for _ in range(rng.randint(0, 2)):
+        words.insert(rng.randrange(len(words)), rng.choice(skills))
+    return " ".join(words).capitalize() + "."
+
+def make_resume_lines(rng, pages):
+    """Plain text lines for a resume of roughly `pages` pages (~50 lines each)."""
+    skills = _skills_pool()
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    lines = [name, f"Email: {name.lower().replace(' ', '.')}@example.com | Phone: +91 98{rng.randint(10000000, 99999999)}",
+             "", "Summary", _sentence(rng, skills), "", "Skills",
+             ", ".join(rng.sample(skills, rng.randint(6, 18))), "", "Experience"]
+    target = pages * 50
+    job = 0
+    while len(lines) < target - 12:
+        job += 1
+        lines.append(f"{rng.choice(LEVELS)} {rng.choice(ROLES)} - Company {rng.randint(1, 500)} ({2010 + job}-{2011 + job})".strip())
+        lines.extend(f"- {_sentence(rng, skills)}" for _ in range(rng.randint(3, 6)))
+        lines.append("")
+    lines += ["Projects", f"- {_sentence(rng, skills)}", "", "Education",
+              f"B.Tech Computer Science, University of {rng.choice(CITIES)}", "", "Certifications",
+              f"- {rng.choice(skills).title()} Certified Professional"]
+    return lines
+
+def make_offer_letter_lines(rng):
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    company = f"Company {rng.randint(1, 500)} Pvt Ltd"
+    return [company, f"{rng.randint(1, 28)} March 2024", "", f"Dear {name},", "",
+             rng.choice(["We are pleased to offer you the position of", "Further to your interview, we are delighted to appoint you as"])
+             + f" {rng.choice(ROLES)} at {company}.",
+             f"Your annual CTC will be INR {rng.randint(4, 40)},00,000. The salary breakdown is given in the annexure.",
+             f"Your date of joining will be {rng.randint(1, 28)} April 2024 at our {rng.choice(CITIES)} office.",
+             "You will be on a probation period of six months, after which your employment will be confirmed.",
+             "Please sign and return a copy of this letter as acceptance of offer.", "",
+             "Yours sincerely,", "Human Resources"]
+
+def make_other_lines(rng):
+    kind = rng.choice(OTHER_DOCS)
+    filler = [" ".join(rng.choice(FILLER) for _ in range(rng.randint(12, 25))).capitalize() + "." for _ in range(rng.randint(6, 20))]
+    return [f"{kind} #{rng.randint(100, 999)}", f"Prepared for Company {rng.randint(1, 500)}", ""] + filler
+
+def _pdf_canvas():
+    try:
+        from reportlab.lib.pagesizes import letter
+        from reportlab.pdfgen import canvas
+    except ImportError:
+        raise SystemExit("reportlab is required to generate PDF fixtures: pip install reportlab")
+    buf = io.BytesIO()
+    return buf, canvas.Canvas(buf, pagesize=letter), letter
+
+def make_scanned_pdf(rng):
+    """One image-only page, like a phone scan of a printed resume."""
+    from PIL import Image, ImageDraw
+    from reportlab.lib.utils import ImageReader
+    img = Image.new("L", (850, 1100), 255)
+    draw = ImageDraw.Draw(img)
+    for y in range(60, 1040, 22):
+        draw.rectangle([60, y, 60 + rng.randint(200, 720), y + 8], fill=rng.randint(0, 80))
+    buf, c, (width, height) = _pdf_canvas()
+    c.drawImage(ImageReader(img), 0, 0, width, height)
+    c.save()
+    return buf.getvalue()
+
+def make_resume_pdf(rng, pages, lines=None):
+    buf, c, (width, height) = _pdf_canvas()
+    y = height - 50
+    c.setFont("Helvetica", 9)
+    for line in lines or make_resume_lines(rng, pages):
+        if y < 50:
+            c.showPage()
+            c.setFont("Helvetica", 9)
+            y = height - 50
+        c.drawString(50, y, line[:120])
+        y -= 13
+    c.save()
+    return buf.getvalue()
+
+def make_resume_docx(rng, pages):
+    import docx
+    doc = docx.Document()
+    for line in make_resume_lines(rng, pages):
+        doc.add_paragraph(line)
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+def make_job_description(rng, words):
+    if words <= 5:
+        return rng.choice(JD_ONELINERS)
+    skills = _skills_pool()
+    parts = [f"We are hiring a {rng.choice(ROLES)} in {rng.choice(CITIES)}.", "Requirements:"]
+    while sum(len(p.split()) for p in parts) < words:
+        parts.append(_sentence(rng, skills, n_words=rng.randint(10, 25)))
+    return " ".join(parts)
+
+def make_transcript(rng, n_questions):
+    skills = _skills_pool()
+    transcript = []
+    for i in range(n_questions):
+        answer = "SKIPPED" if rng.random() < 0.1 else " ".join(_sentence(rng, skills) for _ in range(rng.randint(1, 5)))
+        transcript.append({"question": f"Question {i + 1}?", "answer": answer})
+    return transcript
+
+def build_classification_set(rng, n_per_class):
+    """[(first-page text, has_images, expected label)] plus the non-resume PDFs."""
+    samples, pdfs = [], []
+    for i in range(n_per_class):
+        lines = make_resume_lines(rng, 1 + i % 4)[:50]
+        samples.append(("\n".join(lines), False, "resume"))
+        offer, other = make_offer_letter_lines(rng), make_other_lines(rng)
+        samples.append(("\n".join(offer), False, "offer_letter"))
+        samples.append(("\n".join(other), False, "other"))
+        samples.append(("", True, "scanned_image"))
+        if i < 4:
+            pdfs += [make_resume_pdf(rng, 1, offer), make_resume_pdf(rng, 1, other), make_scanned_pdf(rng)]
+    return samples, pdfs
+
+def build_corpus(seed, n_files=12):
+    rng = random.Random(seed)
+    pdfs = [make_resume_pdf(rng, 1 + i % 4) for i in range(n_files)]
+    docxs = [make_resume_docx(rng, 1 + i % 4) for i in range(n_files)]
+    texts = ["\n".join(make_resume_lines(rng, 1 + i % 4)) for i in range(n_files)]
+    jds = [make_job_description(rng, w) for w in (3, 40, 150, 400, 1000, 3000)]
+    transcripts = [make_transcript(rng, n) for n in (5, 8, 10)]
+    classification, non_resume_pdfs = build_classification_set(rng, n_files * 4)
+    return {"pdfs": pdfs, "docxs": docxs, "texts": texts, "jds": jds, "transcripts": transcripts,
+            "classification": classification, "non_resume_pdfs": non_resume_pdfs}
+
+
+# --- DATABASE SEEDING ---
+
+ACTIVITY_MIX = [("visit", 0.55), ("resume_upload", 0.15), ("ats_resume_upload", 0.05), ("ats_check", 0.12),
+                ("interview_attempt", 0.05), ("interview_prep_upload", 0.03), ("login", 0.05)]
+
+def seed_database(rows, job_rows, seed, chunk=20000):
+    from sqlalchemy import insert, select
+    from database import engine, SessionLocal, User, UserActivity
+    from job_ingest import ingest_jobs
+
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    n_users = max(rows // 100, 50)
+    users = [{"email": f"user{i}@bench.example", "hashed_password": "x",
+              "full_name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}",
+              "role": "admin" if i == 1 else "user", "created_at": now - timedelta(days=rng.randint(0, 365)),
+              "last_active": now - timedelta(minutes=rng.randint(0, 60 * 24 * 30)), "is_deleted": i % 97 == 0}
+             for i in range(1, n_users + 1)]
+    with engine.begin() as conn:
+        conn.execute(insert(User), users)
+        profiles = [tuple(r) for r in conn.execute(
+            select(User.id, User.full_name, User.email).where(User.email.like("%@bench.example")).order_by(User.id))]
+
+    types, weights = zip(*ACTIVITY_MIX)
+    written = 0
+    while written < rows:
+        batch = []
+        for kind in rng.choices(types, weights, k=min(chunk, rows - written)):
+            uid, name, email = rng.choice(profiles)
+            sha = "%064x" % rng.getrandbits(256)
+            if kind.endswith("upload"):
+                details = f"File: resume_{rng.randint(1, 9999)}.pdf (Saved: blobs/{sha[:2]}/{sha[2:4]}/{sha}.pdf) [Email: {email}]"
+            elif kind == "ats_check":
+                details = f"Score: {rng.randint(50, 99)}% (Job: {rng.choice(ROLES)}...)"
+            else:
+                details = kind
+            batch.append({"user_id": uid, "user_name": name, "activity_type": kind, "details": details,
+                          "timestamp": now - timedelta(seconds=rng.randint(0, 90 * 86400)),
+                          "file_hash": sha if kind.endswith("upload") else None})
+        with engine.begin() as conn:
+            conn.execute(insert(UserActivity), batch)
+        written += len(batch)
+
+    from job_scheduler import JOB_MAX_AGE_DAYS
+    skills = _skills_pool()
+
+    def jobs():
+        for i in range(job_rows):
+            yield {"title": f"{rng.choice(LEVELS)} {rng.choice(ROLES)}".strip(), "company": f"Company {i}",
+                   "location": rng.choice(CITIES), "description": make_job_description(rng, rng.randint(40, 200)),
+                   "skills_required": ", ".join(rng.sample(skills, rng.randint(3, 8))),
+                   "contract_type": rng.choices(["full_time", "internship", "contractor"], [0.7, 0.2, 0.1])[0],
+                   "date_posted": (now - timedelta(hours=rng.randint(0, JOB_MAX_AGE_DAYS * 24 - 1))).isoformat()}
+    ingest_jobs(jobs(), source="Benchmark")
+    db = SessionLocal()
+    try:
+        return {"users": db.query(User).count(), "activities": db.query(UserActivity).count()}
+    finally:
+        db.close()
+
+
+# --- MEASUREMENT ---
+
+def measure(fn, inputs, iterations, warmup=1):
+    for i in range(min(warmup, len(inputs))):
+        fn(inputs[i])
+    durations = np.empty(iterations, dtype=np.float64)
+    started = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        fn(inputs[i % len(inputs)])
+        durations[i] = time.perf_counter() - t0
+    wall = time.perf_counter() - started
+    p50, p95, p99 = np.percentile(durations, [50, 95, 99])
+    return {"n": iterations, "throughput_per_s": round(iterations / wall, 2),
+            "mean_ms": round(durations.mean() * 1000, 3), "p50_ms": round(p50 * 1000, 3),
+            "p95_ms": round(p95 * 1000, 3), "p99_ms": round(p99 * 1000, 3),
+            "min_ms": round(durations.min() * 1000, 3), "max_ms": round(durations.max() * 1000, 3)}
+
+def run_benchmarks(corpus, iterations, only=None):
+    import main
+    from database import SessionLocal
+    from document_classifier import classify_document
+    from resume_parsing import extract_resume_skills, parse_resume, ResumeRejected
+
+    def reject(pdf):
+        try:
+            parse_resume("r.pdf", pdf)
+        except ResumeRejected:
+            return
+        raise AssertionError("non-resume PDF was accepted")
+
+    selected = [b for b in BENCHMARKS if not only or b in only]
+    results = {}
+    db = SessionLocal()
+    try:
+        cases = {
+            "extract_text_from_pdf": (main.extract_text_from_pdf, corpus["pdfs"], max(iterations // 5, 10)),
+            "extract_text_from_docx": (main.extract_text_from_docx, corpus["docxs"], max(iterations // 5, 10)),
+            "skill_extraction": (extract_resume_skills, corpus["texts"], iterations),
+            "parse_resume": (lambda pdf: parse_resume("r.pdf", pdf), corpus["pdfs"], max(iterations // 5, 10)),
+            "classify_document": (lambda sample: classify_document(sample[0], sample[1]), corpus["classification"], iterations),
+            "reject_non_resume": (reject, corpus["non_resume_pdfs"], max(iterations // 5, 10)),
+            "ats_check": (lambda pair: main.ats_check(main.ATSRequest(resume_text=pair[0], job_description=pair[1]), db),
+                          [(t, jd) for t in corpus["texts"][:4] for jd in corpus["jds"]], iterations),
+            # Uncached entry points: the endpoints themselves would mostly measure cache hits
+            "search_jobs": (lambda skills: main._search_jobs(skills, "full_time", 50, "keyword", db),
+                            [sorted(extract_resume_skills(t))[:12] or ["python"] for t in corpus["texts"]], iterations),
+            "evaluate_interview": (lambda tr: main.evaluate_interview(main.InterviewEval(transcript=tr), db),
+                                   corpus["transcripts"], iterations),
+            "get_analytics": (lambda _: main.build_analytics(db), [None], max(iterations // 5, 10)),
+        }
+        for name in selected:
+            fn, inputs, n = cases[name]
+            if name == "search_jobs":
+                t0 = time.perf_counter()
+                fn(inputs[0]) # first query loads the ranker index
+                cold = time.perf_counter() - t0
+            print(f"  {name} ...", file=sys.stderr, flush=True)
+            results[name] = measure(fn, inputs, n)
+            if name == "search_jobs":
+                results[name]["cold_ms"] = round(cold * 1000, 3)
+            if name == "classify_document":
+                results[name]["accuracy"] = classification_accuracy(corpus["classification"])
+    finally:
+        db.close()
+    return results
+
+
+def classification_accuracy(samples):
+    from document_classifier import classify_document
+    per_class = {}
+    for text, has_images, expected in samples:
+        hits, total = per_class.get(expected, (0, 0))
+        per_class[expected] = (hits + (classify_document(text, has_images)[0] == expected), total + 1)
+    overall = sum(h for h, _ in per_class.values()) / sum(t for _, t in per_class.values())
+    return {"overall": round(overall, 4), **{label: round(h / t, 4) for label, (h, t) in sorted(per_class.items())}}
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except Exception:
+        return None
+
+def compare(current, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\n{'benchmark':<24}{'p50 before':>12}{'p50 after':>12}{'p95 before':>12}{'p95 after':>12}{'change':>9}", file=sys.stderr)
+    for name, res in current["results"].items():
+        old = baseline.get("results", {}).get(name)
+        if not old:
+            continue
+        change = (res["p50_ms"] / old["p50_ms"] - 1) * 100 if old["p50_ms"] else 0.0
+        print(f"{name:<24}{old['p50_ms']:>12.3f}{res['p50_ms']:>12.3f}{old['p95_ms']:>12.3f}{res['p95_ms']:>12.3f}{change:>+8.1f}%", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark backend hot paths on a seeded synthetic dataset.")
+    parser.add_argument("--rows", type=int, default=10000, help="Activity rows to seed (e.g. 10000, 100000, 1000000)")
+    parser.add_argument("--job-rows", type=int, default=None, help="Job rows to seed (default: same as --rows)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--only", nargs="*", choices=BENCHMARKS)
+    parser.add_argument("--db", help="SQLite file to use (default: benchmark_data/bench_<rows>_<job_rows>_<seed>.db)")
+    parser.add_argument("--reseed", action="store_true", help="Recreate the database even if it exists")
+    parser.add_argument("--out", help="Write JSON results here (default: stdout)")
+    parser.add_argument("--compare", help="Previous results JSON to compare against")
+    args = parser.parse_args()
+    job_rows = args.rows if args.job_rows is None else args.job_rows
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    db_path = args.db or os.path.join(DATA_DIR, f"bench_{args.rows}_{job_rows}_{args.seed}.db")
+    if args.reseed and os.path.exists(db_path):
+        os.unlink(db_path)
+    fresh = not os.path.exists(db_path)
+    # database.py reads these at import time; keep benchmark rows out of the real DB and uploads
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.setdefault("UPLOAD_DIR", os.path.join(DATA_DIR, "uploads"))
+    os.environ.setdefault("SEMANTIC_INDEX_DIR", os.path.join(DATA_DIR, "semantic_index"))
+
+    from database import init_db
+    init_db()
+    seeded = None
+    if fresh:
+        print(f"Seeding {db_path}: {args.rows} activities, {job_rows} jobs ...", file=sys.stderr, flush=True)
+        t0 = time.perf_counter()
+        seeded = seed_database(args.rows, job_rows, args.seed)
+        seeded["seconds"] = round(time.perf_counter() - t0, 2)
+
+    print("Generating corpus ...", file=sys.stderr, flush=True)
+    corpus = build_corpus(args.seed)
+    print("Running benchmarks ...", file=sys.stderr, flush=True)
+    report = {
+        "commit": _git_commit(),
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "rows": args.rows,
+        "job_rows": job_rows,
+        "seed": args.seed,
+        "iterations": args.iterations,
+        "seeded": seeded,
+        "results": run_benchmarks(corpus, args.iterations, args.only),
+    }
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    if args.compare:
+        compare(report, args.compare)
@@ -0,0 +1,251 @@
+"""
+Content-addressed storage for uploaded resumes.
+
+Files are stored once per distinct content under uploads/blobs/<aa>/<bb>/<sha256><ext>
+(two levels of 256-way sharding keep every directory small), written via a temp file +
+os.replace so readers never see a partial file. A new blob's file is written when the
+session that added its row commits, so a rolled-back upload leaves no orphan file behind.
+The resume_blobs table holds metadata and
+a reference count of the user_activities rows that point at each blob; /admin/stats reads
+its counts from there instead of listing the directory.
+
+CLI:
+    python blob_store.py import-legacy   # move flat uploads/<timestamp>_<name> files into the store
+"""
+import hashlib
+import os
+import re
+import tempfile
+from datetime import datetime
+
+from sqlalchemy import event, func, case, select, update, bindparam
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database import ResumeBlob, UserActivity
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "./uploads")
+BLOB_SUBDIR = "blobs"
+# Flat uploads/<timestamp>_<name> files from before the blob store (still served by the /uploads mount)
+LEGACY_UPLOAD_NAME = re.compile(r"^\d{14}_[^/\\]+$")
+# Month zips written by upload_retention; outside UPLOAD_DIR so the /uploads mount never exposes them
+ARCHIVE_DIR = os.getenv("RETENTION_ARCHIVE_DIR", "./upload_archive")
+CONTENT_TYPES = {
+    ".pdf": "application/pdf",
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+}
+
+
+def content_hash(contents: bytes) -> str:
+    return hashlib.sha256(contents).hexdigest()
+
+def blob_rel_path(sha256: str, ext: str) -> str:
+    return "/".join((BLOB_SUBDIR, sha256[:2], sha256[2:4], f"{sha256}{ext}"))
+
+def blob_abs_path(rel_path: str) -> str:
+    return os.path.join(UPLOAD_DIR, *rel_path.split("/"))
+
+def archive_abs_path(archive_path: str) -> str:
+    """archive_path is the zip's name inside ARCHIVE_DIR (ResumeBlob.archive_path)."""
+    return os.path.join(ARCHIVE_DIR, os.path.basename(archive_path))
+
+def _write_atomic(path: str, contents: bytes):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(contents)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+# --- CHANGE NOTIFICATIONS ---
+# admin_stats keeps count_resumes() in memory and registers here to hear about changes.
+_resume_listeners = []
+
+def add_resume_listener(fn):
+    """fn(delta) is called after a commit changes the number of referenced resumes by delta."""
+    _resume_listeners.append(fn)
+
+def _note_referenced(db: Session, delta: int):
+    if delta:
+        db.info[_REFERENCED_DELTA] = db.info.get(_REFERENCED_DELTA, 0) + delta
+
+
+# --- DEFERRED WRITES ---
+# path -> contents of new blobs, kept on the session until its transaction ends
+_PENDING_WRITES = "blob_store.pending_writes"
+_REFERENCED_DELTA = "blob_store.referenced_delta"
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    delta = session.info.pop(_REFERENCED_DELTA, 0)
+    for fn in list(_resume_listeners) if delta else ():
+        try:
+            fn(delta)
+        except Exception as e:
+            print(f"Resume listener failed: {e}")
+
+    failed = None
+    for path, contents in session.info.pop(_PENDING_WRITES, {}).items():
+        if os.path.exists(path):
+            continue
+        try:
+            _write_atomic(path, contents)
+        except OSError as e:
+            # The row is committed; the next upload of the same content rewrites the file
+            failed = failed or e
+    if failed:
+        raise failed
+
+@event.listens_for(Session, "after_transaction_end")
+def _drop_pending(session, transaction):
+    if transaction.parent is None:
+        # Rolled back or closed uncommitted; a commit has already consumed both
+        session.info.pop(_PENDING_WRITES, None)
+        session.info.pop(_REFERENCED_DELTA, None)
+
+
+def put_blob(db: Session, contents: bytes, filename: str) -> ResumeBlob:
+    """
+    Store contents (if new) and return its ResumeBlob row. Does not add a reference; caller commits,
+    and the file of a new blob is written by that commit.
+    """
+    sha = content_hash(contents)
+    ext = os.path.splitext(filename or "")[1].lower()
+    blob = db.get(ResumeBlob, sha)
+    if blob is not None:
+        if not os.path.exists(blob_abs_path(blob.rel_path)):
+            _write_atomic(blob_abs_path(blob.rel_path), contents) # self-heal a swept/archived file
+            blob.archive_path = None
+        blob.last_used_at = datetime.utcnow()
+        return blob
+
+    rel_path = blob_rel_path(sha, ext)
+    row = dict(
+        sha256=sha,
+        rel_path=rel_path,
+        size=len(contents),
+        content_type=CONTENT_TYPES.get(ext, "application/octet-stream"),
+        original_name=filename,
+        ref_count=0,
+        created_at=datetime.utcnow(),
+        last_used_at=datetime.utcnow(),
+    )
+    insert_new = _insert_if_absent(db.get_bind().dialect.name)
+    if insert_new is not None:
+        # ON CONFLICT instead of a savepoint: pysqlite has no transaction open before the first
+        # write, so a SAVEPOINT there would commit on release and survive the caller's rollback
+        if db.execute(insert_new.values(**row)).rowcount == 0:
+            # Another worker stored the same content concurrently (and writes the file on its commit)
+            return db.get(ResumeBlob, sha)
+        blob = db.get(ResumeBlob, sha)
+    else:
+        blob = ResumeBlob(**row)
+        try:
+            with db.begin_nested():
+                db.add(blob)
+        except IntegrityError:
+            return db.get(ResumeBlob, sha)
+    db.info.setdefault(_PENDING_WRITES, {})[blob_abs_path(rel_path)] = contents
+    return blob
+
+def _insert_if_absent(dialect_name: str):
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert(ResumeBlob.__table__).on_conflict_do_nothing(index_elements=["sha256"])
+
+def add_ref(db: Session, sha256: str, count: int = 1):
+    previous = db.query(ResumeBlob.ref_count).filter(ResumeBlob.sha256 == sha256).scalar()
+    if previous is not None and previous <= 0 < count:
+        _note_referenced(db, 1)
+    db.query(ResumeBlob).filter(ResumeBlob.sha256 == sha256).update(
+        {ResumeBlob.ref_count: ResumeBlob.ref_count + count, ResumeBlob.last_used_at: datetime.utcnow()},
+        synchronize_session=False,
+    )
+
+def release_activity_refs(db: Session, activity_filter=None, table=None) -> int:
+    """
+    Decrement blob ref counts for the activities matched by activity_filter (before deleting them).
+    table defaults to user_activities; partitions.py passes its monthly partitions / archive tables.
+    """
+    table = UserActivity.__table__ if table is None else table
+    query = select(table.c.file_hash, func.count()).where(table.c.file_hash.isnot(None))
+    if activity_filter is not None:
+        query = query.where(activity_filter)
+    counts = db.execute(query.group_by(table.c.file_hash)).all()
+    if counts:
+        blobs = ResumeBlob.__table__
+        # Blobs this release leaves unreferenced (admin_stats' resume count)
+        released = 0
+        for start in range(0, len(counts), 500):
+            chunk = dict(counts[start:start + 500])
+            for sha, ref_count in db.execute(select(blobs.c.sha256, blobs.c.ref_count).where(blobs.c.sha256.in_(list(chunk)))):
+                if 0 < ref_count <= chunk[sha]:
+                    released += 1
+        _note_referenced(db, -released)
+        # One executemany instead of an UPDATE round trip per blob
+        n = bindparam("n")
+        db.execute(
+            update(blobs).where(blobs.c.sha256 == bindparam("sha"))
+            .values(ref_count=case((blobs.c.ref_count > n, blobs.c.ref_count - n), else_=0)),
+            [{"sha": sha, "n": count} for sha, count in counts],
+        )
+    return sum(count for _, count in counts)
+
+def count_resumes(db: Session) -> int:
+    """Distinct stored resumes that are still referenced by at least one activity."""
+    return db.query(func.count(ResumeBlob.sha256)).filter(ResumeBlob.ref_count > 0).scalar() or 0
+
+
+# --- LEGACY IMPORT ---
+
+_LEGACY_NAME = re.compile(r"^\d{14}_.+\.(pdf|docx)$", re.IGNORECASE)
+
+def import_legacy(db: Session) -> dict:
+    """Move flat uploads/<timestamp>_<name> files into the blob store and relink their activities."""
+    moved = linked = 0
+    for name in sorted(os.listdir(UPLOAD_DIR)):
+        path = os.path.join(UPLOAD_DIR, name)
+        if not os.path.isfile(path) or not _LEGACY_NAME.match(name):
+            continue
+        with open(path, "rb") as f:
+            contents = f.read()
+        blob = put_blob(db, contents, name.split("_", 1)[1])
+        activities = db.query(UserActivity).filter(UserActivity.details.contains(f"(Saved: {name})")).all()
+        for act in activities:
+            act.details = act.details.replace(f"(Saved: {name})", f"(Saved: {blob.rel_path})")
+            act.file_hash = blob.sha256
+        if activities:
+            add_ref(db, blob.sha256, len(activities))
+        db.commit()
+        os.unlink(path)
+        moved += 1
+        linked += len(activities)
+    return {"files": moved, "activities": linked}
+
+
+if __name__ == "__main__":
+    import argparse
+    from database import init_db, SessionLocal
+
+    parser = argparse.ArgumentParser(description="Resume blob store maintenance.")
+    parser.add_argument("command", choices=["import-legacy"])
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    try:
+        print(import_legacy(db))
+    finally:
+        db.close()
@@ -0,0 +1,352 @@
+"""
+In-process caching with per-namespace budgets.
+
+Every cache in the app is a named namespace created through get_cache(), so memory use
+is the sum of the configured budgets rather than whatever the dicts grow to:
+
+    search = get_cache("search", ttl=60, max_bytes=16 * MB, policy="lru")
+    result = search.get_or_load(key, lambda: expensive(key))            # single-flight
+    payload = await adzuna.aget_or_load(key, fetch_page)                 # async single-flight
+
+Each namespace has a TTL, a byte budget (sizes are estimated when an entry is stored), LRU
+or LFU eviction (both O(1)), and single-flight loading: concurrent misses on the same key
+wait for one loader instead of stampeding the database. Hits, misses, loads, evictions and
+expirations are exported through metrics.py (cache_* series on /metrics) and cache_stats().
+
+Namespaces created with shared=True live in a shared backend when CACHE_BACKEND is set, so
+all gunicorn/uvicorn workers see the same entries (OTP codes, Adzuna pages):
+    CACHE_BACKEND=redis://localhost:6379/0   Redis (needs the optional `redis` package)
+    CACHE_BACKEND=memory://                  in-process stand-in with the same semantics
+Without CACHE_BACKEND every namespace is local to its worker.
+
+Per-namespace overrides: CACHE_<NAME>_TTL, CACHE_<NAME>_MAX_BYTES.
+"""
+import asyncio
+import os
+import pickle
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import Counter, Gauge
+
+MB = 1024 * 1024
+CACHE_BACKEND = os.getenv("CACHE_BACKEND")
+
+CACHE_REQUESTS = Counter("cache_requests_total", "Cache lookups by namespace and result (hit/miss).", ("namespace", "result"))
+CACHE_EVICTIONS = Counter("cache_evictions_total", "Entries dropped by namespace and reason (budget/expired).", ("namespace", "reason"))
+CACHE_LOADS = Counter("cache_loads_total", "Loader calls made on a miss (after single-flight).", ("namespace",))
+CACHE_BYTES = Gauge("cache_bytes", "Estimated bytes held per namespace.", ("namespace",))
+
+_MISSING = object()
+
+
+def estimate_size(obj, _depth=0):
+    """Rough deep size in bytes; good enough for budgeting, cheap enough to run on every set."""
+    size = sys.getsizeof(obj)
+    if _depth > 4:
+        return size
+    if isinstance(obj, dict):
+        size += sum(estimate_size(k, _depth + 1) + estimate_size(v, _depth + 1) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(v, _depth + 1) for v in obj)
+    elif hasattr(obj, "__dict__") and not isinstance(obj, type):
+        size += estimate_size(vars(obj), _depth + 1)
+    return size
+
+
+# --- SHARED BACKENDS ---
+
+class MemoryBackend:
+    """Stand-in for a shared store: one process-wide dict, values pickled like they would be over the wire."""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return _MISSING
+            if entry[0] < time.time():
+                del self._data[key]
+                return _MISSING
+        return pickle.loads(entry[1])
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.time() + ttl, pickle.dumps(value))
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self, prefix):
+        with self._lock:
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[key]
+
+
+class RedisBackend:
+    def __init__(self, url):
+        import redis # optional dependency, only needed when CACHE_BACKEND=redis://...
+        self._redis = redis.Redis.from_url(url)
+
+    def get(self, key):
+        raw = self._redis.get(key)
+        return _MISSING if raw is None else pickle.loads(raw)
+
+    def set(self, key, value, ttl):
+        self._redis.set(key, pickle.dumps(value), ex=max(int(ttl), 1))
+
+    def delete(self, key):
+        self._redis.delete(key)
+
+    def clear(self, prefix):
+        for key in self._redis.scan_iter(match=prefix + "*", count=500):
+            self._redis.delete(key)
+
+
+def _make_backend(url):
+    if not url:
+        return None
+    if url.startswith("memory://"):
+        return MemoryBackend()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    raise ValueError(f"Unsupported CACHE_BACKEND: {url}")
+
+_shared_backend = _make_backend(CACHE_BACKEND)
+
+
+# --- NAMESPACES ---
+
+class _Entry:
+    __slots__ = ("value", "expires", "size", "freq")
+
+    def __init__(self, value, expires, size):
+        self.value = value
+        self.expires = expires
+        self.size = size
+        self.freq = 1
+
+
+class Cache:
+    def __init__(self, name, ttl=60, max_bytes=8 * MB, policy="lru", shared=False):
+        if policy not in ("lru", "lfu"):
+            raise ValueError("policy must be 'lru' or 'lfu'")
+        env = name.upper()
+        self.name = name
+        self.ttl = float(os.getenv(f"CACHE_{env}_TTL", ttl))
+        self.max_bytes = int(os.getenv(f"CACHE_{env}_MAX_BYTES", max_bytes))
+        self.policy = policy
+        self.backend = _shared_backend if shared else None
+        self._lock = threading.RLock()
+        self._entries = {}
+        self._lru = OrderedDict()     # lru: key -> None, oldest first
+        self._freq = {}               # lfu: frequency -> OrderedDict of keys
+        self._min_freq = 0
+        self._bytes = 0
+        self._inflight = {}           # key -> threading.Event (sync single-flight)
+        self._ainflight = {}          # key -> asyncio.Future (async single-flight)
+        self.stats = {"hits": 0, "misses": 0, "loads": 0, "evictions": 0, "expirations": 0}
+
+    def _backend_key(self, key):
+        return f"lp:{self.name}:{key!r}"
+
+    def _record(self, result):
+        self.stats["hits" if result == "hit" else "misses"] += 1
+        CACHE_REQUESTS.inc((self.name, result))
+
+    # --- eviction bookkeeping (caller holds the lock) ---
+
+    def _touch(self, key, entry):
+        if self.policy == "lru":
+            self._lru.move_to_end(key)
+            return
+        bucket = self._freq[entry.freq]
+        del bucket[key]
+        if not bucket:
+            del self._freq[entry.freq]
+            if self._min_freq == entry.freq:
+                self._min_freq += 1
+        entry.freq += 1
+        self._freq.setdefault(entry.freq, OrderedDict())[key] = None
+
+    def _link(self, key, entry):
+        if self.policy == "lru":
+            self._lru[key] = None
+        else:
+            self._freq.setdefault(1, OrderedDict())[key] = None
+            self._min_freq = 1
+
+    def _unlink(self, key, entry):
+        if self.policy == "lru":
+            self._lru.pop(key, None)
+        else:
+            bucket = self._freq.get(entry.freq)
+            if bucket is not None:
+                bucket.pop(key, None)
+                if not bucket:
+                    del self._freq[entry.freq]
+
+    def _remove(self, key, reason=None):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._unlink(key, entry)
+        self._bytes -= entry.size
+        CACHE_BYTES.dec((self.name,), entry.size)
+        if reason:
+            self.stats["evictions" if reason == "budget" else "expirations"] += 1
+            CACHE_EVICTIONS.inc((self.name, reason))
+
+    def _victim(self):
+        if self.policy == "lru":
+            return next(iter(self._lru))
+        while self._min_freq not in self._freq:
+            self._min_freq = min(self._freq)
+        return next(iter(self._freq[self._min_freq]))
+
+    # --- public API ---
+
+    def get(self, key, default=None):
+        if self.backend is not None:
+            value = self.backend.get(self._backend_key(key))
+            self._record("miss" if value is _MISSING else "hit")
+            return default if value is _MISSING else value
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires < time.monotonic():
+                self._remove(key, "expired")
+                entry = None
+            if entry is None:
+                self._record("miss")
+                return default
+            self._touch(key, entry)
+            self._record("hit")
+            return entry.value
+
+    def set(self, key, value, ttl=None, size=None):
+        ttl = self.ttl if ttl is None else ttl
+        if self.backend is not None:
+            self.backend.set(self._backend_key(key), value, ttl)
+            return
+        size = size if size is not None else estimate_size(value)
+        if size > self.max_bytes:
+            return # would evict everything else; not worth caching
+        with self._lock:
+            self._remove(key)
+            while self._entries and self._bytes + size > self.max_bytes:
+                self._remove(self._victim(), "budget")
+            entry = self._entries[key] = _Entry(value, time.monotonic() + ttl, size)
+            self._link(key, entry)
+            self._bytes += size
+            CACHE_BYTES.inc((self.name,), size)
+
+    def delete(self, key):
+        if self.backend is not None:
+            self.backend.delete(self._backend_key(key))
+            return
+        with self._lock:
+            self._remove(key)
+
+    def pop(self, key, default=None):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            return default
+        self.delete(key)
+        return value
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear(f"lp:{self.name}:")
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+
+    def get_or_load(self, key, loader, ttl=None):
+        """Return the cached value or call loader() once, even if many threads miss at the same time."""
+        while True:
+            value = self.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+            with self._lock:
+                event = self._inflight.get(key)
+                if event is None:
+                    event = self._inflight[key] = threading.Event()
+                    leader = True
+                else:
+                    leader = False
+            if not leader:
+                event.wait()
+                continue # re-read; if the leader failed we try to load ourselves
+            try:
+                self.stats["loads"] += 1
+                CACHE_LOADS.inc((self.name,))
+                value = loader()
+                if value is not None:
+                    self.set(key, value, ttl)
+                return value
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+                event.set()
+
+    async def aget_or_load(self, key, loader, ttl=None):
+        """Async variant: loader is a coroutine function; concurrent awaiters share one call."""
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        loop = asyncio.get_running_loop()
+        fut = self._ainflight.get(key)
+        if fut is not None and fut.get_loop() is loop:
+            return await asyncio.shield(fut)
+        fut = self._ainflight[key] = loop.create_future()
+        try:
+            self.stats["loads"] += 1
+            CACHE_LOADS.inc((self.name,))
+            value = await loader()
+            if value is not None:
+                self.set(key, value, ttl)
+            fut.set_result(value)
+            return value
+        except BaseException as e:
+            fut.set_exception(e)
+            fut.exception() # mark retrieved when nobody else was waiting
+            raise
+        finally:
+            if self._ainflight.get(key) is fut:
+                del self._ainflight[key]
+
+    def info(self):
+        with self._lock:
+            return {"name": self.name, "policy": self.policy, "ttl": self.ttl, "max_bytes": self.max_bytes,
+                    "bytes": self._bytes, "entries": len(self._entries),
+                    "backend": type(self.backend).__name__ if self.backend else "local", **self.stats}
+
+
+_caches = {}
+_registry_lock = threading.Lock()
+
+def get_cache(name, **config) -> Cache:
+    """Return the namespace `name`, creating it with config on first use."""
+    with _registry_lock:
+        cache = _caches.get(name)
+        if cache is None:
+            cache = _caches[name] = Cache(name, **config)
+        return cache
+
+def cache_stats():
+    with _registry_lock:
+        caches = list(_caches.values())
+    return [c.info() for c in caches]
+
+def clear_cache(name=None):
+    with _registry_lock:
+        caches = [c for n, c in _caches.items() if name is None or n == name]
+    for cache in caches:
+        cache.clear()
+    return len(caches)
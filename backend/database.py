@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, ForeignKey, Text, Boolean, inspect, text
+from sqlalchemy import create_engine, Column, Integer, String, DateTime, ForeignKey, Text, Boolean, inspect, text, Index, Date, LargeBinary
 from sqlalchemy.orm import sessionmaker, declarative_base
 from datetime import datetime, timedelta
 import os
@@ -40,7 +40,42 @@ class JobPost(Base):
     source = Column(String, default="Internal Mock DB")
     url = Column(String, nullable=True)
     contract_type = Column(String, default="full_time") # full_time, internship, contractor
-    date_posted = Column(DateTime, default=datetime.utcnow)
+    date_posted = Column(DateTime, default=datetime.utcnow, index=True)
+    content_hash = Column(String, unique=True, index=True, nullable=True) # sha1(title|company|location), used for dedupe/upsert
+
+class JobSkill(Base):
+    # Inverted skill index: one row per (job, skill) so matching jobs by skill is an index lookup
+    __tablename__ = "job_skills"
+
+    job_id = Column(Integer, ForeignKey("jobs.id", ondelete="CASCADE"), primary_key=True)
+    skill = Column(String, primary_key=True, index=True)
+
+class ArchivedJobPost(Base):
+    # Expired postings moved out of the hot jobs table by the refresh scheduler
+    __tablename__ = "jobs_archive"
+
+    id = Column(Integer, primary_key=True)
+    job_id = Column(Integer, index=True) # id the row had in jobs
+    title = Column(String)
+    company = Column(String)
+    location = Column(String)
+    description = Column(Text)
+    skills_required = Column(String)
+    source = Column(String)
+    url = Column(String, nullable=True)
+    contract_type = Column(String)
+    date_posted = Column(DateTime)
+    content_hash = Column(String, index=True, nullable=True)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+class JobSyncState(Base):
+    # Per-source high-water mark for incremental job refreshes
+    __tablename__ = "job_sync_state"
+
+    source = Column(String, primary_key=True)
+    high_water_mark = Column(DateTime, nullable=True) # newest date_posted seen from this source
+    last_run = Column(DateTime, nullable=True)
+    last_status = Column(String, nullable=True)
 
 class User(Base):
     __tablename__ = "users"
@@ -64,7 +99,7 @@ class SystemLog(Base):
     id = Column(Integer, primary_key=True, index=True)
     level = Column(String) # INFO, WARN, ERROR, SYSTEM
     message = Column(String)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, default=datetime.utcnow, index=True) # newest-first reads, monthly partitions
 
 class Message(Base):
     __tablename__ = "messages"
@@ -86,6 +121,32 @@ class UserActivity(Base):
     activity_type = Column(String) # 'resume_upload', 'ats_check', 'interview_attempt'
     details = Column(String) # Filename or outcome
     timestamp = Column(DateTime, default=datetime.utcnow)
+    file_hash = Column(String, nullable=True, index=True) # resume_blobs.sha256 for upload activities
+
+    __table_args__ = (Index("ix_user_activities_type_ts", "activity_type", "timestamp"),)
+
+class ResumeBlob(Base):
+    # Content-addressed resume store (see blob_store.py); one row per distinct file
+    __tablename__ = "resume_blobs"
+
+    sha256 = Column(String, primary_key=True)
+    rel_path = Column(String) # relative to the uploads dir, e.g. blobs/ab/cd/<sha256>.pdf
+    size = Column(Integer)
+    content_type = Column(String)
+    original_name = Column(String) # first name it was uploaded under
+    ref_count = Column(Integer, default=0) # number of user_activities rows pointing at it
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow)
+    archive_path = Column(String, nullable=True) # zip name in RETENTION_ARCHIVE_DIR once compacted by retention
+
+class DailyVisitors(Base):
+    # Distinct visitors per UTC day as a bitmap over user ids (see visitor_sketches.py)
+    __tablename__ = "daily_visitors"
+
+    day = Column(Date, primary_key=True)
+    bitmap = Column(LargeBinary) # zlib-compressed packbits, little-endian: bit i = user i visited, bit 0 = guests
+    visitors = Column(Integer, default=0) # bits set (admins included; they are masked out when queried)
+    updated_at = Column(DateTime, default=datetime.utcnow)
 
 import bcrypt
 
@@ -102,6 +163,32 @@ def init_db():
             if 'deletion_reason' not in columns:
                 print("MIGRATION: Adding deletion_reason column...")
                 conn.execute(text("ALTER TABLE users ADD COLUMN deletion_reason VARCHAR"))
+
+            if inspector.has_table('jobs'):
+                job_columns = [c['name'] for c in inspector.get_columns('jobs')]
+                if 'content_hash' not in job_columns:
+                    print("MIGRATION: Adding jobs.content_hash column...")
+                    conn.execute(text("ALTER TABLE jobs ADD COLUMN content_hash VARCHAR"))
+                    conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_jobs_content_hash ON jobs (content_hash)"))
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_jobs_date_posted ON jobs (date_posted)"))
+
+            if inspector.has_table('user_activities'):
+                activity_columns = [c['name'] for c in inspector.get_columns('user_activities')]
+                if 'file_hash' not in activity_columns:
+                    print("MIGRATION: Adding user_activities.file_hash column...")
+                    conn.execute(text("ALTER TABLE user_activities ADD COLUMN file_hash VARCHAR"))
+                    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_user_activities_file_hash ON user_activities (file_hash)"))
+                # Analytics window scans (activity_columns.py): type + time range
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_user_activities_type_ts ON user_activities (activity_type, timestamp)"))
+
+            if inspector.has_table('system_logs'):
+                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_system_logs_timestamp ON system_logs (timestamp)"))
+
+            if inspector.has_table('resume_blobs'):
+                blob_columns = [c['name'] for c in inspector.get_columns('resume_blobs')]
+                if 'archive_path' not in blob_columns:
+                    print("MIGRATION: Adding resume_blobs.archive_path column...")
+                    conn.execute(text("ALTER TABLE resume_blobs ADD COLUMN archive_path VARCHAR"))
             conn.commit()
 
         # Check for UserActivity table creation (done by create_all usually, but if DB exists, new tables might be missed in some older setups, though create_all handles missing tables)
@@ -111,6 +198,12 @@ def init_db():
         print(f"Migration Check Failed (Ignore if first run): {e}")
 
     Base.metadata.create_all(bind=engine)
+    # Monthly partitions for user_activities / system_logs (Postgres; converts plain tables once)
+    try:
+        from partitions import ensure_layout
+        ensure_layout()
+    except Exception as e:
+        print(f"Partition setup failed (retried by the maintenance thread): {e}")
     
     db = SessionLocal()
     
@@ -180,6 +273,12 @@ def init_db():
         db.add(admin_user)
         db.commit()
 
+    # Seeded / admin-created jobs from before bulk ingestion have no content_hash or job_skills rows
+    from job_ingest import backfill_job_index
+    backfilled = backfill_job_index(db)
+    if backfilled:
+        print(f"MIGRATION: Indexed content hashes / skills of {backfilled} jobs")
+
     db.close()
 
 def get_db():
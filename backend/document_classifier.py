@@ -0,0 +1,83 @@
+"""
+Upload document-type classifier: resume, offer letter, scanned image or other.
+
+Runs on the first page of a PDF (or the first DOCX paragraphs) before the rest of the
+file is extracted, so offer letters and the like are rejected without a full parse or
+skill extraction. It is a small linear model over hand-picked features:
+
+  phrases   one precompiled alternation of every weighted phrase (offer-letter wording,
+            resume vocabulary), matched in a single scan; each distinct phrase counts once
+  patterns  e-mail, phone number, "2019 - Present" date ranges, salutation
+  sections  distinct section headings found by resume_sections.segment
+
+Scores go through a softmax against a constant "other" score; the winning class and its
+probability are returned. A page with images and (almost) no text is a scanned image;
+(almost) no text and no images is "other" with confidence 0, i.e. undecided.
+benchmark.py --only classify_document reports latency and accuracy on a synthetic corpus.
+"""
+import math
+import re
+
+from resume_sections import segment, section_kinds
+
+HEAD_CHARS = 4000          # classify at most this much of the first page
+SCANNED_MAX_CHARS = 50     # less text than this on a page with images: scanned
+OTHER_SCORE = 2.0          # constant score of "other"; the evidence needed to call anything else
+SECTION_WEIGHT = 1.0       # per distinct section heading kind (resume), up to MAX_SECTIONS
+MAX_SECTIONS = 4
+
+PHRASES = {
+    "offer_letter": {
+        "offer of employment": 3.0, "offer letter": 3.0, "appointment letter": 3.0, "letter of appointment": 3.0,
+        "we are pleased to offer": 3.0, "pleased to appoint": 3.0, "acceptance of offer": 2.0,
+        "salary breakdown": 2.0, "ctc breakdown": 2.0, "annual ctc": 1.5, "cost to company": 1.5,
+        "compensation details": 1.5, "joining bonus": 1.5, "date of joining": 1.5, "probation period": 1.5,
+        "terms of employment": 1.5, "employment contract": 1.5, "letter of intent": 2.0, "annexure": 1.0,
+        "relieving letter": 2.5, "resignation acceptance": 2.5, "congratulations": 1.0,
+        "human resources": 0.5, "yours sincerely": 1.0, "yours faithfully": 1.0, "sign and return": 1.5,
+    },
+    "resume": {
+        "curriculum vitae": 2.0, "resume": 1.0, "linkedin": 1.0, "github": 1.0, "portfolio": 0.5,
+        "bachelor": 0.5, "master of": 0.5, "b.tech": 0.5, "gpa": 0.5, "cgpa": 0.5, "intern": 0.5,
+        "developed": 0.25, "designed": 0.25, "implemented": 0.25, "led": 0.25,
+    },
+}
+
+PATTERNS = [
+    ("resume", 1.0, re.compile(r"[\w.+-]+@[\w-]+\.[\w.]+")),
+    ("resume", 0.5, re.compile(r"(?:\+\d{1,3}[ -]?)?\(?\d{3}\)?[ -]?\d{3}[ -]?\d{4}|\+\d{2}[ -]?\d{10}")),
+    ("resume", 1.0, re.compile(r"\b(?:19|20)\d\d\s*[-–]\s*(?:(?:19|20)\d\d|present|current)\b", re.IGNORECASE)),
+    ("offer_letter", 1.5, re.compile(r"^\s*dear\b", re.IGNORECASE | re.MULTILINE)),
+]
+
+_PHRASE_FEATURE = {phrase: (label, weight) for label, phrases in PHRASES.items() for phrase, weight in phrases.items()}
+_PHRASE_RE = re.compile(
+    r"\b(?:" + "|".join(re.escape(p) for p in sorted(_PHRASE_FEATURE, key=len, reverse=True)) + r")\b",
+    re.IGNORECASE,
+)
+
+
+def scores(text):
+    """Raw linear scores per class (before the softmax)."""
+    head = text[:HEAD_CHARS]
+    totals = {"resume": 0.0, "offer_letter": 0.0, "other": OTHER_SCORE}
+    for phrase in {m.group(0).lower() for m in _PHRASE_RE.finditer(head)}:
+        label, weight = _PHRASE_FEATURE[phrase]
+        totals[label] += weight
+    for label, weight, pattern in PATTERNS:
+        if pattern.search(head):
+            totals[label] += weight
+    totals["resume"] += SECTION_WEIGHT * min(len(section_kinds(segment(head))), MAX_SECTIONS)
+    return totals
+
+def classify_document(text, has_images=False):
+    """(label, confidence) with label one of resume, offer_letter, scanned_image, other."""
+    if len(text.strip()) < SCANNED_MAX_CHARS:
+        # An image-only page is a scan. A short text-only page (a cover line, a name and
+        # contact details) is no evidence either way: zero confidence defers to the full parse
+        return ("scanned_image", 1.0) if has_images else ("other", 0.0)
+    totals = scores(text)
+    top = max(totals.values())
+    exp = {label: math.exp(score - top) for label, score in totals.items()}
+    label = max(exp, key=exp.get)
+    return label, exp[label] / sum(exp.values())
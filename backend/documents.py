@@ -0,0 +1,50 @@
+"""
+Short-lived document handles for parsed resumes.
+
+/scan-resume returns a document_id next to the skills; /interview/generate, /ats_check
+and /search_jobs accept it instead of the resume text, so the client doesn't post the
+text back and the endpoints reuse the parse (text, skills, sections) instead of
+re-extracting it. Values derived from a document by a consumer (e.g. the ATS cleaned
+text) are memoised on the document with derived().
+
+Handles are random tokens, not content hashes, so knowing a file's hash doesn't expose
+its text. They expire DOCUMENT_TTL_SECONDS after the upload; clients get 410 and upload
+again. The namespace is shared between workers when CACHE_BACKEND is set.
+"""
+import os
+import secrets
+
+from fastapi import HTTPException
+
+from cache import get_cache, MB
+
+DOCUMENT_TTL_SECONDS = float(os.getenv("DOCUMENT_TTL_SECONDS", "1800"))
+
+document_cache = get_cache("documents", ttl=DOCUMENT_TTL_SECONDS, max_bytes=64 * MB, shared=True)
+
+
+def create_document(parsed, filename, sha256=None) -> str:
+    """Store a parse_resume() result and return its handle."""
+    doc_id = secrets.token_urlsafe(16)
+    document_cache.set(doc_id, {
+        "filename": filename,
+        "sha256": sha256,
+        "text": parsed["text"],
+        "skills": parsed["skills"],
+        "sections": parsed.get("sections", []),
+        "derived": {},
+    })
+    return doc_id
+
+def get_document(doc_id) -> dict:
+    doc = document_cache.get(doc_id)
+    if doc is None:
+        raise HTTPException(status_code=410, detail="Uploaded resume has expired. Please upload it again.")
+    return doc
+
+def derived(doc_id, doc, key, compute):
+    """compute(doc) once per document; the result is stored on the cached document."""
+    if key not in doc["derived"]:
+        doc["derived"][key] = compute(doc)
+        document_cache.set(doc_id, doc) # re-store: needed with a shared backend, harmless locally
+    return doc["derived"][key]
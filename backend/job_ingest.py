@@ -0,0 +1,325 @@
+"""
+Bulk job ingestion: stream JSONL / CSV / Adzuna-shaped payloads into the jobs table.
+
+Postings are normalized, deduplicated by a content hash of (title, company, location)
+and upserted in large batches, one transaction per batch. The job_skills index is
+rewritten for every touched job inside the same transaction.
+
+A posting without a usable date (missing or unparseable) is counted as "undated". It
+keeps the date_posted it already has, or gets the ingest time when it is new, so feeding
+the same undated posting again never makes it look fresh and it still expires.
+
+CLI usage:
+    python job_ingest.py jobs.jsonl
+    python job_ingest.py adzuna_dump.json --source Adzuna
+    cat jobs.csv | python job_ingest.py - --format csv
+"""
+import csv
+import hashlib
+import io
+import json
+import sys
+import time
+from datetime import datetime
+
+from sqlalchemy import insert, select, delete, update, func
+from sqlalchemy.orm import Session
+
+from database import engine, JobPost, JobSkill
+from skills import find_skills, split_skills
+
+BATCH_SIZE = 5000
+VALID_CONTRACT_TYPES = {"full_time", "internship", "contractor"}
+
+_JOB_COLUMNS = ("title", "company", "location", "description", "skills_required",
+                "source", "url", "contract_type", "date_posted", "content_hash")
+
+
+# --- NORMALIZATION ---
+
+def _clean(value) -> str:
+    if value is None:
+        return ""
+    return " ".join(str(value).split())
+
+def job_content_hash(title, company, location) -> str:
+    key = "|".join(_clean(v).lower() for v in (title, company, location))
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+def parse_date(value):
+    """Naive UTC datetime, or None if the value is missing or unparseable."""
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        # Store naive UTC like the rest of the schema
+        parsed = parsed.replace(tzinfo=None) - parsed.utcoffset()
+    return parsed
+
+def _display_name(value) -> str:
+    # Adzuna nests company/location as {"display_name": ...}
+    if isinstance(value, dict):
+        return value.get("display_name") or ""
+    return value or ""
+
+def _contract_type(raw: dict, title: str) -> str:
+    ct = (raw.get("contract_type") or "").lower()
+    if ct in VALID_CONTRACT_TYPES:
+        return ct
+    if "intern" in title.lower() or "intern" in ct:
+        return "internship"
+    if ct in ("contract", "contractor", "temporary"):
+        return "contractor"
+    return "full_time"
+
+def normalize_posting(raw: dict, default_source: str = "Bulk Import"):
+    """Map a generic or Adzuna-shaped record to jobs-table columns. Returns None if unusable."""
+    if not isinstance(raw, dict):
+        return None
+
+    title = _clean(raw.get("title"))
+    company = _clean(_display_name(raw.get("company")))
+    location = _clean(_display_name(raw.get("location")))
+    if not title or not company:
+        return None
+
+    description = (raw.get("description") or "").strip()
+    skills = split_skills(raw.get("skills_required") or "")
+    if not skills:
+        skills = find_skills(f"{title} {description}")
+
+    return {
+        "title": title,
+        "company": company,
+        "location": location,
+        "description": description,
+        "skills_required": ", ".join(sorted(skills)),
+        "source": raw.get("source") or default_source,
+        "url": raw.get("url") or raw.get("redirect_url"),
+        "contract_type": _contract_type(raw, title),
+        "date_posted": parse_date(raw.get("date_posted") or raw.get("created")), # None: undated
+        "content_hash": job_content_hash(title, company, location),
+        "_skills": skills,
+    }
+
+
+# --- READERS ---
+
+def iter_jsonl(fp):
+    for line in fp:
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
+
+def iter_csv(fp):
+    reader = csv.DictReader(fp)
+    row = 0
+    try:
+        for row, record in enumerate(reader, 1):
+            yield record
+    except csv.Error as e:
+        # Malformed CSV (unterminated quotes, oversized fields): report where it broke.
+        # line_num counts the lines read before the failing one.
+        raise ValueError(f"CSV error in row {row + 1} (line {reader.line_num + 1}): {e}") from e
+
+def iter_json(fp):
+    # Either a plain list of postings or an Adzuna search response {"results": [...]}
+    data = json.load(fp)
+    if isinstance(data, dict):
+        data = data.get("results", [])
+    yield from data
+
+def detect_format(filename: str) -> str:
+    name = (filename or "").lower()
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith(".json"):
+        return "json"
+    return "jsonl"
+
+def iter_records(fp, fmt: str):
+    readers = {"jsonl": iter_jsonl, "csv": iter_csv, "json": iter_json}
+    if fmt not in readers:
+        raise ValueError(f"Unsupported format '{fmt}'. Use one of: {', '.join(readers)}")
+    return readers[fmt](fp)
+
+
+# --- CHANGE NOTIFICATIONS ---
+# In-memory indexes (ranking, semantic search) register here to hear about job writes.
+_job_listeners = []
+
+def add_job_listener(fn):
+    """fn(upserted_ids, removed_ids) is called after jobs are committed or removed."""
+    _job_listeners.append(fn)
+
+def notify_jobs_changed(upserted_ids=(), removed_ids=()):
+    for fn in list(_job_listeners):
+        try:
+            fn(list(upserted_ids), list(removed_ids))
+        except Exception as e:
+            print(f"Job listener failed: {e}")
+
+
+# --- UPSERT ---
+
+def _upsert_statement(dialect_name: str):
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    stmt = dialect_insert(JobPost.__table__)
+    set_ = {c: stmt.excluded[c] for c in _JOB_COLUMNS if c not in ("content_hash", "date_posted")}
+    # An undated re-ingest keeps the stored date
+    set_["date_posted"] = func.coalesce(stmt.excluded.date_posted, JobPost.__table__.c.date_posted)
+    return stmt.on_conflict_do_update(index_elements=["content_hash"], set_=set_)
+
+def _write_batch(conn, rows: list, upsert_stmt):
+    values = [{c: r[c] for c in _JOB_COLUMNS} for r in rows]
+    hashes = [r["content_hash"] for r in rows]
+    jobs = JobPost.__table__
+
+    if upsert_stmt is not None:
+        conn.execute(upsert_stmt, values)
+    else:
+        # Generic fallback: split into UPDATEs for known hashes and one bulk INSERT
+        existing = set(conn.execute(select(jobs.c.content_hash).where(jobs.c.content_hash.in_(hashes))).scalars())
+        for v in values:
+            if v["content_hash"] in existing:
+                changes = {c: value for c, value in v.items() if not (c == "date_posted" and value is None)}
+                conn.execute(update(jobs).where(jobs.c.content_hash == v["content_hash"]).values(**changes))
+        new_values = [v for v in values if v["content_hash"] not in existing]
+        if new_values:
+            conn.execute(insert(jobs), new_values)
+
+    # Rewrite the skill index for every job touched by this batch
+    ids = dict(conn.execute(select(jobs.c.content_hash, jobs.c.id).where(jobs.c.content_hash.in_(hashes))).all())
+    job_ids = list(ids.values())
+    # New undated jobs were inserted without a date: they are first seen now
+    if any(r["date_posted"] is None for r in rows):
+        conn.execute(update(jobs).where(jobs.c.id.in_(job_ids), jobs.c.date_posted.is_(None)).values(date_posted=datetime.utcnow()))
+    conn.execute(delete(JobSkill.__table__).where(JobSkill.__table__.c.job_id.in_(job_ids)))
+    skill_rows = [{"job_id": ids[r["content_hash"]], "skill": s} for r in rows for s in r["_skills"]]
+    if skill_rows:
+        conn.execute(insert(JobSkill.__table__), skill_rows)
+    return job_ids
+
+def ingest_jobs(records, source: str = "Bulk Import", batch_size: int = BATCH_SIZE, bind=None, on_batch=None) -> dict:
+    """
+    Normalize, dedupe and upsert an iterable of raw postings.
+    Returns counters: received, invalid, duplicates, upserted, undated, batches, newest (of the dated postings).
+    Listeners (and on_batch, if given) are called with the job ids of each committed batch.
+    """
+    bind = bind or engine
+    upsert_stmt = _upsert_statement(bind.dialect.name)
+    stats = {"received": 0, "invalid": 0, "duplicates": 0, "upserted": 0, "undated": 0, "batches": 0, "newest": None}
+    seen = set()
+    batch = []
+
+    def flush():
+        with bind.begin() as conn:
+            job_ids = _write_batch(conn, batch, upsert_stmt)
+        stats["upserted"] += len(batch)
+        stats["batches"] += 1
+        newest = max((r["date_posted"] for r in batch if r["date_posted"] is not None), default=None)
+        if newest is not None and (stats["newest"] is None or newest > stats["newest"]):
+            stats["newest"] = newest
+        notify_jobs_changed(upserted_ids=job_ids)
+        if on_batch:
+            on_batch(job_ids)
+        batch.clear()
+
+    for raw in records:
+        stats["received"] += 1
+        row = normalize_posting(raw, source)
+        if row is None:
+            stats["invalid"] += 1
+            continue
+        if row["content_hash"] in seen:
+            stats["duplicates"] += 1
+            continue
+        seen.add(row["content_hash"])
+        if row["date_posted"] is None:
+            stats["undated"] += 1
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush()
+
+    if batch:
+        flush()
+    return stats
+
+def ingest_file(fp, fmt: str = "jsonl", **kwargs) -> dict:
+    return ingest_jobs(iter_records(fp, fmt), **kwargs)
+
+def ingest_adzuna_results(results: list, **kwargs) -> dict:
+    """Persist the output of adzuna_client.fetch_adzuna_jobs()."""
+    kwargs.setdefault("source", "Adzuna")
+    return ingest_jobs(results, **kwargs)
+
+
+# --- SINGLE JOB HELPERS (admin CRUD) ---
+
+def index_job_skills(db: Session, job: JobPost):
+    """Keep content_hash and the job_skills rows of one ORM job in sync. Caller commits."""
+    job.content_hash = job_content_hash(job.title, job.company, job.location)
+    db.flush()
+    db.query(JobSkill).filter(JobSkill.job_id == job.id).delete(synchronize_session=False)
+    skills = split_skills(job.skills_required) or find_skills(f"{job.title} {job.description}")
+    db.add_all([JobSkill(job_id=job.id, skill=s) for s in skills])
+
+def backfill_job_index(db: Session) -> int:
+    """
+    content_hash and job_skills for jobs written before ingestion maintained them (seeds,
+    admin-created jobs). A hash already taken by another job is left unset. Commits.
+    """
+    # Ingestion and admin edits always set content_hash, so a missing one marks a job never indexed
+    jobs = db.query(JobPost).filter(JobPost.content_hash.is_(None)).all()
+    if not jobs:
+        return 0
+    taken = set(db.execute(select(JobPost.content_hash).where(JobPost.content_hash.isnot(None))).scalars())
+    has_skills = set(db.execute(select(JobSkill.job_id).where(JobSkill.job_id.in_([job.id for job in jobs]))).scalars())
+    for job in jobs:
+        if job.content_hash is None:
+            content_hash = job_content_hash(job.title, job.company, job.location)
+            if content_hash not in taken:
+                job.content_hash = content_hash
+                taken.add(content_hash)
+        if job.id not in has_skills:
+            skills = split_skills(job.skills_required) or find_skills(f"{job.title} {job.description}")
+            db.add_all([JobSkill(job_id=job.id, skill=s) for s in skills])
+    db.commit()
+    return len(jobs)
+
+
+if __name__ == "__main__":
+    import argparse
+    from database import init_db
+
+    parser = argparse.ArgumentParser(description="Bulk load job postings (JSONL, CSV or Adzuna JSON).")
+    parser.add_argument("path", help="Input file, or '-' for stdin")
+    parser.add_argument("--format", choices=["auto", "jsonl", "csv", "json"], default="auto")
+    parser.add_argument("--source", default="Bulk Import", help="Source label for records without one")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    fmt = detect_format(args.path) if args.format == "auto" else args.format
+    init_db()
+    started = time.perf_counter()
+    if args.path == "-":
+        result = ingest_file(io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8"), fmt, source=args.source, batch_size=args.batch_size)
+    else:
+        with open(args.path, encoding="utf-8", newline="") as fp:
+            result = ingest_file(fp, fmt, source=args.source, batch_size=args.batch_size)
+    elapsed = time.perf_counter() - started
+    print(f"Ingested {result['upserted']} jobs in {elapsed:.2f}s ({result['batches']} batches, "
+          f"{result['duplicates']} duplicates, {result['invalid']} invalid, {result['undated']} undated)")
@@ -0,0 +1,291 @@
+"""
+In-memory BM25 ranking of active jobs against a resume's skills.
+
+Every fresh JobPost is tokenized once into a term-frequency row (title + description
+unigrams, plus skill phrases from skills_required / the taxonomy, boosted). Rows are
+stacked into a sparse CSC matrix of BM25 weights, so ranking a resume is one sparse
+matrix-vector product over the query's columns followed by an argpartition top-k.
+
+Job writes reach the ranker through job_ingest's listener hook. A background rebuild,
+JOB_RANKER_REBUILD_DELAY seconds after the first change so bursts of writes share one,
+re-reads and re-tokenizes the changed ids (stale ones drop out), drops deletions and
+rebuilds the matrix from the cached rows (vectorized, no re-tokenizing of unchanged jobs).
+Queries read the last published snapshot and never wait for a rebuild; only the very
+first query builds the index synchronously.
+"""
+import os
+import re
+import threading
+from datetime import datetime
+from typing import NamedTuple
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+from database import SessionLocal, JobPost
+from job_ingest import add_job_listener
+from skills import find_skills, split_skills
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+SKILL_BOOST = 3 # a skill listed in skills_required counts like 3 mentions
+REBUILD_DELAY = float(os.getenv("JOB_RANKER_REBUILD_DELAY", "1.0"))
+LOAD_BATCH = 5000
+
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#.]*")
+_CONTRACT_CODES = {"full_time": 0, "internship": 1, "contractor": 2}
+
+
+def tokenize(text: str):
+    tokens = []
+    for tok in _TOKEN_RE.findall((text or "").lower()):
+        tok = tok.rstrip(".")
+        if len(tok) > 1 and tok not in ENGLISH_STOP_WORDS:
+            tokens.append(tok)
+    return tokens
+
+def _epoch(dt) -> float:
+    return (dt - datetime(1970, 1, 1)).total_seconds() if dt else 0.0
+
+
+class _Snapshot(NamedTuple):
+    # Published by a rebuild, read by queries without holding any lock
+    vocab: dict            # term -> column of matrix
+    matrix: object         # CSC, rows follow job_ids
+    job_ids: np.ndarray
+    contract: np.ndarray
+    posted: np.ndarray
+    intern: np.ndarray
+
+
+class JobRanker:
+    def __init__(self, session_factory=SessionLocal):
+        self._session_factory = session_factory
+        self._lock = threading.Lock()        # pending changes, the published snapshot, the rebuild timer
+        self._build_lock = threading.Lock()  # one refresh at a time; owns _vocab and _rows
+        self._vocab = {}   # term -> column
+        self._rows = {}    # job_id -> (cols int32 array, tf float32 array, contract_code, posted_epoch, is_intern)
+        self._reload = True
+        self._dirty_ids = set()
+        self._removed_ids = set()
+        self._snapshot = None
+        self._timer = None
+
+    # --- CHANGE TRACKING ---
+
+    def on_jobs_changed(self, upserted_ids, removed_ids):
+        with self._lock:
+            self._dirty_ids.update(upserted_ids)
+            self._removed_ids.update(removed_ids)
+            self._dirty_ids.difference_update(removed_ids)
+            self._schedule()
+
+    def invalidate(self):
+        # Next query reloads everything synchronously (e.g. after a database reset)
+        with self._lock:
+            self._reload = True
+            self._snapshot = None
+
+    def _schedule(self):
+        """Rebuild in the background after REBUILD_DELAY, batching the writes that arrive meanwhile. Caller holds the lock."""
+        if self._snapshot is None or self._timer is not None:
+            return # nothing to update yet (first query builds), or a rebuild is already pending
+        self._timer = threading.Timer(REBUILD_DELAY, self._background_refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _background_refresh(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self._refresh()
+        except Exception as e:
+            print(f"Job ranker rebuild failed (serving the previous index): {e}")
+
+    # --- INDEXING ---
+
+    def _term(self, term):
+        col = self._vocab.get(term)
+        if col is None:
+            col = self._vocab[term] = len(self._vocab)
+        return col
+
+    def _index_row(self, job_id, title, description, skills_required, contract_type, date_posted):
+        counts = {}
+        for tok in tokenize(f"{title} {description}"):
+            counts[tok] = counts.get(tok, 0) + 1
+        # Multi-word skills ("machine learning") become single terms so resume skills match them as phrases
+        for skill in find_skills(f"{title} {description}"):
+            if " " in skill:
+                counts[skill] = counts.get(skill, 0) + 1
+        for skill in split_skills(skills_required):
+            counts[skill] = counts.get(skill, 0) + SKILL_BOOST
+
+        cols = np.fromiter((self._term(t) for t in counts), dtype=np.int32, count=len(counts))
+        tf = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        is_intern = "intern" in (title or "").lower() or "intern" in (contract_type or "").lower()
+        self._rows[job_id] = (cols, tf, _CONTRACT_CODES.get(contract_type, -1), _epoch(date_posted), is_intern)
+
+    def _load(self, db, ids=None):
+        """Index fresh jobs (all of them, or only `ids`); returns the ids found."""
+        from job_scheduler import freshness_cutoff
+
+        query = db.query(JobPost.id, JobPost.title, JobPost.description, JobPost.skills_required,
+                         JobPost.contract_type, JobPost.date_posted).filter(JobPost.date_posted >= freshness_cutoff())
+        found = set()
+        if ids is None:
+            batches = [query]
+        else:
+            ids = list(ids)
+            batches = [query.filter(JobPost.id.in_(ids[i:i + LOAD_BATCH])) for i in range(0, len(ids), LOAD_BATCH)]
+        for batch in batches:
+            for row in batch.yield_per(LOAD_BATCH):
+                self._index_row(*row)
+                found.add(row[0])
+        return found
+
+    def _refresh(self):
+        """Apply the pending changes and publish a new snapshot if anything changed."""
+        with self._build_lock:
+            with self._lock:
+                reload, self._reload = self._reload, False
+                dirty, self._dirty_ids = self._dirty_ids, set()
+                removed, self._removed_ids = self._removed_ids, set()
+            try:
+                changed = self._apply(reload, dirty, removed)
+                snapshot = self._rebuild() if changed else None
+            except Exception:
+                with self._lock: # retried by the next rebuild
+                    self._reload |= reload
+                    self._dirty_ids |= dirty - self._removed_ids
+                    self._removed_ids |= removed
+                raise
+            if snapshot is not None:
+                with self._lock:
+                    self._snapshot = snapshot
+
+    def _apply(self, reload, dirty, removed):
+        if not (reload or dirty or removed):
+            return False
+        db = self._session_factory()
+        try:
+            if reload:
+                self._rows.clear()
+                self._vocab.clear()
+                self._load(db)
+                return True
+            for job_id in removed:
+                self._rows.pop(job_id, None)
+            if dirty:
+                # Updated jobs that went stale (or were deleted) leave the index
+                for job_id in dirty - self._load(db, dirty):
+                    self._rows.pop(job_id, None)
+            return True
+        finally:
+            db.close()
+
+    def _compact_vocab(self, indices):
+        """Drop terms no row uses any more once they are the majority; returns the remapped indices."""
+        used = np.unique(indices)
+        if len(self._vocab) <= 2 * len(used):
+            return indices
+        remap = np.full(len(self._vocab), -1, dtype=np.int32)
+        remap[used] = np.arange(len(used), dtype=np.int32)
+        self._vocab = {term: int(remap[col]) for term, col in self._vocab.items() if remap[col] >= 0}
+        self._rows = {job_id: (remap[row[0]],) + row[1:] for job_id, row in self._rows.items()}
+        return remap[indices]
+
+    def _rebuild(self):
+        job_ids = np.fromiter(self._rows.keys(), dtype=np.int64, count=len(self._rows))
+        rows = list(self._rows.values())
+        n_docs = len(rows)
+
+        lengths = np.fromiter((len(r[0]) for r in rows), dtype=np.int64, count=n_docs)
+        indptr = np.zeros(n_docs + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        indices = np.concatenate([r[0] for r in rows]) if rows else np.empty(0, dtype=np.int32)
+        tf = np.concatenate([r[1] for r in rows]) if rows else np.empty(0, dtype=np.float32)
+        indices = self._compact_vocab(indices)
+        n_terms = max(len(self._vocab), 1)
+
+        # BM25: idf(t) * tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / avgdl))
+        # Document lengths by row id (rows without terms, e.g. a bare "IT" title, get 0)
+        doc_len = np.bincount(np.repeat(np.arange(n_docs), lengths), weights=tf, minlength=n_docs)
+        avgdl = float(doc_len.mean()) if n_docs else 1.0
+        df = np.bincount(indices, minlength=n_terms).astype(np.float32)
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_len / (avgdl or 1.0))
+        weights = idf[indices] * tf * (BM25_K1 + 1) / (tf + np.repeat(norm, lengths))
+
+        matrix = sparse.csr_matrix((weights.astype(np.float32), indices, indptr), shape=(n_docs, n_terms))
+        return _Snapshot(
+            vocab=dict(self._vocab), # the builder keeps adding terms to its own copy
+            matrix=matrix.tocsc(),
+            job_ids=job_ids,
+            contract=np.fromiter((r[2] for r in rows), dtype=np.int8, count=n_docs),
+            posted=np.fromiter((r[3] for r in rows), dtype=np.float64, count=n_docs),
+            intern=np.fromiter((r[4] for r in rows), dtype=bool, count=n_docs),
+        )
+
+    # --- QUERY ---
+
+    def rank(self, skills, contract_type="full_time", limit=50, fresh_after=None):
+        """Return [(job_id, score)] best first, only jobs with a positive score."""
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and (self._dirty_ids or self._removed_ids or self._reload):
+                self._schedule() # e.g. a previous background rebuild failed
+        if snapshot is None:
+            # First query (or after invalidate): build synchronously; later changes rebuild in the background
+            try:
+                self._refresh()
+            except Exception as e:
+                print(f"Job ranker build failed: {e}")
+            with self._lock:
+                snapshot = self._snapshot
+            if snapshot is None:
+                return []
+
+        matrix, job_ids = snapshot.matrix, snapshot.job_ids
+        contract, posted, intern = snapshot.contract, snapshot.posted, snapshot.intern
+        cols = sorted({snapshot.vocab[t] for s in skills for t in self._query_terms(s) if t in snapshot.vocab})
+        if not cols or not len(job_ids):
+            return []
+
+        # One sparse mat-vec restricted to the query's columns
+        scores = np.asarray(matrix[:, cols].sum(axis=1)).ravel()
+
+        mask = contract == _CONTRACT_CODES.get(contract_type, -2)
+        if contract_type == "full_time":
+            mask &= ~intern
+        if fresh_after is not None:
+            mask &= posted >= _epoch(fresh_after)
+        scores = np.where(mask, scores, 0.0)
+
+        candidates = np.flatnonzero(scores > 0)
+        if not len(candidates):
+            return []
+        if len(candidates) > limit:
+            top = np.argpartition(scores[candidates], -limit)[-limit:]
+            candidates = candidates[top]
+        order = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(int(job_ids[i]), float(scores[i])) for i in order]
+
+    @staticmethod
+    def _query_terms(skill):
+        skill = (skill or "").strip().lower()
+        if not skill:
+            return []
+        return [skill] if " " in skill else tokenize(skill) or [skill]
+
+    def stats(self):
+        with self._lock:
+            snapshot = self._snapshot
+        if snapshot is None:
+            return {"jobs": 0, "terms": 0, "nnz": 0, "loaded": False}
+        return {"jobs": len(snapshot.job_ids), "terms": len(snapshot.vocab), "nnz": snapshot.matrix.nnz, "loaded": True}
+
+
+ranker = JobRanker()
+add_job_listener(ranker.on_jobs_changed)
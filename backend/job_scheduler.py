@@ -0,0 +1,234 @@
+"""
+Background job refresh: incremental Adzuna sync + batched expiry of stale postings.
+
+Run it either
+  - in-process: set JOB_SCHEDULER=inprocess (main.py starts it on startup; enable it on
+    ONE worker/instance only, otherwise every gunicorn worker runs its own copy), or
+  - as a standalone worker: `python job_scheduler.py` (loop) / `python job_scheduler.py --once`.
+
+Expired rows are moved to jobs_archive (JOB_EXPIRY_MODE=archive, default) or dropped
+(JOB_EXPIRY_MODE=delete), so the hot jobs table only ever holds fresh postings.
+If a semantic index has been built, a cycle that changed any job rebuilds it.
+"""
+import asyncio
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, insert, delete, literal
+
+from database import engine, SessionLocal, JobPost, JobSkill, ArchivedJobPost, JobSyncState, SystemLog
+from job_ingest import ingest_adzuna_results, notify_jobs_changed, parse_date
+
+JOB_MAX_AGE_DAYS = int(os.getenv("JOB_MAX_AGE_DAYS", "30"))
+JOB_EXPIRY_MODE = os.getenv("JOB_EXPIRY_MODE", "archive") # archive | delete
+EXPIRY_BATCH_SIZE = int(os.getenv("JOB_EXPIRY_BATCH_SIZE", "1000"))
+REFRESH_INTERVAL = int(os.getenv("JOB_REFRESH_INTERVAL", "3600")) # seconds
+# "what@where" pairs separated by ';', e.g. "python developer@london;react developer@"
+REFRESH_QUERIES = os.getenv("ADZUNA_REFRESH_QUERIES", "python developer@;react developer@;data analyst@")
+REFRESH_PAGES = int(os.getenv("ADZUNA_REFRESH_PAGES", "5"))
+ADZUNA_COUNTRY = os.getenv("ADZUNA_COUNTRY", "gb")
+
+_ARCHIVE_COLUMNS = ("title", "company", "location", "description", "skills_required",
+                    "source", "url", "contract_type", "date_posted", "content_hash")
+
+
+def freshness_cutoff(now=None) -> datetime:
+    return (now or datetime.utcnow()) - timedelta(days=JOB_MAX_AGE_DAYS)
+
+def parse_queries(spec: str):
+    queries = []
+    for part in (spec or "").split(";"):
+        if not part.strip():
+            continue
+        what, _, where = part.partition("@")
+        queries.append((what.strip(), where.strip()))
+    return queries
+
+
+# --- EXPIRY ---
+
+def expire_jobs(bind=None, batch_size=EXPIRY_BATCH_SIZE, mode=JOB_EXPIRY_MODE, now=None, pause=0.0) -> int:
+    """Archive/delete postings older than the freshness window, batch_size rows per transaction."""
+    bind = bind or engine
+    jobs = JobPost.__table__
+    archive = ArchivedJobPost.__table__
+    skills = JobSkill.__table__
+    cutoff = freshness_cutoff(now)
+    archived_at = datetime.utcnow()
+    total = 0
+
+    while True:
+        with bind.begin() as conn:
+            ids = conn.execute(
+                select(jobs.c.id).where(jobs.c.date_posted < cutoff).order_by(jobs.c.date_posted).limit(batch_size)
+            ).scalars().all()
+            if not ids:
+                break
+            if mode == "archive":
+                source_cols = [jobs.c.id] + [jobs.c[c] for c in _ARCHIVE_COLUMNS] + [literal(archived_at)]
+                conn.execute(insert(archive).from_select(
+                    ["job_id", *_ARCHIVE_COLUMNS, "archived_at"],
+                    select(*source_cols).where(jobs.c.id.in_(ids))
+                ))
+            conn.execute(delete(skills).where(skills.c.job_id.in_(ids)))
+            conn.execute(delete(jobs).where(jobs.c.id.in_(ids)))
+
+        total += len(ids)
+        notify_jobs_changed(removed_ids=ids)
+        if len(ids) < batch_size:
+            break
+        if pause:
+            time.sleep(pause) # yield the DB to live traffic between batches
+    return total
+
+
+# --- INCREMENTAL SYNC ---
+
+def _load_state(db, source):
+    state = db.query(JobSyncState).filter(JobSyncState.source == source).first()
+    if not state:
+        state = JobSyncState(source=source)
+        db.add(state)
+    return state
+
+def sync_adzuna(queries=None, pages=REFRESH_PAGES, country=ADZUNA_COUNTRY, client=None) -> dict:
+    """Pull postings newer than the Adzuna high-water mark and upsert them."""
+    from adzuna_client import AdzunaClient
+
+    queries = queries if queries is not None else parse_queries(REFRESH_QUERIES)
+    db = SessionLocal()
+    try:
+        state = _load_state(db, "Adzuna")
+        hwm = state.high_water_mark
+        now = datetime.utcnow()
+        if hwm:
+            max_days_old = max(1, math.ceil((now - hwm).total_seconds() / 86400))
+        else:
+            max_days_old = JOB_MAX_AGE_DAYS
+        max_days_old = min(max_days_old, JOB_MAX_AGE_DAYS)
+
+        async def fetch():
+            owned = client is None
+            c = client or AdzunaClient()
+            try:
+                if not c.configured:
+                    return {}
+                return await c.search_many(queries, country=country, pages=pages, max_days_old=max_days_old)
+            finally:
+                if owned:
+                    await c.aclose()
+
+        outcomes = asyncio.run(fetch())
+        results, errors = [], []
+        for query, outcome in outcomes.items():
+            if isinstance(outcome, Exception):
+                errors.append(f"{query[0]}@{query[1]}: {outcome}")
+            else:
+                results.extend(outcome)
+
+        # Drop anything at or below the high-water mark (Adzuna's max_days_old is day-granular)
+        if hwm:
+            results = [r for r in results if (parse_date(r.get("created")) or now) > hwm] # undated: keep
+
+        stats = ingest_adzuna_results(results)
+        if stats["newest"] and (hwm is None or stats["newest"] > hwm):
+            state.high_water_mark = stats["newest"]
+        state.last_run = now
+        state.last_status = "ok" if not errors else f"{len(errors)} queries failed"
+        db.commit()
+        stats.update({"queries": len(queries), "errors": errors, "high_water_mark": state.high_water_mark})
+        return stats
+    finally:
+        db.close()
+
+
+def run_refresh_cycle(sync=True) -> dict:
+    started = time.perf_counter()
+    summary = {}
+    if sync:
+        try:
+            summary["sync"] = sync_adzuna()
+        except Exception as e:
+            summary["sync_error"] = str(e)
+    summary["expired"] = expire_jobs(pause=0.05)
+    if summary.get("sync", {}).get("upserted") or summary["expired"]:
+        from semantic_index import semantic_index
+        if semantic_index.available: # only keep an index fresh once someone opted into it
+            try:
+                summary["semantic_index"] = semantic_index.build().get("jobs", 0)
+            except Exception as e:
+                summary["semantic_index_error"] = str(e)
+    summary["seconds"] = round(time.perf_counter() - started, 3)
+
+    db = SessionLocal()
+    try:
+        synced = summary.get("sync", {}).get("upserted", 0)
+        db.add(SystemLog(level="SYSTEM", message=f"Job refresh: {synced} synced, {summary['expired']} expired ({JOB_EXPIRY_MODE})", timestamp=datetime.utcnow()))
+        db.commit()
+    finally:
+        db.close()
+    return summary
+
+
+# --- SCHEDULER ---
+
+class JobRefreshScheduler(threading.Thread):
+    def __init__(self, interval=REFRESH_INTERVAL, sync=True):
+        super().__init__(name="job-refresh", daemon=True)
+        self.interval = interval
+        self.sync = sync
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                summary = run_refresh_cycle(sync=self.sync)
+                print(f"Job refresh cycle done: {summary}")
+            except Exception as e:
+                print(f"Job refresh cycle failed: {e}")
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+
+_scheduler = None
+
+def start_in_process_scheduler():
+    global _scheduler
+    if os.getenv("JOB_SCHEDULER", "").lower() != "inprocess" or _scheduler is not None:
+        return None
+    _scheduler = JobRefreshScheduler()
+    _scheduler.start()
+    return _scheduler
+
+def stop_in_process_scheduler():
+    global _scheduler
+    if _scheduler is not None:
+        _scheduler.stop()
+        _scheduler = None
+
+
+if __name__ == "__main__":
+    import argparse
+    from database import init_db
+
+    parser = argparse.ArgumentParser(description="Refresh jobs from Adzuna and expire stale postings.")
+    parser.add_argument("--once", action="store_true", help="Run a single cycle and exit")
+    parser.add_argument("--expire-only", action="store_true", help="Skip the Adzuna sync")
+    parser.add_argument("--interval", type=int, default=REFRESH_INTERVAL)
+    args = parser.parse_args()
+
+    init_db()
+    if args.once:
+        print(run_refresh_cycle(sync=not args.expire_only))
+    else:
+        scheduler = JobRefreshScheduler(args.interval, sync=not args.expire_only)
+        scheduler.start()
+        try:
+            while scheduler.is_alive():
+                scheduler.join(1)
+        except KeyboardInterrupt:
+            scheduler.stop()
@@ -0,0 +1,326 @@
+"""
+Load generator with a realistic traffic mix, run against a locally started app.
+
+Traffic is modelled per open browser tab and per admin dashboard, the way the frontend
+actually behaves:
+    heartbeat    GET  /auth/verify/{id}   every 30 s per tab (App.jsx)
+    log_visit    POST /log-visit          once per page load (Home.jsx)
+    login        POST /login              bcrypt verify
+    upload       POST /scan-resume        PDF resume (1-4 pages)
+    ats_check    POST /ats_check          resume text vs job description
+    admin_poll   GET  /admin/snapshot     every 5 s per open dashboard, with versions + If-None-Match
+Arrivals are open-loop Poisson processes at the profile's rates, so a slow server shows
+up as growing latency and errors instead of silently lowering the offered load.
+
+Modes (from backend/):
+    python loadtest.py run --tabs 300 --admins 2 --duration 60              # one run, starts uvicorn itself
+    python loadtest.py run --url http://127.0.0.1:8000 --tabs 300           # against a running server
+    python loadtest.py saturate --workers 1 2 4 --start-tabs 100            # step load until it breaks, per worker count
+
+--database-url selects SQLite (default: a fresh file per run) or a local Postgres. --profile takes a
+JSON file overriding the per-tab intervals, e.g. {"upload": 300, "ats_check": 200}. Results are
+printed as a table and written as JSON with --out.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+
+# Seconds between events per tab (or per dashboard for admin_poll)
+DEFAULT_PROFILE = {
+    "heartbeat": 30,
+    "log_visit": 300,
+    "login": 1800,
+    "upload": 900,
+    "ats_check": 600,
+    "admin_poll": 5,
+}
+PASSWORD = "loadtest-password"
+MAX_IN_FLIGHT = 5000
+
+
+# --- SERVER ---
+
+def start_server(workers, port, database_url, extra_env=None):
+    env = dict(os.environ, DATABASE_URL=database_url, **(extra_env or {}))
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"uvicorn exited with code {proc.returncode}")
+        try:
+            if httpx.get(f"{url}/health", timeout=1).status_code == 200:
+                return proc, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.3)
+    proc.terminate()
+    raise SystemExit("Server did not become healthy within 60s")
+
+def stop_server(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+def fresh_sqlite_url():
+    fd, path = tempfile.mkstemp(prefix="loadtest_", suffix=".db")
+    os.close(fd)
+    os.unlink(path)
+    return f"sqlite:///{path}"
+
+
+# --- TRAFFIC ---
+
+class Recorder:
+    def __init__(self):
+        self.samples = {} # endpoint -> list of (latency, ok)
+        self.dropped = 0
+
+    def add(self, endpoint, latency, ok):
+        self.samples.setdefault(endpoint, []).append((latency, ok))
+
+    def report(self, duration):
+        rows, total, total_err = {}, 0, 0
+        for endpoint, samples in sorted(self.samples.items()):
+            lat = np.array([s[0] for s in samples]) * 1000
+            errors = sum(1 for s in samples if not s[1])
+            p50, p95, p99 = np.percentile(lat, [50, 95, 99])
+            rows[endpoint] = {"requests": len(samples), "rps": round(len(samples) / duration, 2),
+                              "errors": errors, "error_rate": round(errors / len(samples), 4),
+                              "p50_ms": round(p50, 1), "p95_ms": round(p95, 1), "p99_ms": round(p99, 1)}
+            total += len(samples)
+            total_err += errors
+        all_lat = np.array([s[0] for v in self.samples.values() for s in v]) * 1000
+        overall = {"requests": total, "rps": round(total / duration, 2), "errors": total_err,
+                   "error_rate": round(total_err / total, 4) if total else 0.0, "dropped": self.dropped}
+        if total:
+            overall.update(zip(("p50_ms", "p95_ms", "p99_ms"), (round(x, 1) for x in np.percentile(all_lat, [50, 95, 99]))))
+        return {"overall": overall, "endpoints": rows}
+
+
+class TrafficGenerator:
+    def __init__(self, client, users, corpus, rng):
+        self.client = client
+        self.users = users # [(id, email, full_name)]
+        self.corpus = corpus
+        self.rng = rng
+        self.rec = Recorder()
+        self.in_flight = 0
+        self.snapshot_state = ({}, None) # (section versions, etag), shared by the simulated dashboards
+
+    async def _timed(self, endpoint, coro):
+        started = time.perf_counter()
+        res = None
+        try:
+            res = await coro
+            ok = res.status_code < 500 and res.status_code not in (408, 429)
+        except httpx.HTTPError:
+            ok = False
+        self.rec.add(endpoint, time.perf_counter() - started, ok)
+        return res
+
+    # One coroutine per event kind
+    def heartbeat(self):
+        uid = self.rng.choice(self.users)[0]
+        return self._timed("GET /auth/verify/{id}", self.client.get(f"/auth/verify/{uid}"))
+
+    def log_visit(self):
+        uid, _, name = self.rng.choice(self.users)
+        return self._timed("POST /log-visit", self.client.post("/log-visit", json={"user_id": uid, "user_name": name}))
+
+    def login(self):
+        _, email, _ = self.rng.choice(self.users)
+        return self._timed("POST /login", self.client.post("/login", json={"email": email, "password": PASSWORD}))
+
+    def upload(self):
+        uid, email, name = self.rng.choice(self.users)
+        pdf = self.rng.choice(self.corpus["pdfs"])
+        return self._timed("POST /scan-resume", self.client.post(
+            "/scan-resume", files={"file": (f"resume_{self.rng.randint(1, 10 ** 6)}.pdf", pdf, "application/pdf")},
+            data={"user_id": str(uid), "user_name": name, "user_email": email}))
+
+    def ats_check(self):
+        uid, _, name = self.rng.choice(self.users)
+        return self._timed("POST /ats_check", self.client.post("/ats_check", json={
+            "resume_text": self.rng.choice(self.corpus["texts"]), "job_description": self.rng.choice(self.corpus["jds"]),
+            "user_id": uid, "user_name": name}))
+
+    async def admin_poll(self):
+        versions, etag = self.snapshot_state
+        params = {"versions": ",".join(f"{k}:{v}" for k, v in versions.items())} if versions else {}
+        headers = {"If-None-Match": etag} if etag else {}
+        res = await self._timed("GET /admin/snapshot", self.client.get("/admin/snapshot", params=params, headers=headers))
+        if res is not None and res.status_code == 200:
+            self.snapshot_state = (res.json()["versions"], res.headers.get("etag"))
+
+    async def _fire(self, kind):
+        self.in_flight += 1
+        try:
+            await getattr(self, kind)()
+        finally:
+            self.in_flight -= 1
+
+    async def _arrivals(self, kind, rate, until, tasks):
+        while rate > 0:
+            await asyncio.sleep(self.rng.expovariate(rate))
+            if time.monotonic() >= until:
+                return
+            if self.in_flight >= MAX_IN_FLIGHT:
+                self.rec.dropped += 1
+                continue
+            tasks.add(asyncio.ensure_future(self._fire(kind)))
+
+    async def run(self, rates, duration):
+        until = time.monotonic() + duration
+        tasks = set()
+        await asyncio.gather(*(self._arrivals(kind, rate, until, tasks) for kind, rate in rates.items()))
+        if tasks:
+            await asyncio.wait(tasks, timeout=30)
+        return self.rec.report(duration)
+
+
+def rates_for(profile, tabs, admins):
+    """Events per second for each kind, given open tabs and open admin dashboards."""
+    rates = {kind: tabs / interval for kind, interval in profile.items() if kind != "admin_poll" and interval > 0}
+    if profile.get("admin_poll", 0) > 0:
+        rates["admin_poll"] = admins / profile["admin_poll"]
+    return rates
+
+
+async def prepare_users(client, n_users):
+    users = []
+    for i in range(n_users):
+        email = f"load{i}@loadtest.example"
+        res = await client.post("/register", json={"email": email, "password": PASSWORD, "full_name": f"Load User {i}"})
+        if res.status_code == 201:
+            users.append((res.json()["id"], email, f"Load User {i}"))
+        else:
+            res = await client.post("/login", json={"email": email, "password": PASSWORD})
+            if res.status_code == 200:
+                body = res.json()
+                users.append((body.get("id") or body.get("user", {}).get("id"), email, f"Load User {i}"))
+    if not users:
+        raise SystemExit("Could not register or log in any load-test users")
+    return users
+
+async def run_load(url, tabs, admins, duration, profile, seed, n_users, timeout):
+    from benchmark import build_corpus
+
+    rng = random.Random(seed)
+    corpus = build_corpus(seed, n_files=6)
+    limits = httpx.Limits(max_connections=1000, max_keepalive_connections=200)
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as client:
+        users = await prepare_users(client, n_users)
+        gen = TrafficGenerator(client, users, corpus, rng)
+        rates = rates_for(profile, tabs, admins)
+        report = await gen.run(rates, duration)
+    report["offered_rps"] = round(sum(rates.values()), 2)
+    report["tabs"] = tabs
+    report["admins"] = admins
+    return report
+
+
+def print_report(report, file=sys.stderr):
+    o = report["overall"]
+    print(f"\ntabs={report['tabs']} admins={report['admins']} offered={report['offered_rps']} rps "
+          f"achieved={o['rps']} rps errors={o['error_rate']:.2%} p99={o.get('p99_ms')} ms dropped={o['dropped']}", file=file)
+    print(f"{'endpoint':<28}{'req':>7}{'rps':>9}{'err%':>8}{'p50':>9}{'p95':>9}{'p99':>9}", file=file)
+    for endpoint, r in report["endpoints"].items():
+        print(f"{endpoint:<28}{r['requests']:>7}{r['rps']:>9}{r['error_rate'] * 100:>7.1f}%"
+              f"{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}", file=file)
+
+def saturated(report, offered, p99_slo_ms, max_error_rate, slo_endpoint):
+    # Uploads and logins are slow by design (PDF parsing, bcrypt), so the latency SLO is judged on one
+    # endpoint (the heartbeat by default); errors and throughput are judged on the whole mix.
+    o = report["overall"]
+    slo = report["endpoints"].get(slo_endpoint, o)
+    return (o["error_rate"] > max_error_rate or (slo.get("p99_ms") or 0) > p99_slo_ms
+            or o["dropped"] > 0 or o["rps"] < 0.9 * offered)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Traffic-mix load test against a local server.")
+    parser.add_argument("mode", choices=["run", "saturate"])
+    parser.add_argument("--url", help="Target an already running server instead of starting one")
+    parser.add_argument("--workers", type=int, nargs="*", default=[1], help="uvicorn worker counts (saturate tries each)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--database-url", help="Default: a fresh SQLite file per server start")
+    parser.add_argument("--tabs", type=int, default=200)
+    parser.add_argument("--admins", type=int, default=1)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--profile", help="JSON file with per-tab intervals overriding the default profile")
+    parser.add_argument("--users", type=int, default=50, help="Distinct registered users behind the tabs")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--start-tabs", type=int, default=100, help="saturate: first step")
+    parser.add_argument("--step-factor", type=float, default=1.5, help="saturate: multiply tabs by this per step")
+    parser.add_argument("--max-tabs", type=int, default=200000)
+    parser.add_argument("--p99-slo-ms", type=float, default=500)
+    parser.add_argument("--slo-endpoint", default="GET /auth/verify/{id}", help="Endpoint whose p99 must stay under the SLO")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--out", help="Write JSON results here")
+    args = parser.parse_args()
+
+    profile = dict(DEFAULT_PROFILE)
+    if args.profile:
+        with open(args.profile) as f:
+            profile.update(json.load(f))
+
+    def with_server(workers, fn):
+        if args.url:
+            return fn(args.url)
+        proc, url = start_server(workers, args.port, args.database_url or fresh_sqlite_url())
+        try:
+            return fn(url)
+        finally:
+            stop_server(proc)
+
+    results = {"profile": profile, "mode": args.mode, "runs": []}
+    if args.mode == "run":
+        for workers in args.workers:
+            report = with_server(workers, lambda url: asyncio.run(run_load(
+                url, args.tabs, args.admins, args.duration, profile, args.seed, args.users, args.timeout)))
+            report["workers"] = workers
+            print_report(report)
+            results["runs"].append(report)
+    else:
+        for workers in args.workers:
+            def step_until_saturated(url):
+                steps, best, tabs = [], None, args.start_tabs
+                while tabs <= args.max_tabs:
+                    report = asyncio.run(run_load(url, tabs, args.admins, args.duration, profile,
+                                                  args.seed, args.users, args.timeout))
+                    print_report(report)
+                    steps.append(report)
+                    if saturated(report, report["offered_rps"], args.p99_slo_ms, args.max_error_rate, args.slo_endpoint):
+                        break
+                    best = report
+                    tabs = int(tabs * args.step_factor) + 1
+                return {"workers": workers, "steps": steps,
+                        "max_sustainable_tabs": best["tabs"] if best else None,
+                        "max_sustainable_rps": best["overall"]["rps"] if best else None}
+            summary = with_server(workers, step_until_saturated)
+            if summary["max_sustainable_tabs"] is None:
+                print(f"\nworkers={workers}: already saturated at {args.start_tabs} tabs; lower --start-tabs", file=sys.stderr)
+            else:
+                print(f"\nworkers={workers}: sustains {summary['max_sustainable_tabs']} tabs "
+                      f"({summary['max_sustainable_rps']} rps) within the SLO", file=sys.stderr)
+            results["runs"].append(summary)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,191 @@
+"""
+Request and stage metrics in Prometheus text format (no client library needed).
+
+Hot-path updates never take a lock: every thread writes into its own shard of
+plain lists/floats (threading.local), and only /metrics walks and sums the shards.
+Shards are registered once per thread, which is the only locked step. Values are
+per process; with several uvicorn workers each one reports its own series, tagged
+with a `worker` label (pid) so Prometheus can sum across them.
+
+Instruments:
+    http_requests_total{route,method,status}
+    http_request_duration_seconds{route,method}      histogram
+    http_request_size_bytes / http_response_size_bytes{route}  histograms
+    http_requests_in_flight{method}
+    stage_duration_seconds{endpoint,stage}           histogram, via stage_timer()
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+WORKER = str(os.getpid())
+_registry = []
+_shards_lock = threading.Lock()
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = []
+        _registry.append(self)
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with _shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def _all_shards(self):
+        with _shards_lock:
+            shards = list(self._shards)
+        return shards
+
+    @staticmethod
+    def _fmt_labels(names, values, extra=()):
+        pairs = list(zip(names, values)) + list(extra) + [("worker", WORKER)]
+        body = ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in pairs)
+        return "{" + body + "}"
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, labels=(), amount=1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def collect(self):
+        totals = {}
+        for shard in self._all_shards():
+            for key, value in list(shard.items()):
+                totals[key] = totals.get(key, 0) + value
+        return [f"{self.name}{self._fmt_labels(self.labelnames, k)} {v}" for k, v in sorted(totals.items())]
+
+
+class Gauge(Counter):
+    """Up/down counter (in-flight requests); same sharding as Counter."""
+    kind = "gauge"
+
+    def dec(self, labels=(), amount=1):
+        self.inc(labels, -amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels, value):
+        shard = self._shard()
+        series = shard.get(labels)
+        if series is None:
+            # [per-bucket counts..., +Inf count, sum]
+            series = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def collect(self):
+        merged = {}
+        for shard in self._all_shards():
+            for key, series in list(shard.items()):
+                acc = merged.setdefault(key, [0] * len(series[:-1]) + [0.0])
+                for i, v in enumerate(series):
+                    acc[i] += v
+        lines = []
+        for key, series in sorted(merged.items()):
+            running = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                running += count
+                lines.append(f"{self.name}_bucket{self._fmt_labels(self.labelnames, key, [('le', bound)])} {running}")
+            labels = self._fmt_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{labels} {running}")
+        return lines
+
+
+REQUESTS = Counter("http_requests_total", "HTTP requests by route, method and status.", ("route", "method", "status"))
+LATENCY = Histogram("http_request_duration_seconds", "Request latency.", ("route", "method"))
+REQUEST_SIZE = Histogram("http_request_size_bytes", "Request body size (Content-Length).", ("route",), SIZE_BUCKETS)
+RESPONSE_SIZE = Histogram("http_response_size_bytes", "Response body size.", ("route",), SIZE_BUCKETS)
+IN_FLIGHT = Gauge("http_requests_in_flight", "Requests currently being handled.", ("method",))
+STAGES = Histogram("stage_duration_seconds", "Time spent in named stages of hot endpoints.", ("endpoint", "stage"))
+
+
+def observe_stage(endpoint, stage, seconds):
+    STAGES.observe((endpoint, stage), seconds)
+
+@contextmanager
+def stage_timer(endpoint, stage):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGES.observe((endpoint, stage), time.perf_counter() - started)
+
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.collect())
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware (no BaseHTTPMiddleware task/queue overhead). Routes are labelled by
+    their template (/admin/jobs/{job_id}), unmatched paths collapse into one series."""
+
+    def __init__(self, app, skip_paths=("/metrics",)):
+        self.app = app
+        self.skip_paths = set(skip_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        method = scope["method"]
+        state = {"status": 500, "sent": 0}
+        request_size = 0
+        for name, value in scope.get("headers") or ():
+            if name == b"content-length":
+                request_size = int(value or 0)
+                break
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                state["sent"] += len(message.get("body", b""))
+            elif message["type"] == "http.response.zerocopysend":
+                state["sent"] += message.get("count") or 0
+            await send(message)
+
+        # The route is only known after routing, so in-flight is tracked per method
+        in_flight_key = (method,)
+        IN_FLIGHT.inc(in_flight_key)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            IN_FLIGHT.dec(in_flight_key)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            REQUESTS.inc((route, method, str(state["status"])))
+            LATENCY.observe((route, method), time.perf_counter() - started)
+            REQUEST_SIZE.observe((route,), request_size)
+            RESPONSE_SIZE.observe((route,), state["sent"])
@@ -0,0 +1,410 @@
+"""
+Time-partitioned storage for user_activities and system_logs.
+
+Both tables only ever grow, and clearing them used to be an unbounded DELETE. They are
+split by month instead, so retention drops whole months and a reset is a TRUNCATE / DROP:
+
+  Postgres  native partitioning. system_logs is RANGE-partitioned on timestamp.
+            user_activities is first LIST-split into a visits and an events stream
+            ("reset analytics" keeps the visit history, so it truncates one sub-tree),
+            then each stream by month:
+
+                user_activities
+                  user_activities_visits   activity_type = 'visit'
+                    user_activities_visits_p2026_10, ..., user_activities_visits_default
+                  user_activities_events   everything else
+                    user_activities_events_p2026_10, ..., user_activities_events_default
+
+            Plain tables are converted on startup (init_db; rows are copied once).
+            Inserts and queries keep using the parent table and the planner prunes to
+            the months a timestamp filter covers. The parents have no primary key
+            constraint (it would have to include the partition keys); ids still come
+            from the table's sequence.
+
+  SQLite    no partitioning: the table itself is the hot window, the current month and
+            the PARTITION_HOT_MONTHS - 1 before it. Older months are moved out in batches
+            into archive tables named like the Postgres leaves. Reads that can reach past
+            the hot window (analytics scans, all-time counts) go through segments(),
+            which adds the archive tables overlapping their time range.
+
+maintain() creates the next PARTITION_PREMAKE_MONTHS months (Postgres), moves closed
+months out of the hot tables (SQLite) and drops months older than
+ACTIVITY_RETENTION_MONTHS / SYSTEM_LOG_RETENTION_MONTHS (0 = keep forever). Dropped or
+truncated activities release their resume blob references first. Nothing is dropped
+unless a retention is configured.
+
+PartitionMaintainer runs it every PARTITION_MAINTENANCE_HOURS, in-process when
+PARTITION_MAINTAINER=inprocess (defaults to JOB_SCHEDULER; enable it on ONE worker), or
+as a standalone worker:
+
+    python partitions.py [--status]    # one run
+    python partitions.py --loop        # run every PARTITION_MAINTENANCE_HOURS
+"""
+import argparse
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Callable, NamedTuple, Optional
+
+from sqlalchemy import Column, MetaData, Table, delete, func, insert, or_, select, text
+
+from blob_store import release_activity_refs
+from database import engine, SessionLocal, UserActivity, SystemLog
+
+HOT_MONTHS = max(int(os.getenv("PARTITION_HOT_MONTHS", "2")), 1) # SQLite: months kept in the hot table
+PREMAKE_MONTHS = int(os.getenv("PARTITION_PREMAKE_MONTHS", "2")) # Postgres: partitions created ahead
+MOVE_BATCH_ROWS = int(os.getenv("PARTITION_MOVE_BATCH_ROWS", "5000"))
+MAINTENANCE_HOURS = float(os.getenv("PARTITION_MAINTENANCE_HOURS", "6"))
+ACTIVITY_RETENTION_MONTHS = int(os.getenv("ACTIVITY_RETENTION_MONTHS", "0"))
+SYSTEM_LOG_RETENTION_MONTHS = int(os.getenv("SYSTEM_LOG_RETENTION_MONTHS", "0"))
+# Postgres: give up on a partition DDL lock after this long (retried next run) rather than queue live queries behind it
+LOCK_TIMEOUT_MS = int(os.getenv("PARTITION_LOCK_TIMEOUT_MS", "5000"))
+
+POSTGRES = engine.dialect.name == "postgresql"
+_LOCK_KEY = 0x50415254 # pg_advisory_xact_lock key serializing layout changes between workers
+
+
+class Stream(NamedTuple):
+    name: str                         # range parent suffix; "" for a table that is not LIST-split
+    bound: Optional[str]              # Postgres LIST bound of the stream
+    where: Optional[Callable]         # columns -> predicate selecting the stream's rows
+
+class PartitionedTable(NamedTuple):
+    table: Table
+    streams: tuple
+    retention_months: int
+    on_drop: Optional[Callable] = None # (db, predicate, table) before rows are truncated or dropped
+
+PARTITIONED = {
+    "user_activities": PartitionedTable(UserActivity.__table__, (
+        Stream("visits", "IN ('visit')", lambda c: c.activity_type == "visit"),
+        Stream("events", "DEFAULT", lambda c: or_(c.activity_type != "visit", c.activity_type.is_(None))),
+    ), ACTIVITY_RETENTION_MONTHS, release_activity_refs),
+    "system_logs": PartitionedTable(SystemLog.__table__, (Stream("", None, None),), SYSTEM_LOG_RETENTION_MONTHS),
+}
+
+
+# --- NAMES ---
+
+def _month(ts):
+    return ts.year * 12 + ts.month - 1
+
+def _month_start(month):
+    return datetime(month // 12, month % 12 + 1, 1)
+
+def _range_parent(name, stream):
+    return f"{name}_{stream.name}" if stream.name else name
+
+def _leaf_name(parent, month):
+    return f"{parent}_p{month // 12:04d}_{month % 12 + 1:02d}"
+
+def _leaves(conn, parent):
+    """{month: table name} of the monthly partitions (Postgres) or archive tables (SQLite) of parent."""
+    if POSTGRES:
+        names = conn.execute(text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = :parent"), {"parent": parent}).scalars()
+    else:
+        names = conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE :pattern"),
+                             {"pattern": f"{parent}_p%"}).scalars()
+    leaves = {}
+    for name in names:
+        match = re.fullmatch(re.escape(parent) + r"_p(\d{4})_(\d{2})", name)
+        if match:
+            leaves[int(match.group(1)) * 12 + int(match.group(2)) - 1] = name
+    return leaves
+
+_leaf_metadata = MetaData()
+
+def _leaf_table(base, name):
+    """Table object for a partition / archive table with base's columns (no indexes)."""
+    if name not in _leaf_metadata.tables:
+        Table(name, _leaf_metadata, *(Column(c.name, c.type, primary_key=c.primary_key) for c in base.columns))
+    return _leaf_metadata.tables[name]
+
+def _lock(conn):
+    if POSTGRES:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _LOCK_KEY})
+        conn.execute(text(f"SET LOCAL lock_timeout = {LOCK_TIMEOUT_MS}"))
+
+
+# --- ROUTING ---
+
+def activity_streams(types):
+    """Streams of user_activities that can hold rows of these activity types (None: all)."""
+    if types is None:
+        return None
+    return tuple(name for name, present in (("visits", "visit" in types),
+                                            ("events", any(t != "visit" for t in types))) if present)
+
+def archives(db, name, since=None, until=None, streams=None):
+    """SQLite archive tables of `name` overlapping [since, until), newest month first. [] on Postgres."""
+    if POSTGRES:
+        return []
+    spec = PARTITIONED[name]
+    found = []
+    for stream in spec.streams:
+        if streams is not None and stream.name not in streams:
+            continue
+        for month, leaf in _leaves(db.connection(), _range_parent(name, stream)).items():
+            if (since is None or _month_start(month + 1) > since) and (until is None or _month_start(month) < until):
+                found.append((month, _leaf_table(spec.table, leaf)))
+    return [table for _, table in sorted(found, key=lambda item: -item[0])]
+
+def segments(db, name, since=None, until=None, streams=None):
+    """Tables holding `name`'s rows in [since, until): the table itself (hot / parent), then its archives."""
+    return [PARTITIONED[name].table] + archives(db, name, since, until, streams)
+
+def newest(db, name, columns, where=None, limit=100, streams=None):
+    """The `limit` newest rows of `name`; archives are only read while the hot table comes up short."""
+    rows = []
+    for table in segments(db, name, streams=streams):
+        query = select(*(table.c[column] for column in columns))
+        if where is not None:
+            query = query.where(where(table.c))
+        rows += db.execute(query.order_by(table.c.timestamp.desc()).limit(limit - len(rows))).all()
+        if len(rows) >= limit:
+            break
+    return rows
+
+
+# --- POSTGRES LAYOUT ---
+
+def _is_partitioned(conn, name):
+    return conn.execute(text("SELECT relkind FROM pg_class WHERE relname = :name AND relkind IN ('r', 'p')"),
+                        {"name": name}).scalar() == "p"
+
+def _create_leaf(conn, parent, month):
+    # Built detached and then attached, taking over the month's rows from the default partition if any
+    # landed there (a month nobody created a partition for in time)
+    leaf = _leaf_name(parent, month)
+    lo, hi = _month_start(month), _month_start(month + 1)
+    conn.execute(text(f"CREATE TABLE {leaf} (LIKE {parent} INCLUDING DEFAULTS)"))
+    conn.execute(text(f'WITH moved AS (DELETE FROM {parent}_default WHERE "timestamp" >= :lo AND "timestamp" < :hi '
+                      f"RETURNING *) INSERT INTO {leaf} SELECT * FROM moved"), {"lo": lo, "hi": hi})
+    conn.execute(text(f"ALTER TABLE {parent} ATTACH PARTITION {leaf} "
+                      f"FOR VALUES FROM ('{lo:%Y-%m-%d}') TO ('{hi:%Y-%m-%d}')"))
+
+def _premake(conn, name, spec, first, last):
+    created = 0
+    for stream in spec.streams:
+        parent = _range_parent(name, stream)
+        existing = _leaves(conn, parent)
+        for month in range(first, last + 1):
+            if month not in existing:
+                _create_leaf(conn, parent, month)
+                created += 1
+    return created
+
+def _convert(conn, name, spec, now):
+    """Replace the plain table `name` by a partitioned one with the same columns and rows."""
+    print(f"MIGRATION: Partitioning {name} by month...")
+    legacy = f"{name}_unpartitioned"
+    sequence = conn.execute(text("SELECT pg_get_serial_sequence(:name, 'id')"), {"name": name}).scalar()
+    conn.execute(text(f"ALTER TABLE {name} RENAME TO {legacy}"))
+    if sequence:
+        conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY NONE")) # keep it when the old table goes
+    if spec.streams[0].bound is None:
+        conn.execute(text(f'CREATE TABLE {name} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY RANGE ("timestamp")'))
+    else:
+        conn.execute(text(f"CREATE TABLE {name} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY LIST (activity_type)"))
+        for stream in spec.streams:
+            bound = "DEFAULT" if stream.bound == "DEFAULT" else f"FOR VALUES {stream.bound}"
+            conn.execute(text(f'CREATE TABLE {name}_{stream.name} PARTITION OF {name} {bound} PARTITION BY RANGE ("timestamp")'))
+    for stream in spec.streams:
+        parent = _range_parent(name, stream)
+        conn.execute(text(f"CREATE TABLE {parent}_default PARTITION OF {parent} DEFAULT"))
+
+    oldest = conn.execute(text(f'SELECT min("timestamp") FROM {legacy}')).scalar()
+    _premake(conn, name, spec, _month(min(oldest or now, now)), _month(now) + PREMAKE_MONTHS)
+    conn.execute(text(f"INSERT INTO {name} SELECT * FROM {legacy}"))
+    if sequence:
+        conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {name}.id"))
+    conn.execute(text(f"DROP TABLE {legacy}"))
+    # Indexes (same names as before) become partitioned indexes, built on every partition
+    for index in spec.table.indexes:
+        index.create(conn)
+
+def ensure_layout(now=None):
+    """Postgres: partition the tables (converting plain ones) and create this month's and the next partitions."""
+    if not POSTGRES:
+        return 0
+    now = now or datetime.utcnow()
+    created = 0
+    with engine.begin() as conn:
+        _lock(conn)
+        for name, spec in PARTITIONED.items():
+            if not _is_partitioned(conn, name):
+                _convert(conn, name, spec, now)
+            created += _premake(conn, name, spec, _month(now), _month(now) + PREMAKE_MONTHS)
+    return created
+
+
+# --- MAINTENANCE ---
+
+def _roll_over(db, name, spec, hot_start):
+    """SQLite: move rows older than hot_start from the hot table into their month's archive table."""
+    base = spec.table
+    columns = [c.name for c in base.columns]
+    moved = 0
+    for stream in spec.streams:
+        parent = _range_parent(name, stream)
+        while True:
+            query = select(base.c.id, base.c.timestamp).where(base.c.timestamp < hot_start)
+            if stream.where is not None:
+                query = query.where(stream.where(base.c))
+            rows = db.execute(query.order_by(base.c.timestamp).limit(MOVE_BATCH_ROWS)).all()
+            if not rows:
+                break
+            by_month = {}
+            for row_id, ts in rows:
+                by_month.setdefault(_month(ts), []).append(row_id)
+            for month, ids in by_month.items():
+                archive = _leaf_table(base, _leaf_name(parent, month))
+                archive.create(db.connection(), checkfirst=True)
+                db.execute(insert(archive).from_select(columns, select(*base.columns).where(base.c.id.in_(ids))))
+                db.execute(delete(base).where(base.c.id.in_(ids)))
+            db.commit() # one batch per transaction, so live writes are not locked out for the whole move
+            moved += len(rows)
+    return moved
+
+def _drop_expired(db, name, spec, cutoff):
+    """Drop the monthly partitions / archive tables of months before cutoff."""
+    _lock(db)
+    dropped = 0
+    for stream in spec.streams:
+        for month, leaf in _leaves(db.connection(), _range_parent(name, stream)).items():
+            if month < cutoff:
+                if spec.on_drop:
+                    spec.on_drop(db, None, _leaf_table(spec.table, leaf))
+                db.execute(text(f"DROP TABLE {leaf}"))
+                dropped += 1
+    db.commit()
+    return dropped
+
+def maintain(now=None):
+    now = now or datetime.utcnow()
+    report = {"created": ensure_layout(now), "moved": 0, "dropped": 0}
+    db = SessionLocal()
+    try:
+        for name, spec in PARTITIONED.items():
+            if not POSTGRES:
+                report["moved"] += _roll_over(db, name, spec, _month_start(_month(now) - HOT_MONTHS + 1))
+            if spec.retention_months > 0:
+                keep = spec.retention_months if POSTGRES else max(spec.retention_months, HOT_MONTHS)
+                report["dropped"] += _drop_expired(db, name, spec, _month(now) - keep + 1)
+        if report["moved"] or report["dropped"]:
+            db.add(SystemLog(level="SYSTEM", timestamp=datetime.utcnow(),
+                             message=f"Partition maintenance: {report['created']} created, {report['moved']} rows archived, {report['dropped']} months dropped"))
+            db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    return report
+
+def truncate(db, name, stream=None):
+    """Remove every row of `name` (or of one of its streams) with TRUNCATE / DROP TABLE, no row-by-row DELETE."""
+    spec = PARTITIONED[name]
+    streams = [s for s in spec.streams if stream is None or s.name == stream]
+    _lock(db)
+    if spec.on_drop:
+        for table in segments(db, name, streams=[s.name for s in streams]):
+            spec.on_drop(db, streams[0].where(table.c) if stream and table is spec.table else None, table)
+    if POSTGRES:
+        db.execute(text("TRUNCATE " + ", ".join(_range_parent(name, s) for s in streams)))
+        return
+    for table in archives(db, name, streams=[s.name for s in streams]):
+        db.execute(text(f"DROP TABLE {table.name}"))
+    # The hot table only holds the last HOT_MONTHS; without a WHERE SQLite truncates it outright
+    db.execute(delete(spec.table).where(streams[0].where(spec.table.c)) if stream else delete(spec.table))
+
+def drop_archives(conn):
+    """SQLite: drop every archive table (before a full schema reset). On Postgres partitions go with their parent."""
+    if POSTGRES:
+        return
+    for name, spec in PARTITIONED.items():
+        for stream in spec.streams:
+            for leaf in _leaves(conn, _range_parent(name, stream)).values():
+                conn.execute(text(f"DROP TABLE {leaf}"))
+
+def status(db):
+    """{table: {segment: rows}} for the hot / parent tables and each monthly partition or archive."""
+    report = {}
+    for name, spec in PARTITIONED.items():
+        tables = {name: spec.table}
+        for stream in spec.streams:
+            tables.update((leaf, _leaf_table(spec.table, leaf)) for leaf in
+                          sorted(_leaves(db.connection(), _range_parent(name, stream)).values()))
+        report[name] = {table_name: db.execute(select(func.count()).select_from(table)).scalar()
+                        for table_name, table in tables.items()}
+    return report
+
+
+class PartitionMaintainer(threading.Thread):
+    def __init__(self, interval=MAINTENANCE_HOURS * 3600):
+        super().__init__(name="partition-maintenance", daemon=True)
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                report = maintain()
+                if report["created"] or report["moved"] or report["dropped"]:
+                    print(f"Partition maintenance done: {report}")
+            except Exception as e:
+                print(f"Partition maintenance failed: {e}")
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+
+_maintainer = None
+
+def start_maintainer():
+    global _maintainer
+    mode = os.getenv("PARTITION_MAINTAINER", os.getenv("JOB_SCHEDULER", ""))
+    if mode.lower() != "inprocess" or _maintainer is not None:
+        return None
+    _maintainer = PartitionMaintainer()
+    _maintainer.start()
+    return _maintainer
+
+def stop_maintainer():
+    global _maintainer
+    if _maintainer is not None:
+        _maintainer.stop()
+        _maintainer = None
+
+
+if __name__ == "__main__":
+    from database import init_db
+
+    parser = argparse.ArgumentParser(description="Create, roll over and expire the monthly activity / log partitions.")
+    parser.add_argument("--status", action="store_true", help="Only list the partitions and their row counts")
+    parser.add_argument("--loop", action="store_true", help="Keep running every PARTITION_MAINTENANCE_HOURS")
+    args = parser.parse_args()
+
+    init_db()
+    if args.loop:
+        maintainer = PartitionMaintainer()
+        maintainer.start()
+        try:
+            while maintainer.is_alive():
+                maintainer.join(1)
+        except KeyboardInterrupt:
+            maintainer.stop()
+        raise SystemExit(0)
+    if not args.status:
+        print(maintain())
+    session = SessionLocal()
+    try:
+        for name, segment_rows in status(session).items():
+            print(name)
+            for segment, rows in segment_rows.items():
+                print(f"  {segment:<40} {rows:>10}")
+    finally:
+        session.close()
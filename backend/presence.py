@@ -0,0 +1,298 @@
+"""
+Presence for the client heartbeat (App.jsx calls /auth/verify/{id} every 30 s per tab).
+
+The heartbeat is answered from memory; the database is only touched by a background
+thread:
+
+  TimingWheel     last-seen time per user, bucketed into PRESENCE_TICK_SECONDS slots.
+                  Running totals are kept for each configured window (online, active),
+                  so is_online(id), count("online") and count("active") are O(1); slots
+                  that fall off the largest window are expired wholesale.
+  UserDirectory   deleted ids, admin ids, permanently removed ids and the highest id
+                  seen: enough to answer "exists / deleted / role" without a query.
+                  Updated in place by delete/restore in this worker and refreshed from
+                  the database every PRESENCE_REFRESH_SECONDS for the other workers'
+                  changes. Ids above the highest known one (registered elsewhere since
+                  the last refresh) fall back to a single-row lookup.
+  PresenceFlusher writes users.last_active for everyone seen since the last pass in one
+                  batch every PRESENCE_WRITE_SECONDS, so the database sees at most one
+                  write per user per interval, then refreshes the directory and merges
+                  the other workers' heartbeats (last_active) into the wheel.
+
+Admins are tracked in the directory but not counted in the wheel (stats exclude them).
+"""
+import os
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import func, update
+
+from database import SessionLocal, User
+
+TICK_SECONDS = float(os.getenv("PRESENCE_TICK_SECONDS", "5"))
+ONLINE_SECONDS = float(os.getenv("PRESENCE_ONLINE_SECONDS", "60"))  # AdminDashboard's "online" dot
+ACTIVE_SECONDS = float(os.getenv("ACTIVE_WINDOW_MINUTES", "15")) * 60  # /admin/stats "Active Now"
+WRITE_SECONDS = float(os.getenv("PRESENCE_WRITE_SECONDS", "30"))
+REFRESH_SECONDS = float(os.getenv("PRESENCE_REFRESH_SECONDS", "30"))
+
+_EPOCH = datetime(1970, 1, 1)
+
+def _epoch(dt):
+    # last_active is stored as naive UTC
+    return (dt - _EPOCH).total_seconds()
+
+
+class TimingWheel:
+    def __init__(self, windows, tick=TICK_SECONDS):
+        self.tick = tick
+        self.windows = {name: max(int(round(seconds / tick)), 1) for name, seconds in windows.items()}
+        self.horizon = max(self.windows.values())
+        self._slots = {}        # absolute tick -> set of user ids last seen in it
+        self._last = {}         # user id -> absolute tick of the last beat
+        self._totals = dict.fromkeys(self.windows, 0)
+        self._now = None        # current absolute tick
+
+    def _advance(self, now_tick):
+        if self._now is None or now_tick - self._now > self.horizon:
+            # First use or idle for longer than the largest window: everything expired
+            self._slots.clear()
+            self._last.clear()
+            self._totals = dict.fromkeys(self.windows, 0)
+            self._now = now_tick
+            return
+        while self._now < now_tick:
+            self._now += 1
+            for name, span in self.windows.items():
+                self._totals[name] -= len(self._slots.get(self._now - span, ()))
+            for user_id in self._slots.pop(self._now - self.horizon, ()):
+                del self._last[user_id]
+
+    def _unplace(self, user_id):
+        tick = self._last.pop(user_id, None)
+        if tick is None:
+            return
+        self._slots[tick].discard(user_id)
+        for name, span in self.windows.items():
+            if tick > self._now - span:
+                self._totals[name] -= 1
+
+    def beat(self, user_id, ts):
+        tick = int(ts // self.tick)
+        self._advance(max(tick, self._now or tick))
+        if tick <= self._now - self.horizon or self._last.get(user_id, -1) >= tick:
+            return # older than the wheel, or we already have a newer beat
+        self._unplace(user_id)
+        self._last[user_id] = tick
+        self._slots.setdefault(tick, set()).add(user_id)
+        for name, span in self.windows.items():
+            if tick > self._now - span:
+                self._totals[name] += 1
+
+    def discard(self, user_id):
+        self._unplace(user_id)
+
+    def count(self, name, now):
+        self._advance(int(now // self.tick))
+        return self._totals[name]
+
+    def seen_within(self, user_id, name, now):
+        self._advance(int(now // self.tick))
+        tick = self._last.get(user_id)
+        return tick is not None and tick > self._now - self.windows[name]
+
+    def clear(self):
+        self._now = None
+        self._slots.clear()
+        self._last.clear()
+        self._totals = dict.fromkeys(self.windows, 0)
+
+
+class UserDirectory:
+    def __init__(self):
+        self.deleted = set()
+        self.admins = set()
+        self.removed = set()   # ids below max_id with no row (permanently deleted)
+        self.max_id = 0
+        self.loaded = False
+
+    def refresh(self, db):
+        max_id, rows = db.query(func.max(User.id), func.count(User.id)).one()
+        max_id = max_id or 0
+        deleted = {i for (i,) in db.query(User.id).filter(User.is_deleted == True)}
+        admins = {i for (i,) in db.query(User.id).filter(User.role == "admin")}
+        removed = {i for i in self.removed if i <= max_id}
+        if max_id - rows != len(removed):
+            # Only when the number of id gaps changed: find them with one id scan
+            removed = set(range(1, max_id + 1)) - {i for (i,) in db.query(User.id)}
+        self.deleted, self.admins, self.removed, self.max_id = deleted, admins, removed, max_id
+        self.loaded = True
+
+    def lookup(self, user_id):
+        """
+        (is_deleted, role), or None if there is no such user. Only ids above max_id, and removed
+        ids (SQLite reuses the highest rowid once it is deleted), hit the database.
+        """
+        if user_id <= 0:
+            return None
+        if user_id > self.max_id or user_id in self.removed:
+            db = SessionLocal()
+            try:
+                row = db.query(User.is_deleted, User.role).filter(User.id == user_id).first()
+            finally:
+                db.close()
+            if row is None:
+                return None
+            self.added(user_id, row.role, bool(row.is_deleted))
+        return user_id in self.deleted, "admin" if user_id in self.admins else "user"
+
+    def added(self, user_id, role, is_deleted=False):
+        self.max_id = max(self.max_id, user_id)
+        self.removed.discard(user_id)
+        if role == "admin":
+            self.admins.add(user_id)
+        if is_deleted:
+            self.deleted.add(user_id)
+
+    def set_deleted(self, user_id, is_deleted):
+        if is_deleted:
+            self.deleted.add(user_id)
+        else:
+            self.deleted.discard(user_id)
+
+    def removed_user(self, user_id):
+        self.deleted.discard(user_id)
+        self.admins.discard(user_id)
+        if user_id <= self.max_id:
+            self.removed.add(user_id)
+
+
+class Presence:
+    def __init__(self):
+        self.wheel = TimingWheel({"online": ONLINE_SECONDS, "active": ACTIVE_SECONDS})
+        self.directory = UserDirectory()
+        self._lock = threading.Lock()
+        self._pending = {}      # user id -> naive UTC datetime of the latest beat not written yet
+        self._last_refresh = 0.0
+        self._flusher = None
+
+    # --- HEARTBEAT PATH (no database) ---
+
+    def lookup(self, user_id):
+        if not self.directory.loaded:
+            self.refresh() # first request in a worker that was not started through the app
+        return self.directory.lookup(user_id)
+
+    def heartbeat(self, user_id, role="user"):
+        now = datetime.utcnow()
+        with self._lock:
+            self._pending[user_id] = now
+            if role != "admin":
+                self.wheel.beat(user_id, _epoch(now))
+
+    def is_online(self, user_id):
+        with self._lock:
+            return self.wheel.seen_within(user_id, "online", time.time())
+
+    def count(self, window="online"):
+        with self._lock:
+            return self.wheel.count(window, time.time())
+
+    # --- WRITE PATHS (delete / restore / register) ---
+
+    def user_added(self, user_id, role):
+        self.directory.added(user_id, role)
+
+    def set_deleted(self, user_id, is_deleted):
+        self.directory.set_deleted(user_id, is_deleted)
+        if is_deleted:
+            self.discard(user_id)
+
+    def user_removed(self, user_id):
+        self.directory.removed_user(user_id)
+        self.discard(user_id)
+
+    def discard(self, user_id):
+        with self._lock:
+            self.wheel.discard(user_id)
+            self._pending.pop(user_id, None)
+
+    def reset(self):
+        with self._lock:
+            self.wheel.clear()
+            self._pending = {}
+        self.directory = UserDirectory()
+
+    # --- BACKGROUND (PresenceFlusher) ---
+
+    def flush(self):
+        """Write pending last_active values in one batch."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        db = SessionLocal()
+        try:
+            db.execute(update(User), [{"id": user_id, "last_active": ts} for user_id, ts in pending.items()])
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Presence flush failed: {e}")
+            with self._lock:
+                for user_id, ts in pending.items():
+                    self._pending.setdefault(user_id, ts)
+            return 0
+        finally:
+            db.close()
+        return len(pending)
+
+    def refresh(self):
+        """Reload the directory and merge heartbeats other workers have written."""
+        db = SessionLocal()
+        try:
+            self.directory.refresh(db)
+            cutoff = datetime.utcfromtimestamp(time.time() - ACTIVE_SECONDS)
+            rows = db.query(User.id, User.last_active).filter(
+                User.last_active >= cutoff, User.role != "admin", User.is_deleted == False).all()
+        except Exception as e:
+            print(f"Presence refresh failed: {e}")
+            return
+        finally:
+            db.close()
+        with self._lock:
+            for user_id, ts in rows:
+                self.wheel.beat(user_id, _epoch(ts))
+        self._last_refresh = time.monotonic()
+
+    def start(self):
+        if self._flusher is None:
+            self.refresh()
+            self._flusher = PresenceFlusher(self)
+            self._flusher.start()
+
+    def stop(self):
+        if self._flusher is not None:
+            self._flusher.stop()
+            self._flusher = None
+        self.flush()
+
+
+class PresenceFlusher(threading.Thread):
+    def __init__(self, presence, interval=WRITE_SECONDS):
+        super().__init__(name="presence-flush", daemon=True)
+        self.presence = presence
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.presence.flush()
+            if time.monotonic() - self.presence._last_refresh >= REFRESH_SECONDS:
+                self.presence.refresh()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join(timeout=5)
+
+
+presence = Presence()
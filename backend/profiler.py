@@ -0,0 +1,257 @@
+"""
+On-demand sampling profiler for a running worker.
+
+A background thread snapshots every thread's Python stack (sys._current_frames)
+every PROFILER_INTERVAL_MS and counts identical stacks; nothing is installed on
+the request path except one attribute check in ProfilerMiddleware. Two modes:
+
+  seconds   sample the whole worker for N seconds
+  requests  sample only while requests to one route template are in flight, and
+            stop after the next N of them have completed
+
+Threads parked in selectors/queue/lock waits are dropped so idle workers don't
+drown the real work. Results come back as collapsed stacks (flamegraph.pl,
+speedscope, inferno all read them) or speedscope JSON.
+
+The control routes need the X-Profiler-Token header to equal PROFILER_TOKEN and
+are disabled when it is unset. Each uvicorn worker has its own profiler; the
+route answers for whichever worker received the request (its pid is returned).
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+
+PROFILER_TOKEN = os.getenv("PROFILER_TOKEN")
+DEFAULT_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "5"))
+MAX_SECONDS = 300
+
+# (file basename, function) of frames a thread sits in while it has nothing to do
+_IDLE_LEAVES = {
+    ("threading.py", "wait"), ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"), ("queue.py", "get"), ("thread.py", "_worker"),
+    ("base_events.py", "_run_once"),
+}
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def _walk(frame):
+    """Root-first tuple of (label, file, line) for a leaf frame."""
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append((_frame_label(code), code.co_filename, code.co_firstlineno))
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+
+class ProfileSession:
+    def __init__(self, interval_ms=DEFAULT_INTERVAL_MS, seconds=None, requests=None, route=None, method=None):
+        self.interval = max(interval_ms, 1.0) / 1000.0
+        self.seconds = min(seconds, MAX_SECONDS) if seconds else None
+        self.requests = requests
+        self.route = route
+        self.method = method.upper() if method else None
+        self.stacks = Counter()
+        self.samples = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.started_at = time.time()
+        self.finished_at = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+
+    @property
+    def running(self):
+        return self.finished_at is None
+
+    # --- REQUEST HOOKS (route mode) ---
+
+    def matches(self, route_path, method):
+        return self.route is not None and route_path == self.route and (self.method is None or method == self.method)
+
+    def request_started(self):
+        self.in_flight += 1
+
+    def request_finished(self):
+        self.in_flight -= 1
+        self.completed += 1
+        if self.requests and self.completed >= self.requests:
+            self._stop.set()
+
+    # --- SAMPLING ---
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=2)
+
+    def _run(self):
+        me = threading.get_ident()
+        names = {}
+        deadline = time.monotonic() + (self.seconds or MAX_SECONDS)
+        try:
+            while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+                if self.route is not None and self.in_flight <= 0:
+                    continue
+                frames = sys._current_frames()
+                if len(names) != threading.active_count():
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                for ident, frame in frames.items():
+                    if ident == me:
+                        continue
+                    code = frame.f_code
+                    if (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES:
+                        continue
+                    thread = (f"thread {names.get(ident, ident)}", "", 0)
+                    self.stacks[(thread,) + _walk(frame)] += 1
+                self.samples += 1
+        finally:
+            self.finished_at = time.time()
+
+    # --- OUTPUT ---
+
+    def status(self):
+        return {
+            "worker": os.getpid(),
+            "running": self.running,
+            "mode": "requests" if self.route else "seconds",
+            "route": self.route,
+            "method": self.method,
+            "requests_target": self.requests,
+            "requests_completed": self.completed,
+            "seconds": self.seconds,
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "distinct_stacks": len(self.stacks),
+            "elapsed": round((self.finished_at or time.time()) - self.started_at, 3),
+        }
+
+    def collapsed(self) -> str:
+        lines = [";".join(label for label, _, _ in stack) + f" {count}"
+                 for stack, count in self.stacks.most_common()]
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self) -> dict:
+        frame_index, frames = {}, []
+        samples, weights = [], []
+        for stack, count in self.stacks.most_common():
+            ids = []
+            for label, file, line in stack:
+                idx = frame_index.get(label)
+                if idx is None:
+                    idx = frame_index[label] = len(frames)
+                    frames.append({"name": label, "file": file, "line": line} if file else {"name": label})
+                ids.append(idx)
+            samples.append(ids)
+            weights.append(count * self.interval)
+        total = sum(weights)
+        name = f"worker {os.getpid()} " + (f"{self.method or '*'} {self.route}" if self.route else f"{self.seconds}s")
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled", "name": name, "unit": "seconds",
+                "startValue": 0, "endValue": total, "samples": samples, "weights": weights,
+            }],
+            "name": name,
+            "activeProfileIndex": 0,
+            "exporter": "launchpad profiler",
+        }
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class ProfilerMiddleware:
+    """Tracks in-flight requests for an active route-mode session; when idle it costs one global read."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        session = _session
+        if scope["type"] != "http" or session is None or session.route is None or not session.running:
+            await self.app(scope, receive, send)
+            return
+
+        route = _match_route(scope)
+        if not route or not session.matches(route, scope["method"]):
+            await self.app(scope, receive, send)
+            return
+        session.request_started()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            session.request_finished()
+
+
+def _match_route(scope):
+    """Route template for a raw request path, resolved against the app's routes."""
+    from starlette.routing import Match
+
+    app = scope.get("app")
+    for route in getattr(app, "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", None)
+    return None
+
+
+# --- CONTROL ROUTES ---
+
+def require_profiler_token(x_profiler_token: str = Header(None)):
+    if not PROFILER_TOKEN:
+        raise HTTPException(status_code=404, detail="Profiler is disabled (PROFILER_TOKEN not set).")
+    if x_profiler_token != PROFILER_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid profiler token.")
+
+router = APIRouter(prefix="/admin/profiler", dependencies=[Depends(require_profiler_token)])
+
+@router.post("/start")
+def start_profiler(seconds: float = None, requests: int = None, route: str = None, method: str = None,
+                   interval_ms: float = DEFAULT_INTERVAL_MS):
+    global _session
+    if route is None and not seconds:
+        raise HTTPException(status_code=400, detail="Give either seconds=N or route=/path with requests=N.")
+    if route is not None and not requests:
+        raise HTTPException(status_code=400, detail="Route mode needs requests=N.")
+    with _session_lock:
+        if _session is not None and _session.running:
+            raise HTTPException(status_code=409, detail="A profiling session is already running in this worker.")
+        _session = ProfileSession(interval_ms=interval_ms, seconds=seconds, requests=requests, route=route, method=method)
+        _session.start()
+        return _session.status()
+
+@router.post("/stop")
+def stop_profiler():
+    if _session is None:
+        raise HTTPException(status_code=404, detail="No profiling session.")
+    _session.stop()
+    return _session.status()
+
+@router.get("")
+def profiler_status():
+    if _session is None:
+        return {"worker": os.getpid(), "running": False}
+    return _session.status()
+
+@router.get("/result")
+def profiler_result(format: str = "collapsed"):
+    if _session is None:
+        raise HTTPException(status_code=404, detail="No profiling session.")
+    if _session.running:
+        raise HTTPException(status_code=409, detail="Profiling still running; stop it or wait for it to finish.")
+    if format == "speedscope":
+        return _session.speedscope()
+    return PlainTextResponse(_session.collapsed())
@@ -0,0 +1,167 @@
+"""
+Serving of stored resumes (uploads/blobs/...).
+
+Blobs are content-addressed, so a file's bytes never change for a given URL:
+  - ETag is the sha256 itself (strong validator), If-None-Match answers 304
+  - Cache-Control: public, max-age=1y, immutable -> browsers/proxies keep it
+  - single Range requests are honoured (206 / 416) for PDF viewers that fetch in pieces
+  - the body goes out zero-copy when the ASGI server offers it
+    ("http.response.zerocopysend" -> sendfile(2), "http.response.pathsend" -> whole file),
+    otherwise it is streamed from a worker thread in 64 KB chunks.
+
+The route is registered at /uploads/blobs/... so existing dashboard links keep working.
+"""
+import os
+import re
+import zipfile
+from urllib.parse import quote
+
+import anyio
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import Response
+from sqlalchemy.orm import Session
+
+from blob_store import blob_abs_path, archive_abs_path
+from database import get_db, ResumeBlob
+
+router = APIRouter()
+
+CHUNK_SIZE = 64 * 1024
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class BlobFileResponse(Response):
+    def __init__(self, path, size, start, end, status_code, headers, send_body=True):
+        super().__init__(status_code=status_code, headers=headers)
+        self.path = path
+        self.size = size
+        self.start = start
+        self.end = end # inclusive
+        self.send_body = send_body
+
+    async def __call__(self, scope, receive, send):
+        count = self.end - self.start + 1 if self.size else 0
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if not self.send_body or count <= 0:
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        extensions = scope.get("extensions") or {}
+        if "http.response.zerocopysend" in extensions:
+            with open(self.path, "rb") as f:
+                await send({"type": "http.response.zerocopysend", "file": f.fileno(),
+                            "offset": self.start, "count": count})
+            return
+        if "http.response.pathsend" in extensions and self.start == 0 and count == self.size:
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+            return
+
+        async with await anyio.open_file(self.path, "rb") as f:
+            await f.seek(self.start)
+            remaining = count
+            while remaining > 0:
+                chunk = await f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b""})
+
+
+def _parse_range(header, size):
+    """Return (start, end) for a single satisfiable range, None to ignore, or 'invalid'."""
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None # multi-range or unknown unit: serve the full file (RFC 9110 allows this)
+    first, last = match.groups()
+    if first == "" and last == "":
+        return None
+    if first == "":
+        length = int(last)
+        if length == 0:
+            return "invalid"
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return "invalid"
+    return start, end
+
+def _etag_matches(header, etag):
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    tags = [t.strip().removeprefix("W/") for t in header.split(",")]
+    return etag in tags
+
+def _read_archived(blob: ResumeBlob) -> bytes:
+    with zipfile.ZipFile(archive_abs_path(blob.archive_path)) as zf:
+        return zf.read(blob.sha256)
+
+def serve_blob(request: Request, blob: ResumeBlob):
+    if blob.archive_path:
+        # Compacted by upload_retention: no ranges/zero-copy, but same validators
+        try:
+            content = _read_archived(blob)
+        except (FileNotFoundError, KeyError):
+            raise HTTPException(status_code=404, detail="File not found")
+        return Response(content=content if request.method != "HEAD" else b"", media_type=blob.content_type, headers={
+            "ETag": f'"{blob.sha256}"', "Cache-Control": IMMUTABLE_CACHE, "Content-Length": str(len(content))})
+
+    path = blob_abs_path(blob.rel_path)
+    try:
+        size = os.stat(path).st_size
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    etag = f'"{blob.sha256}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE_CACHE,
+        "Accept-Ranges": "bytes",
+        "Content-Type": blob.content_type or "application/octet-stream",
+        "Content-Disposition": f"inline; filename*=UTF-8''{quote(blob.original_name or os.path.basename(path))}",
+    }
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={k: headers[k] for k in ("ETag", "Cache-Control")})
+
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    if not if_range or if_range.strip() == etag:
+        byte_range = _parse_range(request.headers.get("range"), size)
+    if byte_range == "invalid":
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{size}", "ETag": etag})
+
+    send_body = request.method != "HEAD"
+    if byte_range:
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+        return BlobFileResponse(path, size, start, end, 206, headers, send_body)
+    headers["Content-Length"] = str(size)
+    return BlobFileResponse(path, size, 0, size - 1, 200, headers, send_body)
+
+
+@router.api_route("/uploads/blobs/{shard1}/{shard2}/{name}", methods=["GET", "HEAD"])
+def get_stored_resume(shard1: str, shard2: str, name: str, request: Request, db: Session = Depends(get_db)):
+    sha256 = os.path.splitext(name)[0]
+    # Content never changes for a hash, so a matching validator needs no DB or disk access
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match.strip() != "*" and _etag_matches(if_none_match, f'"{sha256}"'):
+        return Response(status_code=304, headers={"ETag": f'"{sha256}"', "Cache-Control": IMMUTABLE_CACHE})
+    blob = db.get(ResumeBlob, sha256)
+    if not blob or blob.rel_path != f"blobs/{shard1}/{shard2}/{name}":
+        raise HTTPException(status_code=404, detail="File not found")
+    return serve_blob(request, blob)
+
+@router.api_route("/resumes/{sha256}", methods=["GET", "HEAD"])
+def get_resume_by_hash(sha256: str, request: Request, db: Session = Depends(get_db)):
+    blob = db.get(ResumeBlob, sha256)
+    if not blob:
+        raise HTTPException(status_code=404, detail="File not found")
+    return serve_blob(request, blob)
@@ -0,0 +1,185 @@
+"""
+Resume text extraction, document-type check (document_classifier.py), validation
+(section segmentation, resume_sections.py) and skill tagging.
+
+Everything here is CPU-bound and free of DB/request state so it can run on the
+extraction pool: a process pool (pdfplumber is pure Python and holds the GIL, so
+threads would not parse two PDFs at once). /scan-resume awaits a single
+submit_parse; the batch endpoint fans files out and streams results as they complete.
+
+EXTRACTION_WORKERS  pool size (default: CPU count, capped at 8)
+"""
+import asyncio
+import io
+import multiprocessing
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import docx
+import pdfplumber
+
+from document_classifier import classify_document
+from resume_sections import segment, section_kinds
+from skills import ALL_SKILLS
+
+MAX_PAGES = 4
+MAX_FILE_BYTES = 5 * 1024 * 1024
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", str(min(os.cpu_count() or 1, 8))))
+
+
+class ResumeRejected(ValueError):
+    """The file is readable but is not an acceptable resume (message is shown to the user)."""
+
+
+def extract_text_from_pdf(file_bytes):
+    with pdfplumber.open(io.BytesIO(file_bytes)) as pdf:
+        if len(pdf.pages) > MAX_PAGES:
+            raise ValueError("PDF exceeds 4 pages limit.")
+        text = ""
+        for page in pdf.pages:
+            text += page.extract_text() or ""
+    return text
+
+def extract_text_from_docx(file_bytes):
+    doc = docx.Document(io.BytesIO(file_bytes))
+    return "\n".join([para.text for para in doc.paragraphs])
+
+
+# --- VALIDATION ---
+
+REJECT_CONFIDENCE = 0.75 # classifier confidence needed to reject an offer letter / other document
+FIRST_PARAGRAPHS = 40     # DOCX paragraphs classified before the rest is processed
+
+def check_document_type(head, has_images=False):
+    """
+    Reject non-resumes from the first page's text (document_classifier), before the rest of the
+    file is extracted. Unsure calls pass through to the section check on the full text.
+    """
+    label, confidence = classify_document(head, has_images)
+    if label == "scanned_image":
+        raise ResumeRejected("Could not extract text from document. If this is a PDF, ensure it is text-based (not a scanned image).")
+    if label == "offer_letter" and confidence >= REJECT_CONFIDENCE:
+        raise ResumeRejected("Uploaded document appears to be an Offer / Appointment Letter, not a Resume. Please upload your CV/Resume.")
+    if label == "other" and confidence >= REJECT_CONFIDENCE:
+        raise ResumeRejected("Document does not look like a Resume. It is missing standard sections like 'Experience', 'Education', or 'Skills'.")
+    return label, confidence
+
+MIN_SECTIONS = 2 # distinct section kinds (resume_sections) a resume must have
+
+# Fallback for layouts whose headings the segmenter does not recognise: at least
+# MIN_KEYWORDS of these anywhere in the text still pass
+RESUME_KEYWORDS = [
+    "experience", "work history", "employment", "internship",
+    "education", "university", "college", "degree",
+    "skills", "technologies", "technical skills", "competencies",
+    "projects", "summary", "profile", "objective",
+    "certifications", "achievements", "languages",
+    "curriculum vitae", "cv", "resume"
+]
+MIN_KEYWORDS = 3
+
+def validate_resume_content(text_content):
+    """
+    Raises ResumeRejected; returns the section spans (kept on the parsed document). Offer letters
+    and other non-resumes were already turned away by check_document_type on the first page.
+    """
+    # A valid resume has headings for at least MIN_SECTIONS kinds of section
+    sections = segment(text_content)
+    if len(section_kinds(sections)) >= MIN_SECTIONS:
+        return sections
+    t = text_content.lower()
+    if sum(kw in t for kw in RESUME_KEYWORDS) < MIN_KEYWORDS:
+        raise ResumeRejected("Document does not look like a Resume. It is missing standard sections like 'Experience', 'Education', or 'Skills'.")
+    return sections
+
+
+# --- SKILLS ---
+
+# Compiled once; every taxonomy skill is tested separately so overlapping skills
+# ("react" and "react native") are both reported, as before.
+_SKILL_PATTERNS = [(skill, re.compile(r'\b' + re.escape(skill) + r'\b')) for skill in sorted(ALL_SKILLS)]
+_DISPLAY_NAMES = {
+    "javascript": "JavaScript", "typescript": "TypeScript", "mysql": "MySQL",
+    "postgresql": "PostgreSQL", "mongodb": "MongoDB", "react": "React",
+    "vue": "Vue.js", "node.js": "Node.js",
+}
+
+def display_skill(skill):
+    formatted = " ".join(word.capitalize() for word in skill.split())
+    return _DISPLAY_NAMES.get(formatted.lower(), formatted)
+
+def extract_resume_skills(text):
+    text_lower = text.lower()
+    return {display_skill(skill) for skill, pattern in _SKILL_PATTERNS if pattern.search(text_lower)}
+
+
+def parse_resume(filename, contents):
+    """
+    Extract, validate and tag one upload. Returns {"text", "skills", "sections", "document_type", "timings"};
+    raises ResumeRejected.
+    timings holds per-stage seconds measured in the worker, for the caller's metrics.
+    """
+    if len(contents) > MAX_FILE_BYTES:
+        raise ResumeRejected("File too large. Maximum size is 5MB.")
+    started = time.perf_counter()
+    # Classify the first page / paragraphs first: non-resumes are rejected before the rest is extracted
+    if filename.endswith('.pdf'):
+        with pdfplumber.open(io.BytesIO(contents)) as pdf:
+            if len(pdf.pages) > MAX_PAGES:
+                raise ResumeRejected("Resume too long. Maximum 4 pages allowed.")
+            first = pdf.pages[0] if pdf.pages else None
+            text = (first.extract_text() or "") if first else ""
+            classifying = time.perf_counter()
+            document_type = check_document_type(text, has_images=bool(first and first.images))
+            classified = time.perf_counter()
+            for page in pdf.pages[1:]:
+                text += page.extract_text() or ""
+    else:
+        doc = docx.Document(io.BytesIO(contents))
+        paragraphs = [para.text for para in doc.paragraphs]
+        classifying = time.perf_counter()
+        document_type = check_document_type("\n".join(paragraphs[:FIRST_PARAGRAPHS]), has_images=bool(doc.inline_shapes))
+        classified = time.perf_counter()
+        text = "\n".join(paragraphs)
+
+    if not text or len(text.strip()) < 50:
+        raise ResumeRejected("Could not extract text from document. If this is a PDF, ensure it is text-based (not a scanned image).")
+
+    extracted = time.perf_counter()
+    sections = validate_resume_content(text)
+    validated = time.perf_counter()
+    skills = sorted(extract_resume_skills(text))
+    timings = {"extraction": (extracted - started) - (classified - classifying),
+               "classification": classified - classifying, "validation": validated - extracted,
+               "skill_matching": time.perf_counter() - validated}
+    return {"text": text, "skills": skills, "sections": sections, "document_type": document_type, "timings": timings}
+
+
+# --- EXTRACTION POOL ---
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_extraction_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: the API process runs scheduler/server threads, which fork() does not copy safely
+            _pool = ProcessPoolExecutor(max_workers=max(EXTRACTION_WORKERS, 1),
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+def shutdown_extraction_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+
+def submit_parse(filename, contents) -> asyncio.Future:
+    """Schedule parse_resume on the extraction pool; await the returned future from the event loop."""
+    loop = asyncio.get_running_loop()
+    return loop.run_in_executor(get_extraction_pool(), parse_resume, filename, contents)
@@ -0,0 +1,79 @@
+"""
+Resume section segmenter.
+
+One pass over the extracted text finds the section headings (a line that is just a
+known heading, possibly qualified as in "Education Details" or "Projects & Achievements",
+"Skills: python, sql" with inline content, or an upper-case heading run into its first
+line as pdfplumber sometimes produces) and splits the text into typed spans:
+
+    [("header", 0, 42), ("skills", 49, 310), ("experience", 322, 2810), ...]
+
+(kind, start, end) are character offsets into the text; "header" is whatever precedes
+the first heading (name, contact details). The span list is computed once per upload
+by parse_resume, kept on the parsed document and reused by every consumer: validation
+(distinct section kinds), the ATS check (per-section weights) and interview questions.
+"""
+import re
+
+SECTION_HEADINGS = {
+    "summary": ("summary", "professional summary", "career summary", "profile", "professional profile",
+                "objective", "career objective", "about me"),
+    "experience": ("experience", "work experience", "professional experience", "relevant experience",
+                   "work history", "employment", "employment history", "internship", "internships"),
+    "education": ("education", "academic background", "academics", "qualifications",
+                  "educational qualifications", "academic qualifications"),
+    "skills": ("skills", "technical skills", "key skills", "core skills", "technologies",
+               "competencies", "core competencies", "tools and technologies", "tech stack"),
+    "projects": ("projects", "personal projects", "academic projects", "key projects", "side projects"),
+    "certifications": ("certifications", "certificates", "certification", "licenses and certifications",
+                       "courses", "training"),
+    "achievements": ("achievements", "awards", "honors", "honours", "accomplishments"),
+    "languages": ("languages", "spoken languages"),
+}
+
+# Relative weight of each kind in section-weighted scoring (ats_check)
+SECTION_WEIGHTS = {
+    "skills": 1.5, "experience": 1.25, "projects": 1.0, "certifications": 1.0, "summary": 1.0,
+    "achievements": 0.75, "education": 0.5, "languages": 0.25, "header": 0.25,
+}
+
+_HEADING_KIND = {heading: kind for kind, headings in SECTION_HEADINGS.items() for heading in headings}
+# Qualified headings count as their base heading: "Academic Education", "Education Details",
+# "Projects & Achievements", "Technical Skills & Tools" (the first heading decides the kind)
+_PREFIX = r"(?:(?:academic|technical|professional|relevant|key|core|personal|other|additional)[ \t]+)?"
+_QUALIFIER = (r"(?:[ \t]+(?:details|information|section|summary|overview|history)\b"
+              r"|[ \t]*(?:&|/|,|\band\b)[ \t]*[a-z]+(?:[ \t]+[a-z]+){0,2}(?=[ \t]*(?::|$)))?")
+# Longest first so "work experience" wins over "experience"
+_HEADING_RE = re.compile(
+    r"^[ \t]*" + _PREFIX + r"(?P<heading>"
+    + "|".join(re.escape(h) for h in sorted(_HEADING_KIND, key=len, reverse=True))
+    + r")\b" + _QUALIFIER + r"[ \t]*(?P<sep>[:\-–—|])?[ \t]*(?P<rest>[^\n]*)$",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+
+def segment(text, kind="header"):
+    """
+    [(kind, start, end), ...] in text order; spans cover the text after each heading. kind is the
+    section the text starts in (the last kind of the preceding text when segmenting a fragment).
+    """
+    sections = []
+    start = 0
+    for m in _HEADING_RE.finditer(text):
+        heading, rest = m.group("heading"), m.group("rest")
+        if rest and m.group("sep") != ":" and not (heading.isupper() and len(heading) > 3):
+            continue # a sentence that starts with a heading word ("Experience with ...")
+        if m.start() > start or kind != "header":
+            sections.append((kind, start, m.start()))
+        kind = _HEADING_KIND[heading.lower()]
+        start = m.start("rest") if rest else min(m.end() + 1, len(text))
+    sections.append((kind, start, len(text)))
+    return sections
+
+def section_kinds(sections):
+    return {kind for kind, _, _ in sections if kind != "header"}
+
+def section_texts(text, sections, kinds=None):
+    """[(kind, text)] for the given kinds (all by default), skipping empty spans."""
+    return [(kind, text[start:end]) for kind, start, end in sections
+            if (kinds is None or kind in kinds) and text[start:end].strip()]
@@ -0,0 +1,436 @@
+"""
+Optional semantic job matching: embeddings + an IVF approximate nearest-neighbour index.
+
+Embeddings
+    Default: hashed word (1-2 gram) and char_wb (3-5 gram) features, projected to
+    EMBED_DIM dense dims with a fixed sparse random projection. Pure CPU, no model files,
+    and robust to wording differences ("developer" vs "development").
+    If SEMANTIC_MODEL names a sentence-transformers model and the package is installed,
+    that local model is used instead.
+
+Index (IVF)
+    Job vectors are clustered with MiniBatchKMeans into ~sqrt(N) lists and written to a
+    memory-mapped float32 file, sorted by list so each list is one contiguous slice.
+    A query scores the centroids, probes the best `nprobe` lists (the recall/latency knob)
+    and does an exact dot product inside them. Jobs written after the build go to a small
+    in-memory delta that is searched exhaustively; deleted jobs are tombstoned.
+
+    Each build writes a new version directory and then atomically replaces the CURRENT
+    pointer, so readers never see a half-written index. Every process re-reads CURRENT at
+    most every SEMANTIC_RELOAD_CHECK_SECONDS, reloads when it changed and drops the delta
+    and tombstones of changes the new build already covers.
+
+    The index is rebuilt after each job refresh cycle (job_scheduler), and in the
+    background once SEMANTIC_REBUILD_THRESHOLD jobs changed since the loaded build.
+
+CLI:
+    python semantic_index.py build
+    python semantic_index.py bench --queries 200 --nprobe 1,2,4,8,16
+"""
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from database import SessionLocal, JobPost
+from job_ingest import add_job_listener
+
+INDEX_DIR = os.getenv("SEMANTIC_INDEX_DIR", "./semantic_index")
+SEMANTIC_MODEL = os.getenv("SEMANTIC_MODEL") # e.g. "all-MiniLM-L6-v2" (optional dependency)
+DEFAULT_NPROBE = int(os.getenv("SEMANTIC_NPROBE", "8"))
+RELOAD_CHECK_SECONDS = float(os.getenv("SEMANTIC_RELOAD_CHECK_SECONDS", "5"))
+REBUILD_THRESHOLD = int(os.getenv("SEMANTIC_REBUILD_THRESHOLD", "5000")) # changed jobs; 0 disables
+EMBED_DIM = 256
+CURRENT_FILE = "CURRENT" # names the live version directory inside INDEX_DIR
+_CONTRACT_CODES = {"full_time": 0, "internship": 1, "contractor": 2}
+
+
+# --- EMBEDDING ---
+
+class HashedEmbedder:
+    name = f"hashed-{EMBED_DIM}"
+    dim = EMBED_DIM
+
+    def __init__(self):
+        from sklearn.feature_extraction.text import HashingVectorizer
+        from sklearn.random_projection import SparseRandomProjection
+        from scipy import sparse
+
+        n_features = 2 ** 20
+        self._sparse = sparse
+        self._word = HashingVectorizer(ngram_range=(1, 2), n_features=n_features, alternate_sign=False,
+                                       stop_words="english", norm="l2", dtype=np.float32)
+        self._char = HashingVectorizer(analyzer="char_wb", ngram_range=(3, 5), n_features=n_features,
+                                       alternate_sign=False, norm="l2", dtype=np.float32)
+        # Fixed seed => every process projects identically, so stored vectors stay valid
+        self._proj = SparseRandomProjection(n_components=EMBED_DIM, dense_output=True, random_state=42)
+        self._proj.fit(sparse.csr_matrix((1, 2 * n_features), dtype=np.float32))
+
+    def embed(self, texts):
+        texts = [t or "" for t in texts]
+        features = self._sparse.hstack([self._word.transform(texts), self._char.transform(texts)]).tocsr()
+        return _normalize(np.asarray(self._proj.transform(features), dtype=np.float32))
+
+class SentenceEmbedder:
+    def __init__(self, model_name):
+        from sentence_transformers import SentenceTransformer
+        self._model = SentenceTransformer(model_name, device="cpu")
+        self.name = f"st-{model_name}"
+        self.dim = self._model.get_sentence_embedding_dimension()
+
+    def embed(self, texts):
+        return _normalize(np.asarray(self._model.encode(list(texts), batch_size=64), dtype=np.float32))
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+_embedder = None
+
+def get_embedder():
+    global _embedder
+    if _embedder is None:
+        if SEMANTIC_MODEL:
+            try:
+                _embedder = SentenceEmbedder(SEMANTIC_MODEL)
+            except ImportError:
+                print("WARNING: sentence-transformers not installed; falling back to hashed embeddings.")
+        if _embedder is None:
+            _embedder = HashedEmbedder()
+    return _embedder
+
+def job_text(title, description, skills_required):
+    return f"{title or ''}. {skills_required or ''}. {description or ''}"
+
+
+# --- INDEX ---
+
+def _epoch(dt) -> float:
+    return (dt - datetime(1970, 1, 1)).total_seconds() if dt else 0.0
+
+class SemanticIndex:
+    def __init__(self, path=INDEX_DIR, session_factory=SessionLocal):
+        self.path = path
+        self._session_factory = session_factory
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock() # one build at a time per process
+        self._rebuilding = False
+        self._checked_at = None # time.monotonic() of the last CURRENT read
+        self._version = None # version directory currently loaded
+        self.vectors = None  # memmap (N, dim), sorted by list
+        self.ids = None
+        self.offsets = None  # list i occupies rows offsets[i]:offsets[i+1]
+        self.centroids = None
+        self.contract = None
+        self.posted = None
+        self.meta = {}
+        self._delta = {}      # job_id -> (vector, contract_code, posted_epoch)
+        self._dirty_ids = set()
+        self._tombstones = {} # job_id -> time.time() of the change; hides the main-index copy
+        self._tombstone_ids = None # array of _tombstones' keys, rebuilt after changes
+
+    @property
+    def available(self) -> bool:
+        self._ensure_loaded()
+        return self.vectors is not None
+
+    # --- BUILD ---
+
+    def build(self, batch_size=2000, n_lists=None):
+        """Embed every job, cluster, and write the IVF files. Returns build stats."""
+        with self._build_lock:
+            return self._build(batch_size, n_lists)
+
+    def _build(self, batch_size, n_lists):
+        from sklearn.cluster import MiniBatchKMeans
+        from job_scheduler import freshness_cutoff
+
+        started = time.perf_counter()
+        read_at = time.time() # job changes before this are part of the build
+        embedder = get_embedder()
+        db = self._session_factory()
+        try:
+            rows = db.query(JobPost.id, JobPost.title, JobPost.description, JobPost.skills_required,
+                            JobPost.contract_type, JobPost.date_posted).filter(
+                JobPost.date_posted >= freshness_cutoff()).all()
+        finally:
+            db.close()
+        if not rows:
+            return {"jobs": 0}
+
+        ids = np.array([r[0] for r in rows], dtype=np.int64)
+        contract = np.array([_CONTRACT_CODES.get(r[4], -1) for r in rows], dtype=np.int8)
+        posted = np.array([_epoch(r[5]) for r in rows], dtype=np.float64)
+        vectors = np.empty((len(rows), embedder.dim), dtype=np.float32)
+        for start in range(0, len(rows), batch_size):
+            chunk = rows[start:start + batch_size]
+            vectors[start:start + len(chunk)] = embedder.embed([job_text(r[1], r[2], r[3]) for r in chunk])
+
+        n_lists = n_lists or max(1, int(np.sqrt(len(rows))))
+        n_lists = min(n_lists, len(rows))
+        kmeans = MiniBatchKMeans(n_clusters=n_lists, random_state=0, batch_size=4096, n_init=1)
+        assignment = kmeans.fit_predict(vectors)
+        centroids = _normalize(kmeans.cluster_centers_.astype(np.float32))
+
+        order = np.argsort(assignment, kind="stable")
+        offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=n_lists), out=offsets[1:])
+
+        previous = self._current_version()
+        version = f"v{time.time_ns()}"
+        target = os.path.join(self.path, version)
+        os.makedirs(target)
+        mm = np.lib.format.open_memmap(os.path.join(target, "vectors.npy"), mode="w+", dtype=np.float32, shape=vectors.shape)
+        mm[:] = vectors[order]
+        mm.flush()
+        del mm
+        np.save(os.path.join(target, "ids.npy"), ids[order])
+        np.save(os.path.join(target, "offsets.npy"), offsets)
+        np.save(os.path.join(target, "centroids.npy"), centroids)
+        np.save(os.path.join(target, "contract.npy"), contract[order])
+        np.save(os.path.join(target, "posted.npy"), posted[order])
+        meta = {"embedder": embedder.name, "dim": embedder.dim, "jobs": len(rows), "lists": n_lists,
+                "built_at": datetime.utcnow().isoformat() + "Z", "read_at": read_at, "version": version}
+        with open(os.path.join(target, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+        # Publish: readers only follow CURRENT, so they switch from one complete version to the next
+        tmp = os.path.join(self.path, CURRENT_FILE + ".tmp")
+        with open(tmp, "w") as f:
+            f.write(version)
+        os.replace(tmp, os.path.join(self.path, CURRENT_FILE))
+        # Keep the previous version for processes still reading it; older ones go
+        for name in os.listdir(self.path):
+            if name.startswith("v") and name not in (version, previous):
+                shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+        self._ensure_loaded(force=True)
+        meta["seconds"] = round(time.perf_counter() - started, 2)
+        return meta
+
+    def rebuild_in_background(self):
+        """Start a build on a daemon thread unless one is already running. Returns the thread or None."""
+        with self._lock:
+            if self._rebuilding:
+                return None
+            self._rebuilding = True
+
+        def run():
+            try:
+                print(f"Semantic index rebuilt: {self.build()}")
+            except Exception as e:
+                print(f"Semantic index rebuild failed: {e}")
+            finally:
+                with self._lock:
+                    self._rebuilding = False
+
+        thread = threading.Thread(target=run, name="semantic-rebuild", daemon=True)
+        thread.start()
+        return thread
+
+    # --- LOAD / CHANGES ---
+
+    def _current_version(self):
+        try:
+            with open(os.path.join(self.path, CURRENT_FILE)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _ensure_loaded(self, force=False):
+        """(Re)load when CURRENT names a version other than the loaded one, e.g. after another process built."""
+        now = time.monotonic()
+        if not force and self._checked_at is not None and now - self._checked_at < RELOAD_CHECK_SECONDS:
+            return
+        self._checked_at = now
+        version = self._current_version()
+        with self._lock:
+            if version == self._version:
+                return
+            self._version = version
+            self.vectors = None
+            if version is None:
+                return
+            target = os.path.join(self.path, version)
+            with open(os.path.join(target, "meta.json")) as f:
+                meta = json.load(f)
+            if meta.get("embedder") != get_embedder().name:
+                print(f"WARNING: semantic index built with {meta.get('embedder')}; rebuild it for {get_embedder().name}.")
+                return
+            self.meta = meta
+            self.ids = np.load(os.path.join(target, "ids.npy"))
+            self.offsets = np.load(os.path.join(target, "offsets.npy"))
+            self.centroids = np.load(os.path.join(target, "centroids.npy"))
+            self.contract = np.load(os.path.join(target, "contract.npy"))
+            self.posted = np.load(os.path.join(target, "posted.npy"))
+            self.vectors = np.load(os.path.join(target, "vectors.npy"), mmap_mode="r")
+
+            # Changes made before the build read the jobs are in the new version
+            covered = [job_id for job_id, changed_at in self._tombstones.items() if changed_at < meta.get("read_at", 0)]
+            for job_id in covered:
+                del self._tombstones[job_id]
+                self._delta.pop(job_id, None)
+                self._dirty_ids.discard(job_id)
+            self._tombstone_ids = None
+
+    def on_jobs_changed(self, upserted_ids, removed_ids):
+        changed_at = time.time()
+        with self._lock:
+            self._dirty_ids.update(upserted_ids)
+            for job_id in list(upserted_ids) + list(removed_ids):
+                self._tombstones[job_id] = changed_at # stale copy in the main index, if any
+            for job_id in removed_ids:
+                self._delta.pop(job_id, None)
+                self._dirty_ids.discard(job_id)
+            self._tombstone_ids = None
+            # The delta is scanned exhaustively and tombstones are checked on every probed list
+            overdue = self._version is not None and 0 < REBUILD_THRESHOLD <= len(self._tombstones)
+        if overdue:
+            self.rebuild_in_background()
+
+    def _apply_dirty(self):
+        with self._lock:
+            ids = set(self._dirty_ids)
+            self._dirty_ids.clear()
+        if not ids:
+            return
+        db = self._session_factory()
+        try:
+            rows = db.query(JobPost.id, JobPost.title, JobPost.description, JobPost.skills_required,
+                            JobPost.contract_type, JobPost.date_posted).filter(JobPost.id.in_(list(ids))).all()
+        finally:
+            db.close()
+        vectors = get_embedder().embed([job_text(r[1], r[2], r[3]) for r in rows]) if rows else []
+        with self._lock:
+            for r, vec in zip(rows, vectors):
+                if r[0] in self._tombstones: # not covered by a build loaded meanwhile
+                    self._delta[r[0]] = (vec, _CONTRACT_CODES.get(r[4], -1), _epoch(r[5]))
+
+    # --- QUERY ---
+
+    def search(self, text, k=20, nprobe=None, contract_type=None, fresh_after=None, exact=False):
+        """Return [(job_id, cosine)] best first. exact=True scans every list (ground truth)."""
+        self._ensure_loaded()
+        self._apply_dirty()
+        query = get_embedder().embed([text])[0]
+        return self.search_vector(query, k, nprobe, contract_type, fresh_after, exact)
+
+    def search_vector(self, query, k=20, nprobe=None, contract_type=None, fresh_after=None, exact=False):
+        want_contract = _CONTRACT_CODES.get(contract_type, -2) if contract_type else None
+        min_posted = _epoch(fresh_after) if fresh_after else None
+        with self._lock:
+            if self._tombstone_ids is None:
+                self._tombstone_ids = np.fromiter(self._tombstones, dtype=np.int64, count=len(self._tombstones))
+            tombstones = self._tombstone_ids
+            delta = list(self._delta.items())
+            # One consistent version even if a reload swaps the arrays meanwhile
+            vectors, job_ids, offsets, centroids = self.vectors, self.ids, self.offsets, self.centroids
+            contract, posted = self.contract, self.posted
+        best_ids, best_scores = [], []
+
+        if vectors is not None and len(job_ids):
+            n_lists = len(centroids)
+            if exact:
+                probe = np.arange(n_lists)
+            else:
+                nprobe = min(nprobe or DEFAULT_NPROBE, n_lists)
+                centroid_scores = centroids @ query
+                probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+            for lst in probe:
+                lo, hi = offsets[lst], offsets[lst + 1]
+                if lo == hi:
+                    continue
+                scores = np.asarray(vectors[lo:hi]) @ query
+                mask = np.ones(hi - lo, dtype=bool)
+                if want_contract is not None:
+                    mask &= contract[lo:hi] == want_contract
+                if min_posted is not None:
+                    mask &= posted[lo:hi] >= min_posted
+                if len(tombstones):
+                    # Updated/deleted since the build; live copies (if any) come from the delta
+                    mask &= ~np.isin(job_ids[lo:hi], tombstones)
+                idx = np.flatnonzero(mask)
+                if len(idx):
+                    best_ids.append(job_ids[lo:hi][idx])
+                    best_scores.append(scores[idx])
+
+        for job_id, (vec, code, posted) in delta:
+            if want_contract is not None and code != want_contract:
+                continue
+            if min_posted is not None and posted < min_posted:
+                continue
+            best_ids.append(np.array([job_id], dtype=np.int64))
+            best_scores.append(np.array([float(vec @ query)], dtype=np.float32))
+
+        if not best_ids:
+            return []
+        ids = np.concatenate(best_ids)
+        scores = np.concatenate(best_scores)
+        if len(ids) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            ids, scores = ids[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        return [(int(ids[i]), float(scores[i])) for i in order]
+
+
+semantic_index = SemanticIndex()
+add_job_listener(semantic_index.on_jobs_changed)
+
+
+# --- RECALL BENCHMARK ---
+
+def benchmark(index, n_queries=200, k=10, nprobes=(1, 2, 4, 8, 16), seed=0):
+    """Recall@k and latency of the IVF search against the exact (all lists) scan."""
+    index._ensure_loaded(force=True)
+    if index.vectors is None:
+        raise RuntimeError("Semantic index not built. Run: python semantic_index.py build")
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(index.ids), size=min(n_queries, len(index.ids)), replace=False)
+    # Perturb stored job vectors so queries are near, but not identical to, a job
+    queries = _normalize(np.asarray(index.vectors[np.sort(picks)]) + rng.normal(0, 0.02, (len(picks), index.vectors.shape[1])).astype(np.float32))
+
+    truth = [set(i for i, _ in index.search_vector(q, k, exact=True)) for q in queries]
+    report = []
+    for nprobe in nprobes:
+        started = time.perf_counter()
+        hits = 0
+        for q, expected in zip(queries, truth):
+            got = index.search_vector(q, k, nprobe=nprobe)
+            hits += len(expected & {i for i, _ in got})
+        elapsed = time.perf_counter() - started
+        report.append({"nprobe": nprobe, "recall": round(hits / max(1, sum(len(t) for t in truth)), 4),
+                       "ms_per_query": round(elapsed / len(queries) * 1000, 3)})
+
+    started = time.perf_counter()
+    for q in queries:
+        index.search_vector(q, k, exact=True)
+    exact_ms = (time.perf_counter() - started) / len(queries) * 1000
+    return {"jobs": len(index.ids), "lists": len(index.centroids), "k": k,
+            "exact_ms_per_query": round(exact_ms, 3), "ivf": report}
+
+
+if __name__ == "__main__":
+    import argparse
+    from database import init_db
+
+    parser = argparse.ArgumentParser(description="Build or benchmark the semantic job index.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build_cmd = sub.add_parser("build")
+    build_cmd.add_argument("--lists", type=int, default=None)
+    bench_cmd = sub.add_parser("bench")
+    bench_cmd.add_argument("--queries", type=int, default=200)
+    bench_cmd.add_argument("--k", type=int, default=10)
+    bench_cmd.add_argument("--nprobe", default="1,2,4,8,16")
+    args = parser.parse_args()
+
+    init_db()
+    if args.command == "build":
+        print(semantic_index.build(n_lists=args.lists))
+    else:
+        nprobes = tuple(int(n) for n in args.nprobe.split(","))
+        print(json.dumps(benchmark(semantic_index, args.queries, args.k, nprobes), indent=2))
@@ -0,0 +1,34 @@
+import re
+
+# --- GLOBAL SKILL TAXONOMY ---
+# Shared by the API (main.py) and offline tools (job ingestion, ranking) so they
+# all agree on what counts as a skill.
+TECHNICAL_SKILLS = {
+    "Languages": ["python", "java", "javascript", "typescript", "c++", "c#", "golang", "rust", "swift", "kotlin", "php", "ruby", "scala"],
+    "Frontend": ["react", "angular", "vue.js", "vue", "next.js", "nuxt.js", "svelte", "html", "css", "sass", "tailwind", "bootstrap"],
+    "Backend": ["node.js", "express", "django", "flask", "fastapi", "spring boot", "ruby on rails", "asp.net", "graphql"],
+    "Database": ["sql", "mysql", "postgresql", "mongodb", "redis", "elasticsearch", "cassandra", "firebase", "sqlite"],
+    "DevOps": ["docker", "kubernetes", "aws", "azure", "gcp", "terraform", "jenkins", "circleci", "git", "linux", "bash"],
+    "Data Science": ["machine learning", "deep learning", "nlp", "tensorflow", "pytorch", "pandas", "numpy", "scikit-learn", "keras", "opencv", "spark", "hadoop"],
+    "Tools": ["jira", "agile", "scrum", "figma", "adobe xd", "selenium", "jest", "cypress"]
+}
+
+ALL_SKILLS = frozenset(s for skills in TECHNICAL_SKILLS.values() for s in skills)
+
+# One alternation instead of one regex per skill. Longest names first so that
+# "vue.js" wins over "vue" and "spring boot" is not reported as nothing.
+_SKILL_RE = re.compile(
+    r'\b(' + "|".join(re.escape(s) for s in sorted(ALL_SKILLS, key=len, reverse=True)) + r')\b'
+)
+
+def find_skills(text: str) -> set:
+    """Return the lower-case taxonomy skills mentioned in text (single pass)."""
+    if not text:
+        return set()
+    return set(_SKILL_RE.findall(text.lower()))
+
+def split_skills(skills_required: str) -> set:
+    """Parse a comma separated skills_required column into normalized skill names."""
+    if not skills_required:
+        return set()
+    return {s.strip().lower() for s in skills_required.split(",") if s.strip()}
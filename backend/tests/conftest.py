@@ -0,0 +1,51 @@
+"""
+Shared fixtures. Modules read their settings from the environment at import time, so the
+scratch database and upload directories are configured here, before anything imports them.
+
+Run from backend/:  python -m pytest -q
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+SCRATCH = tempfile.mkdtemp(prefix="launchpad-tests-")
+DB_PATH = os.path.join(SCRATCH, "test.db")
+
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ["UPLOAD_DIR"] = os.path.join(SCRATCH, "uploads")
+os.environ["RETENTION_ARCHIVE_DIR"] = os.path.join(SCRATCH, "upload_archive")
+os.environ["SEMANTIC_INDEX_DIR"] = os.path.join(SCRATCH, "semantic_index")
+os.environ["RETENTION_IO_BYTES_PER_SEC"] = "0" # no throttling in tests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from database import Base, SessionLocal
+
+
+@pytest.fixture(autouse=True)
+def fresh_store():
+    """Every test starts with empty tables (no seed data) and empty upload / archive directories."""
+    # NullPool: no connection outlives a test, so the file can simply be replaced
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+    for key in ("UPLOAD_DIR", "RETENTION_ARCHIVE_DIR", "SEMANTIC_INDEX_DIR"):
+        shutil.rmtree(os.environ[key], ignore_errors=True)
+    os.makedirs(os.environ["UPLOAD_DIR"])
+    from database import engine
+    Base.metadata.create_all(engine)
+    yield
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(SCRATCH, ignore_errors=True)
@@ -0,0 +1,85 @@
+import pytest
+from fastapi import HTTPException
+
+from ats import build_session, split_blocks
+
+JD = """Senior Python Developer
+
+We need strong Python, Django and PostgreSQL experience, REST API design and Docker.
+
+Nice to have: Kubernetes, AWS, CI/CD pipelines and React."""
+
+RESUME = """Jane Doe
+jane@example.com
+
+Summary
+Backend engineer building Python services.
+
+Experience
+Built REST APIs with Flask and PostgreSQL at Acme.
+Maintained CI pipelines.
+
+Skills
+Python, SQL, Git"""
+
+
+def full_rescore(job_description, resume_text):
+    return build_session(job_description, resume_text).result()
+
+def assert_same(session, job_description, resume_text):
+    got = session.result()
+    want = full_rescore(job_description, resume_text)
+    assert got["score"] == want["score"]
+    assert sorted(got["matched_keywords"]) == sorted(want["matched_keywords"])
+    assert sorted(got["missing_keywords"]) == sorted(want["missing_keywords"])
+    # The running totals are exact, not just close enough to round to the same score
+    fresh = build_session(job_description, resume_text)
+    assert (session.dot, session.jd_sq, session.resume_sq) == (fresh.dot, fresh.jd_sq, fresh.resume_sq)
+
+
+def test_block_edits_match_a_full_rescore():
+    session = build_session(JD, RESUME)
+    assert_same(session, JD, RESUME)
+
+    blocks = split_blocks(RESUME)
+    # Rewrite the experience block and append a new one
+    experience = blocks.index(next(b for b in blocks if b.startswith("Experience")))
+    blocks[experience] = "Experience\nBuilt REST APIs with Django, Docker and PostgreSQL at Acme."
+    session.edit_resume(experience, experience + 1, [blocks[experience]])
+    blocks.append("Projects\nDeployed a Kubernetes cluster on AWS.")
+    session.edit_resume(len(blocks) - 1, len(blocks) - 1, [blocks[-1]])
+    assert_same(session, JD, "\n\n".join(blocks))
+
+    # Drop the JD's nice-to-have paragraph
+    jd_blocks = split_blocks(JD)
+    session.edit_jd(len(jd_blocks) - 1, len(jd_blocks), [])
+    assert_same(session, "\n\n".join(jd_blocks[:-1]), "\n\n".join(blocks))
+
+def test_full_text_updates_match_a_full_rescore():
+    session = build_session(JD, RESUME)
+    texts = [
+        RESUME.replace("Flask", "Django and Docker"),
+        RESUME.replace("Skills\n", "") + "\n\nSkills\nKubernetes, AWS, React", # heading moves: sections re-inherit
+        "",
+        RESUME,
+    ]
+    for text in texts:
+        session.set_resume(text)
+        assert_same(session, JD, text)
+
+    for jd in ("Python developer", JD + "\n\nMust know Terraform.", JD):
+        session.set_jd(jd) # the short JD is expanded with inferred requirements
+        assert_same(session, jd, RESUME)
+
+def test_a_resume_or_document_is_required():
+    with pytest.raises(HTTPException) as raised:
+        build_session(JD)
+    assert raised.value.status_code == 422
+    assert build_session(JD, "").result()["score"] == 0
+
+def test_stage_timings_are_reported_once():
+    session = build_session(JD, RESUME)
+    session.result()
+    assert {"text_cleaning", "vectorizer_fit", "cosine_similarity", "keyword_diff"} <= set(session.timings)
+    session.report_stages("ats_check")
+    assert not session.timings
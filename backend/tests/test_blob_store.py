@@ -0,0 +1,75 @@
+import os
+
+import blob_store
+from database import ResumeBlob, UserActivity
+from blob_store import put_blob, add_ref, release_activity_refs, count_resumes, blob_abs_path
+
+
+def upload(db, contents, filename="cv.pdf", user_name="Sam"):
+    """What the upload routes do: store the blob, log the activity, take a reference."""
+    blob = put_blob(db, contents, filename)
+    db.add(UserActivity(user_name=user_name, activity_type="resume_upload", details=f"File: {filename}",
+                        file_hash=blob.sha256))
+    add_ref(db, blob.sha256)
+    db.commit()
+    return blob.sha256
+
+
+def test_same_content_is_stored_once(db):
+    first = upload(db, b"%PDF same bytes", "a.pdf")
+    second = upload(db, b"%PDF same bytes", "renamed.pdf")
+    assert first == second
+
+    blob = db.get(ResumeBlob, first)
+    assert blob.ref_count == 2
+    assert blob.rel_path == f"blobs/{first[:2]}/{first[2:4]}/{first}.pdf"
+    with open(blob_abs_path(blob.rel_path), "rb") as f:
+        assert f.read() == b"%PDF same bytes"
+    assert db.query(ResumeBlob).count() == 1
+
+def test_file_is_written_only_when_the_row_commits(db):
+    blob = put_blob(db, b"%PDF never committed", "cv.pdf")
+    path = blob_abs_path(blob.rel_path)
+    assert not os.path.exists(path)
+    db.rollback()
+    assert not os.path.exists(path)
+    assert db.query(ResumeBlob).count() == 0
+
+    sha = upload(db, b"%PDF committed", "cv.pdf")
+    assert os.path.exists(blob_abs_path(db.get(ResumeBlob, sha).rel_path))
+
+def test_release_decrements_and_clamps_at_zero(db):
+    shared = upload(db, b"%PDF shared")
+    upload(db, b"%PDF shared", user_name="Alex")
+    solo = upload(db, b"%PDF solo", user_name="Alex")
+    assert count_resumes(db) == 2
+
+    released = release_activity_refs(db, UserActivity.user_name == "Alex")
+    db.commit()
+    assert released == 2
+    assert db.get(ResumeBlob, shared).ref_count == 1
+    assert db.get(ResumeBlob, solo).ref_count == 0
+    assert count_resumes(db) == 1
+
+    # Releasing the same activities again must not go negative
+    release_activity_refs(db, UserActivity.user_name == "Alex")
+    db.commit()
+    db.expire_all()
+    assert db.get(ResumeBlob, solo).ref_count == 0
+
+def test_listeners_hear_referenced_count_changes_on_commit_only(db):
+    heard = []
+    blob_store._resume_listeners.append(heard.append)
+    try:
+        upload(db, b"%PDF one")
+        upload(db, b"%PDF one") # second reference to the same resume: not a new one
+        upload(db, b"%PDF two")
+        put_blob(db, b"%PDF rolled back", "cv.pdf")
+        add_ref(db, blob_store.content_hash(b"%PDF rolled back"))
+        db.rollback()
+        release_activity_refs(db)
+        db.commit()
+    finally:
+        blob_store._resume_listeners.remove(heard.append)
+    assert heard == [1, 1, -2]
+    assert count_resumes(db) == 0
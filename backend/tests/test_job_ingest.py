@@ -0,0 +1,88 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+
+import job_ingest
+from database import JobPost, JobSkill
+from job_ingest import ingest_jobs, parse_date
+
+
+def posting(title="Python Developer", company="Acme", location="London", **extra):
+    return {"title": title, "company": company, "location": location,
+            "description": "Build APIs with Python and SQL.", **extra}
+
+def jobs_by_title(db):
+    return {job.title: job for job in db.query(JobPost)}
+
+@pytest.fixture(params=["native", "generic"])
+def upsert_path(request, monkeypatch):
+    # "generic" is the select-then-update path used by dialects without ON CONFLICT
+    if request.param == "generic":
+        monkeypatch.setattr(job_ingest, "_upsert_statement", lambda dialect_name: None)
+    return request.param
+
+
+def test_parse_date_rejects_missing_and_garbage():
+    assert parse_date(None) is None
+    assert parse_date("") is None
+    assert parse_date("not a date") is None
+    assert parse_date("2026-03-01T10:00:00+02:00") == datetime(2026, 3, 1, 8, 0)
+
+def test_dedupes_within_a_feed_and_counts_invalid_rows(db, upsert_path):
+    records = [
+        posting(date_posted="2026-01-02T00:00:00Z"),
+        posting(title="  python   developer ", company="ACME", date_posted="2026-01-03T00:00:00Z"), # same hash
+        posting(title="Data Analyst", date_posted="2026-01-05T00:00:00Z"),
+        {"title": "No company"},
+        "not a record",
+    ]
+    stats = ingest_jobs(records, batch_size=2)
+
+    assert stats["received"] == 5
+    assert stats["invalid"] == 2
+    assert stats["duplicates"] == 1
+    assert stats["upserted"] == 2
+    assert stats["batches"] == 1
+    assert stats["newest"] == datetime(2026, 1, 5)
+    assert db.query(JobPost).count() == 2
+
+def test_reingest_updates_in_place_and_rewrites_skills(db, upsert_path):
+    ingest_jobs([posting(skills_required="Python, SQL", date_posted="2026-01-02")])
+    first = jobs_by_title(db)["Python Developer"]
+    job_id = first.id
+
+    ingest_jobs([posting(skills_required="Python, Docker", url="https://example.com/1", date_posted="2026-01-02")])
+    db.expire_all()
+    jobs = jobs_by_title(db)
+    assert list(jobs) == ["Python Developer"]
+    assert jobs["Python Developer"].id == job_id
+    assert jobs["Python Developer"].url == "https://example.com/1"
+    skills = set(db.execute(select(JobSkill.skill).where(JobSkill.job_id == job_id)).scalars())
+    assert skills == {"python", "docker"}
+
+def test_undated_postings_keep_their_date_on_reingest(db, upsert_path):
+    stats = ingest_jobs([posting(date_posted="2026-01-02T00:00:00Z"),
+                         posting(title="Ops Engineer", date_posted="garbage"),
+                         posting(title="QA Engineer")])
+    assert stats["undated"] == 2
+    assert stats["newest"] == datetime(2026, 1, 2)
+    before = {title: job.date_posted for title, job in jobs_by_title(db).items()}
+    # New undated rows are stamped once, when first seen
+    assert before["Ops Engineer"] is not None and before["QA Engineer"] is not None
+
+    stats = ingest_jobs([posting(), posting(title="Ops Engineer"), posting(title="QA Engineer", date_posted="??")])
+    assert stats["undated"] == 3
+    assert stats["newest"] is None
+    db.expire_all()
+    assert {title: job.date_posted for title, job in jobs_by_title(db).items()} == before
+
+def test_listeners_hear_committed_job_ids(db):
+    heard = []
+    job_ingest._job_listeners.append(lambda upserted, removed: heard.append((sorted(upserted), removed)))
+    try:
+        ingest_jobs([posting(), posting(title="Data Analyst")])
+    finally:
+        job_ingest._job_listeners.pop()
+    ids = sorted(job.id for job in db.query(JobPost))
+    assert heard == [(ids, [])]
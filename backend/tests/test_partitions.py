@@ -0,0 +1,78 @@
+from datetime import datetime
+
+from sqlalchemy import func, select
+
+import partitions
+from blob_store import put_blob, add_ref
+from database import ResumeBlob, SystemLog, UserActivity
+from partitions import maintain, newest, segments, status, truncate
+
+NOW = datetime(2026, 6, 15, 12, 0) # hot window (PARTITION_HOT_MONTHS=2): May and June
+
+
+def seed(db):
+    for month in (2, 3, 4, 5, 6):
+        ts = datetime(2026, month, 10, 9, 0)
+        db.add(UserActivity(user_name="Sam", activity_type="visit", timestamp=ts))
+        db.add(UserActivity(user_name="Sam", activity_type="ats_check", timestamp=ts))
+        db.add(SystemLog(level="INFO", message=f"log {month}", timestamp=ts))
+    db.commit()
+
+def count_all(db, name, streams=None):
+    return sum(db.execute(select(func.count()).select_from(table)).scalar()
+               for table in segments(db, name, streams=streams))
+
+
+def test_rolls_closed_months_into_archive_tables(db):
+    seed(db)
+    report = maintain(now=NOW)
+    assert report["moved"] == 3 * 3 # Feb-Apr: a visit, an event and a log each
+    assert report["dropped"] == 0
+
+    layout = status(db)
+    assert layout["user_activities"] == {
+        "user_activities": 4,
+        "user_activities_events_p2026_02": 1, "user_activities_events_p2026_03": 1, "user_activities_events_p2026_04": 1,
+        "user_activities_visits_p2026_02": 1, "user_activities_visits_p2026_03": 1, "user_activities_visits_p2026_04": 1,
+    }
+    assert layout["system_logs"]["system_logs"] == 2 + 1 # May, June and maintain()'s own log line
+    assert layout["system_logs"]["system_logs_p2026_02"] == 1
+
+    # Readers still see every row, and can skip archives outside their range
+    assert count_all(db, "user_activities") == 10
+    assert count_all(db, "user_activities", streams=("events",)) == 10 - 3 # archived visits skipped
+    assert [t.name for t in segments(db, "system_logs", since=datetime(2026, 4, 1))] == ["system_logs", "system_logs_p2026_04"]
+    logs = newest(db, "system_logs", ("message", "timestamp"), where=lambda c: c.level == "INFO", limit=4)
+    assert [row.message for row in logs] == ["log 6", "log 5", "log 4", "log 3"]
+
+    # A second run has nothing left to move
+    assert maintain(now=NOW)["moved"] == 0
+
+def test_retention_drops_old_months_and_releases_their_resumes(db, monkeypatch):
+    spec = partitions.PARTITIONED["user_activities"]
+    monkeypatch.setitem(partitions.PARTITIONED, "user_activities", spec._replace(retention_months=3))
+    sha = put_blob(db, b"%PDF old upload", "cv.pdf").sha256
+    db.add(UserActivity(user_name="Sam", activity_type="resume_upload", timestamp=datetime(2026, 2, 3), file_hash=sha))
+    add_ref(db, sha)
+    db.commit()
+    seed(db)
+
+    report = maintain(now=NOW)
+
+    # Keeps April-June; February and March go
+    assert report["dropped"] == 4
+    assert not any("p2026_02" in name or "p2026_03" in name for name in status(db)["user_activities"])
+    assert count_all(db, "user_activities") == 6
+    db.expire_all()
+    assert db.get(ResumeBlob, sha).ref_count == 0
+    assert count_all(db, "system_logs") == 5 + 1 # no log retention configured
+
+def test_truncate_one_stream_keeps_the_other(db):
+    seed(db)
+    maintain(now=NOW)
+    truncate(db, "user_activities", "events")
+    db.commit()
+    assert count_all(db, "user_activities") == 5
+    assert db.query(UserActivity).filter(UserActivity.activity_type != "visit").count() == 0
+    assert set(status(db)["user_activities"]) == {"user_activities", "user_activities_visits_p2026_02",
+                                                  "user_activities_visits_p2026_03", "user_activities_visits_p2026_04"}
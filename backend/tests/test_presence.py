@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+
+from database import User
+from presence import TimingWheel, Presence
+
+T0 = 1_800_000_000.0 # a tick boundary for tick=5
+
+
+def wheel():
+    return TimingWheel({"online": 60, "active": 900}, tick=5)
+
+
+def test_users_leave_each_window_when_it_passes():
+    w = wheel()
+    w.beat(1, T0)
+    w.beat(2, T0 + 30)
+    assert (w.count("online", T0 + 30), w.count("active", T0 + 30)) == (2, 2)
+
+    # 60 s window: user 1 drops out after 60 s, user 2 thirty seconds later
+    assert w.count("online", T0 + 55) == 2
+    assert w.count("online", T0 + 60) == 1
+    assert not w.seen_within(1, "online", T0 + 60)
+    assert w.seen_within(2, "online", T0 + 60)
+    assert w.count("online", T0 + 90) == 0
+    assert w.count("active", T0 + 90) == 2
+
+    assert w.count("active", T0 + 900) == 1
+    assert w.count("active", T0 + 930) == 0
+
+def test_a_new_beat_moves_the_user_instead_of_counting_twice():
+    w = wheel()
+    w.beat(1, T0)
+    w.beat(1, T0 + 50)
+    assert w.count("online", T0 + 50) == 1
+    assert w.count("online", T0 + 100) == 1 # kept alive by the second beat
+    assert w.count("active", T0 + 100) == 1
+
+    # An older beat (e.g. merged from another worker) does not move it back
+    w.beat(1, T0 + 10)
+    assert w.seen_within(1, "online", T0 + 105)
+
+def test_discard_and_beats_older_than_the_wheel():
+    w = wheel()
+    w.beat(1, T0 + 1000)
+    w.beat(2, T0 + 1000)
+    w.discard(1)
+    assert w.count("online", T0 + 1000) == 1
+    assert not w.seen_within(1, "active", T0 + 1000)
+
+    w.beat(3, T0) # 1000 s ago: outside even the active window
+    assert w.count("active", T0 + 1000) == 1
+
+def test_idle_longer_than_every_window_starts_empty():
+    w = wheel()
+    for user_id in range(1, 50):
+        w.beat(user_id, T0 + user_id)
+    assert w.count("active", T0 + 100) == 49
+    assert w.count("active", T0 + 5000) == 0
+    assert w.count("online", T0 + 5000) == 0
+    w.beat(7, T0 + 5000)
+    assert w.count("online", T0 + 5000) == 1
+
+def test_heartbeats_are_counted_without_admins_and_flushed_in_one_batch(db):
+    db.add_all([User(id=1, email="a@x.io", role="user", last_active=datetime(2020, 1, 1)),
+                User(id=2, email="b@x.io", role="admin", last_active=datetime(2020, 1, 1))])
+    db.commit()
+
+    presence = Presence()
+    presence.heartbeat(1)
+    presence.heartbeat(2, role="admin")
+    assert presence.count("online") == 1 and presence.count("active") == 1
+    assert presence.is_online(1) and not presence.is_online(2)
+
+    assert presence.flush() == 2
+    assert presence.flush() == 0
+    db.expire_all()
+    for user in db.query(User):
+        assert datetime.utcnow() - user.last_active < timedelta(minutes=1)
+
+    presence.set_deleted(1, True)
+    assert presence.count("online") == 0
@@ -0,0 +1,85 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from blob_store import put_blob
+from resume_files import router, IMMUTABLE_CACHE
+
+CONTENT = bytes(range(256)) * 40 # 10240 bytes
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+@pytest.fixture
+def blob(db):
+    stored = put_blob(db, CONTENT, "Jane Doe CV.pdf")
+    db.commit()
+    return stored.sha256, "/uploads/" + stored.rel_path
+
+
+def test_full_file_with_validators(client, blob):
+    sha, url = blob
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers["etag"] == f'"{sha}"'
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["content-type"] == "application/pdf"
+    assert response.headers["content-length"] == str(len(CONTENT))
+    assert "Jane%20Doe%20CV.pdf" in response.headers["content-disposition"]
+
+    assert client.get(f"/resumes/{sha}").content == CONTENT
+
+def test_if_none_match_answers_304(client, blob):
+    sha, url = blob
+    for header in (f'"{sha}"', f'W/"{sha}"', f'"other", "{sha}"', "*"):
+        response = client.get(url, headers={"If-None-Match": header})
+        assert response.status_code == 304, header
+        assert response.content == b""
+        assert response.headers["etag"] == f'"{sha}"'
+    assert client.get(url, headers={"If-None-Match": '"other"'}).status_code == 200
+
+@pytest.mark.parametrize("header, start, end", [
+    ("bytes=0-99", 0, 99),
+    ("bytes=10000-", 10000, 10239),
+    ("bytes=-240", 10000, 10239),
+    ("bytes=10200-99999", 10200, 10239),
+])
+def test_single_ranges(client, blob, header, start, end):
+    _, url = blob
+    response = client.get(url, headers={"Range": header})
+    assert response.status_code == 206
+    assert response.content == CONTENT[start:end + 1]
+    assert response.headers["content-range"] == f"bytes {start}-{end}/{len(CONTENT)}"
+    assert response.headers["content-length"] == str(end - start + 1)
+
+def test_unsatisfiable_range_is_416(client, blob):
+    _, url = blob
+    for header in ("bytes=10240-", "bytes=-0", "bytes=50-10"):
+        response = client.get(url, headers={"Range": header})
+        assert response.status_code == 416, header
+        assert response.headers["content-range"] == f"bytes */{len(CONTENT)}"
+
+def test_multi_range_and_stale_if_range_get_the_full_file(client, blob):
+    _, url = blob
+    assert client.get(url, headers={"Range": "bytes=0-1,5-6"}).content == CONTENT
+    response = client.get(url, headers={"Range": "bytes=0-1", "If-Range": '"stale"'})
+    assert response.status_code == 200
+    assert response.content == CONTENT
+
+def test_head_has_headers_but_no_body(client, blob):
+    _, url = blob
+    response = client.head(url)
+    assert response.status_code == 200
+    assert response.content == b""
+    assert response.headers["content-length"] == str(len(CONTENT))
+
+def test_unknown_or_mismatched_paths_are_404(client, blob):
+    sha, url = blob
+    assert client.get(url.replace(sha[:2], "zz", 1)).status_code == 404
+    assert client.get(f"/resumes/{'0' * 64}").status_code == 404
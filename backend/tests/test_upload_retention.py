@@ -0,0 +1,106 @@
+import os
+import zipfile
+from datetime import datetime, timedelta
+
+import pytest
+
+import upload_retention
+from blob_store import put_blob, add_ref, blob_abs_path, archive_abs_path, ARCHIVE_DIR, UPLOAD_DIR
+from database import ResumeBlob, UserActivity
+from resume_files import _read_archived
+from upload_retention import run_retention
+
+NOW = datetime(2026, 6, 15, 12, 0)
+
+
+def stored(db, contents, refs=0, last_used_days=0, created=NOW):
+    blob = put_blob(db, contents, "cv.pdf")
+    sha = blob.sha256
+    for _ in range(refs):
+        db.add(UserActivity(user_name="Sam", activity_type="resume_upload", details="File: cv.pdf", file_hash=sha))
+        add_ref(db, sha)
+    db.commit()
+    blob = db.get(ResumeBlob, sha)
+    blob.last_used_at = NOW - timedelta(days=last_used_days)
+    blob.created_at = created
+    db.commit()
+    return sha
+
+@pytest.fixture(autouse=True)
+def small_batches(monkeypatch):
+    monkeypatch.setattr(upload_retention, "BATCH_SIZE", 2)
+
+
+def test_sweeps_orphans_and_expired_blobs_but_keeps_referenced_ones(db):
+    orphan = stored(db, b"orphan", refs=0, last_used_days=1)
+    fresh_orphan = stored(db, b"just uploaded", refs=0)
+    expired = stored(db, b"expired", refs=1, last_used_days=upload_retention.MAX_AGE_DAYS + 1)
+    live = stored(db, b"live", refs=1, last_used_days=3)
+    paths = {sha: blob_abs_path(db.get(ResumeBlob, sha).rel_path) for sha in (orphan, fresh_orphan, expired, live)}
+
+    report = run_retention(now=NOW)
+
+    assert report["orphans"] == 1 and report["expired"] == 1
+    db.expire_all()
+    assert db.get(ResumeBlob, orphan) is None and not os.path.exists(paths[orphan])
+    assert db.get(ResumeBlob, expired) is None and not os.path.exists(paths[expired])
+    # The expired blob's activity keeps its row but loses the file link
+    assert db.query(UserActivity).filter(UserActivity.file_hash == expired).count() == 0
+    assert os.path.exists(paths[fresh_orphan]) and os.path.exists(paths[live])
+
+def test_dry_run_reports_what_a_real_sweep_removes(db, monkeypatch):
+    for i in range(5):
+        stored(db, f"orphan {i}".encode(), refs=0, last_used_days=2 + i)
+    for i in range(3):
+        stored(db, f"old {i}".encode(), refs=1, last_used_days=upload_retention.MAX_AGE_DAYS + 1 + i)
+    for i in range(3):
+        stored(db, f"big {i}".encode() * 100, refs=1, last_used_days=i)
+    # 1500 bytes stay after the orphans and expired blobs: the two least recently used go next
+    monkeypatch.setattr(upload_retention, "MAX_BYTES", 600)
+
+    dry = run_retention(dry_run=True, now=NOW)
+    assert db.query(ResumeBlob).count() == 11
+    real = run_retention(now=NOW)
+
+    for key in ("files_deleted", "bytes_reclaimed", "orphans", "expired", "over_budget"):
+        assert dry[key] == real[key], key
+    assert (real["orphans"], real["expired"], real["over_budget"]) == (5, 3, 2)
+
+def test_archives_old_blobs_outside_the_public_upload_dir(db, monkeypatch):
+    monkeypatch.setattr(upload_retention, "ARCHIVE_AFTER_DAYS", 30)
+    old = [stored(db, f"old resume {i}".encode(), refs=1, last_used_days=60, created=datetime(2026, 1, 10))
+           for i in range(3)]
+    recent = stored(db, b"recent resume", refs=1, last_used_days=1)
+
+    assert run_retention(dry_run=True, now=NOW)["archived"] == 3
+    report = run_retention(now=NOW)
+    assert report["archived"] == 3
+
+    db.expire_all()
+    for i, sha in enumerate(old):
+        blob = db.get(ResumeBlob, sha)
+        assert blob.archive_path == "2026-01.zip"
+        assert not os.path.exists(blob_abs_path(blob.rel_path))
+        assert _read_archived(blob) == f"old resume {i}".encode()
+    assert os.path.dirname(archive_abs_path("2026-01.zip")) == ARCHIVE_DIR
+    assert not os.path.abspath(ARCHIVE_DIR).startswith(os.path.abspath(UPLOAD_DIR) + os.sep)
+    assert db.get(ResumeBlob, recent).archive_path is None
+
+def test_moves_zips_left_in_the_public_upload_dir(db):
+    sha = stored(db, b"legacy archived", refs=1)
+    legacy_dir = os.path.join(UPLOAD_DIR, upload_retention.LEGACY_ARCHIVE_SUBDIR)
+    os.makedirs(legacy_dir)
+    with zipfile.ZipFile(os.path.join(legacy_dir, "2025-12.zip"), "w") as zf:
+        zf.writestr(sha, b"legacy archived")
+    blob = db.get(ResumeBlob, sha)
+    os.unlink(blob_abs_path(blob.rel_path))
+    blob.archive_path = "archive/2025-12.zip"
+    db.commit()
+
+    run_retention(now=NOW)
+
+    db.expire_all()
+    blob = db.get(ResumeBlob, sha)
+    assert blob.archive_path == "2025-12.zip"
+    assert not os.path.exists(legacy_dir)
+    assert _read_archived(blob) == b"legacy archived"
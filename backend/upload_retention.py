@@ -0,0 +1,325 @@
+"""
+Retention / compaction for the uploads directory.
+
+One sweep, in order:
+  1. orphans   - blobs with ref_count 0 untouched for RETENTION_ORPHAN_GRACE_HOURS (covers
+                 analytics resets and debounced duplicate uploads)
+  2. expired   - blobs not used for RETENTION_MAX_AGE_DAYS (their activities keep the text
+                 details but lose the file link)
+  3. budget    - least recently used blobs until the store fits RETENTION_MAX_BYTES
+  4. legacy    - flat uploads/<timestamp>_<name> files older than RETENTION_MAX_AGE_DAYS
+  5. archive   - (RETENTION_ARCHIVE_AFTER_DAYS > 0) resumes not used for that long are
+                 deflated into RETENTION_ARCHIVE_DIR/<YYYY-MM>.zip (outside UPLOAD_DIR, so never
+                 publicly served; members are read back through resume_files) and their loose
+                 file removed; a zip is deleted once no blob row points into it any more
+
+Work is done RETENTION_BATCH_SIZE rows per transaction. File I/O is throttled to
+RETENTION_IO_BYTES_PER_SEC so sweeps don't compete with live uploads. The row is deleted
+first (guarded on the same condition it was selected by) and the file only afterwards,
+so a blob that gets re-referenced mid-sweep is left alone. A dry run pages through every
+batch without touching anything, so its counts match what a real sweep would remove.
+
+Runs on its own schedule, independent of the job refresh: in-process every
+RETENTION_INTERVAL seconds when RETENTION_SCHEDULER=inprocess (defaults to JOB_SCHEDULER;
+enable it on ONE worker), or as a standalone worker.
+
+CLI:
+    python upload_retention.py [--dry-run]    # one sweep
+    python upload_retention.py --loop         # sweep every RETENTION_INTERVAL seconds
+"""
+import os
+import re
+import shutil
+import threading
+import time
+import zipfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, update
+
+from blob_store import UPLOAD_DIR, ARCHIVE_DIR, blob_abs_path, archive_abs_path
+from database import SessionLocal, ResumeBlob, UserActivity, SystemLog
+from partitions import archives
+
+MAX_AGE_DAYS = int(os.getenv("RETENTION_MAX_AGE_DAYS", "180"))
+MAX_BYTES = int(os.getenv("RETENTION_MAX_BYTES", str(2 * 1024 ** 3)))
+ORPHAN_GRACE_HOURS = float(os.getenv("RETENTION_ORPHAN_GRACE_HOURS", "1"))
+ARCHIVE_AFTER_DAYS = int(os.getenv("RETENTION_ARCHIVE_AFTER_DAYS", "0")) # 0 = never compress
+IO_BYTES_PER_SEC = int(os.getenv("RETENTION_IO_BYTES_PER_SEC", str(8 * 1024 ** 2)))
+BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "500"))
+RETENTION_INTERVAL = int(os.getenv("RETENTION_INTERVAL", "3600")) # seconds
+LEGACY_ARCHIVE_SUBDIR = "archive" # uploads/archive/, where zips used to be written
+
+
+class IOThrottle:
+    """Token bucket over bytes touched; sleeps when the sweep gets ahead of its budget."""
+
+    def __init__(self, bytes_per_sec=IO_BYTES_PER_SEC):
+        self.rate = bytes_per_sec
+        self.started = time.monotonic()
+        self.spent = 0
+
+    def consume(self, n):
+        if self.rate <= 0:
+            return
+        self.spent += n
+        ahead = self.spent / self.rate - (time.monotonic() - self.started)
+        if ahead > 0:
+            time.sleep(ahead)
+
+
+def _remove_file(path, throttle, report, dry_run):
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return
+    if not dry_run:
+        try:
+            os.unlink(path)
+        except OSError as e:
+            print(f"Retention: could not delete {path}: {e}")
+            return
+    report["files_deleted"] += 1
+    report["bytes_reclaimed"] += size
+    throttle.consume(size)
+
+def _delete_blobs(db, condition, order_by, throttle, report, dry_run, limit=None, counted=None):
+    """
+    Delete blob rows matching condition (batched), then their files. Returns bytes freed.
+    A dry run pages with an offset (nothing is deleted) and skips the blobs in `counted`,
+    the ones an earlier phase of the same dry run already reported.
+    """
+    freed = 0
+    offset = 0
+    while limit is None or freed < limit:
+        query = db.query(ResumeBlob).filter(condition).order_by(order_by, ResumeBlob.sha256)
+        batch = query.offset(offset).limit(BATCH_SIZE).all() if dry_run else query.limit(BATCH_SIZE).all()
+        if not batch:
+            break
+        full_batch = len(batch) == BATCH_SIZE
+        offset += len(batch)
+        if dry_run and counted is not None:
+            batch = [blob for blob in batch if blob.sha256 not in counted]
+            counted.update(blob.sha256 for blob in batch)
+        if limit is not None:
+            # Only take as many LRU blobs as needed to get under budget
+            picked, running = [], freed
+            for blob in batch:
+                if running >= limit:
+                    break
+                picked.append(blob)
+                running += blob.size or 0
+            batch = picked
+
+        # Plain tuples: the ORM rows are gone (expired and deleted) once the batch commits
+        removed = []
+        for blob in batch:
+            snapshot = (blob.sha256, blob.size or 0, blob.rel_path, blob.archive_path)
+            if dry_run:
+                removed.append(snapshot)
+                continue
+            deleted = db.query(ResumeBlob).filter(ResumeBlob.sha256 == blob.sha256, condition).delete(synchronize_session=False)
+            if deleted:
+                removed.append(snapshot)
+        if not dry_run:
+            hashes = [sha for sha, _, _, _ in removed]
+            if hashes:
+                db.query(UserActivity).filter(UserActivity.file_hash.in_(hashes)).update(
+                    {UserActivity.file_hash: None}, synchronize_session=False)
+                for table in archives(db, "user_activities", streams=("events",)): # SQLite archived months
+                    db.execute(update(table).where(table.c.file_hash.in_(hashes)).values(file_hash=None))
+            db.commit()
+
+        for sha, size, rel_path, archive_path in removed:
+            freed += size
+            if archive_path:
+                report["archived_entries_dropped"] += 1 # zip is removed once none of its members are referenced
+            else:
+                _remove_file(blob_abs_path(rel_path), throttle, report, dry_run)
+        if not full_batch:
+            break
+    return freed
+
+
+_LEGACY_NAME = re.compile(r"^\d{14}_.+")
+
+def _sweep_legacy(cutoff, throttle, report, dry_run):
+    try:
+        names = os.listdir(UPLOAD_DIR)
+    except FileNotFoundError:
+        return
+    cutoff_ts = (cutoff - datetime(1970, 1, 1)).total_seconds()
+    for name in names:
+        path = os.path.join(UPLOAD_DIR, name)
+        if _LEGACY_NAME.match(name) and os.path.isfile(path) and os.path.getmtime(path) < cutoff_ts:
+            _remove_file(path, throttle, report, dry_run)
+            report["legacy_deleted"] += 1
+
+def _archive_old(db, cutoff, throttle, report, dry_run, counted=None):
+    pending = db.query(ResumeBlob).filter(ResumeBlob.archive_path.is_(None), ResumeBlob.last_used_at < cutoff)
+    if dry_run:
+        counted = counted or set()
+        report["archived"] += sum(1 for (sha,) in pending.with_entities(ResumeBlob.sha256) if sha not in counted)
+        return
+    while True:
+        batch = pending.order_by(ResumeBlob.last_used_at).limit(BATCH_SIZE).all()
+        if not batch:
+            return
+        by_month = {}
+        for blob in batch:
+            by_month.setdefault((blob.created_at or datetime.utcnow()).strftime("%Y-%m"), []).append(blob)
+
+        os.makedirs(ARCHIVE_DIR, exist_ok=True)
+        for month, blobs in by_month.items():
+            rel_zip = f"{month}.zip"
+            with zipfile.ZipFile(archive_abs_path(rel_zip), "a", compression=zipfile.ZIP_DEFLATED) as zf:
+                existing = set(zf.namelist())
+                for blob in blobs:
+                    src = blob_abs_path(blob.rel_path)
+                    if blob.sha256 not in existing and os.path.exists(src):
+                        zf.write(src, arcname=blob.sha256)
+                        throttle.consume(blob.size or 0)
+            for blob in blobs:
+                blob.archive_path = rel_zip
+            db.commit()
+            for blob in blobs:
+                src = blob_abs_path(blob.rel_path)
+                if os.path.exists(src):
+                    os.unlink(src)
+                    report["bytes_reclaimed"] += blob.size or 0
+                report["archived"] += 1
+        if len(batch) < BATCH_SIZE:
+            return
+
+
+def _move_public_archives(db):
+    """Zips used to live in uploads/archive/, inside the public /uploads mount: move them to ARCHIVE_DIR."""
+    legacy_dir = os.path.join(UPLOAD_DIR, LEGACY_ARCHIVE_SUBDIR)
+    if not os.path.isdir(legacy_dir):
+        return
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    for name in os.listdir(legacy_dir):
+        if name.endswith(".zip"):
+            shutil.move(os.path.join(legacy_dir, name), archive_abs_path(name))
+            db.query(ResumeBlob).filter(ResumeBlob.archive_path == f"{LEGACY_ARCHIVE_SUBDIR}/{name}").update(
+                {ResumeBlob.archive_path: name}, synchronize_session=False)
+            db.commit()
+    try:
+        os.rmdir(legacy_dir)
+    except OSError as e:
+        print(f"Retention: could not remove {legacy_dir}: {e}")
+
+def _drop_unused_archives(db, throttle, report, dry_run):
+    if not os.path.isdir(ARCHIVE_DIR):
+        return
+    in_use = {p for (p,) in db.query(ResumeBlob.archive_path).filter(ResumeBlob.archive_path.isnot(None)).distinct()}
+    for name in os.listdir(ARCHIVE_DIR):
+        if name.endswith(".zip") and name not in in_use:
+            _remove_file(archive_abs_path(name), throttle, report, dry_run)
+
+def run_retention(dry_run=False, now=None) -> dict:
+    now = now or datetime.utcnow()
+    throttle = IOThrottle()
+    report = {"files_deleted": 0, "bytes_reclaimed": 0, "orphans": 0, "expired": 0, "over_budget": 0,
+              "legacy_deleted": 0, "archived": 0, "archived_entries_dropped": 0, "dry_run": dry_run}
+    started = time.perf_counter()
+    db = SessionLocal()
+    counted = set() if dry_run else None # blobs a dry run already reported in an earlier phase
+    try:
+        if not dry_run:
+            _move_public_archives(db)
+
+        before = report["files_deleted"]
+        _delete_blobs(db, (ResumeBlob.ref_count <= 0) & (ResumeBlob.last_used_at < now - timedelta(hours=ORPHAN_GRACE_HOURS)),
+                      ResumeBlob.last_used_at, throttle, report, dry_run, counted=counted)
+        report["orphans"] = report["files_deleted"] - before
+
+        before = report["files_deleted"]
+        expiry = now - timedelta(days=MAX_AGE_DAYS)
+        _delete_blobs(db, ResumeBlob.last_used_at < expiry, ResumeBlob.last_used_at, throttle, report, dry_run, counted=counted)
+        report["expired"] = report["files_deleted"] - before
+
+        loose_bytes = db.query(func.coalesce(func.sum(ResumeBlob.size), 0)).filter(ResumeBlob.archive_path.is_(None)).scalar()
+        if dry_run:
+            loose_bytes -= report["bytes_reclaimed"] # what the earlier phases would have freed
+        if loose_bytes > MAX_BYTES:
+            before = report["files_deleted"]
+            _delete_blobs(db, ResumeBlob.archive_path.is_(None), ResumeBlob.last_used_at, throttle, report, dry_run,
+                          limit=loose_bytes - MAX_BYTES, counted=counted)
+            report["over_budget"] = report["files_deleted"] - before
+
+        _sweep_legacy(expiry, throttle, report, dry_run)
+        if ARCHIVE_AFTER_DAYS > 0:
+            _archive_old(db, now - timedelta(days=ARCHIVE_AFTER_DAYS), throttle, report, dry_run, counted=counted)
+        _drop_unused_archives(db, throttle, report, dry_run)
+
+        report["seconds"] = round(time.perf_counter() - started, 3)
+        if not dry_run and (report["files_deleted"] or report["archived"]):
+            mb = report["bytes_reclaimed"] / 1024 ** 2
+            db.add(SystemLog(level="SYSTEM", timestamp=datetime.utcnow(),
+                             message=f"Upload retention: {report['files_deleted']} files deleted, {report['archived']} archived, {mb:.1f} MB reclaimed"))
+            db.commit()
+    finally:
+        db.close()
+    return report
+
+
+# --- SCHEDULER ---
+
+class RetentionScheduler(threading.Thread):
+    def __init__(self, interval=RETENTION_INTERVAL):
+        super().__init__(name="upload-retention", daemon=True)
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                report = run_retention()
+                print(f"Upload retention sweep done: {report}")
+            except Exception as e:
+                print(f"Upload retention sweep failed: {e}")
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+
+_scheduler = None
+
+def start_in_process_retention():
+    global _scheduler
+    mode = os.getenv("RETENTION_SCHEDULER", os.getenv("JOB_SCHEDULER", ""))
+    if mode.lower() != "inprocess" or _scheduler is not None:
+        return None
+    _scheduler = RetentionScheduler()
+    _scheduler.start()
+    return _scheduler
+
+def stop_in_process_retention():
+    global _scheduler
+    if _scheduler is not None:
+        _scheduler.stop()
+        _scheduler = None
+
+
+if __name__ == "__main__":
+    import argparse
+    from database import init_db
+
+    parser = argparse.ArgumentParser(description="Sweep orphaned/expired resume uploads.")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be removed without deleting")
+    parser.add_argument("--loop", action="store_true", help="Keep sweeping every --interval seconds")
+    parser.add_argument("--interval", type=int, default=RETENTION_INTERVAL)
+    args = parser.parse_args()
+
+    init_db()
+    if not args.loop:
+        print(run_retention(dry_run=args.dry_run))
+    else:
+        scheduler = RetentionScheduler(args.interval)
+        scheduler.start()
+        try:
+            while scheduler.is_alive():
+                scheduler.join(1)
+        except KeyboardInterrupt:
+            scheduler.stop()
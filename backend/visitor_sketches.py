@@ -0,0 +1,251 @@
+"""
+Daily unique visitors, materialized: the analytics graph and DAU / WAU / MAU.
+
+Every UTC day has an exact bitmap over user ids (bit 0 stands for all guests, which the
+graph always counted as a single "Guest" visitor), stored zlib-compressed in
+daily_visitors. A range (week, month, year, any start..end) is the OR of its days'
+bitmaps, so it costs O(days) and never touches user_activities. Admins are excluded at
+query time by clearing the bits of users with role 'admin', so a role change applies to
+history as well.
+
+Visits are buffered per day by the worker that logged them and OR-ed into the stored
+rows every VISITORS_FLUSH_SECONDS by VisitorFlusher; queries include the buffer. OR is
+idempotent, so a failed flush (e.g. two workers creating the same day) is just retried.
+Days before yesterday no longer change and are kept decompressed in the cache.
+
+The table is backfilled from the visit log on startup if it is empty; rebuild it by hand
+with `python visitor_sketches.py --rebuild`.
+"""
+import argparse
+import os
+import threading
+import zlib
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from activity_columns import scan
+from cache import get_cache, MB
+from database import SessionLocal, DailyVisitors, User
+
+FLUSH_SECONDS = float(os.getenv("VISITORS_FLUSH_SECONDS", "30"))
+GUEST = 0
+
+_BIT_COUNTS = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+_EMPTY = np.zeros(0, np.uint8)
+
+closed_days = get_cache("visitor_bitmaps", ttl=3600, max_bytes=64 * MB)
+
+
+# --- BITMAPS (np.uint8, little-endian bit order) ---
+
+def to_bitmap(keys):
+    keys = np.asarray(keys, dtype=np.int64)
+    if not len(keys):
+        return _EMPTY
+    bits = np.zeros(int(keys.max()) + 1, dtype=bool)
+    bits[keys] = True
+    return np.packbits(bits, bitorder="little")
+
+def union(a, b):
+    if len(a) < len(b):
+        a, b = b, a
+    out = a.copy()
+    out[:len(b)] |= b
+    return out
+
+def without(bitmap, ids):
+    """Copy of bitmap with the bits of ids cleared."""
+    out = bitmap.copy()
+    ids = np.asarray(ids, dtype=np.int64)
+    ids = ids[(ids >> 3) < len(out)]
+    np.bitwise_and.at(out, ids >> 3, ~np.left_shift(1, ids & 7).astype(np.uint8))
+    return out
+
+def popcount(bitmap):
+    return int(_BIT_COUNTS[bitmap].sum())
+
+def _pack(bitmap):
+    return zlib.compress(bitmap.tobytes())
+
+def _unpack(blob):
+    return np.frombuffer(zlib.decompress(blob), dtype=np.uint8).copy() if blob else _EMPTY
+
+def visitor_key(user_id):
+    return user_id if user_id and user_id > 0 else GUEST
+
+
+# --- STORE ---
+
+class VisitorSketches:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {} # date -> set of visitor keys not written yet
+        self._flusher = None
+
+    def record(self, user_id, ts=None):
+        day = (ts or datetime.utcnow()).date()
+        with self._lock:
+            self._pending.setdefault(day, set()).add(visitor_key(user_id))
+
+    # --- writes ---
+
+    def _merge(self, db, day, bitmap):
+        row = db.query(DailyVisitors).filter(DailyVisitors.day == day).with_for_update().first()
+        if row is None:
+            db.add(DailyVisitors(day=day, bitmap=_pack(bitmap), visitors=popcount(bitmap)))
+            return
+        bitmap = union(_unpack(row.bitmap), bitmap)
+        row.bitmap, row.visitors, row.updated_at = _pack(bitmap), popcount(bitmap), datetime.utcnow()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        db = SessionLocal()
+        try:
+            for day, keys in pending.items():
+                self._merge(db, day, to_bitmap(list(keys)))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Visitor sketch flush failed: {e}")
+            with self._lock:
+                for day, keys in pending.items():
+                    self._pending.setdefault(day, set()).update(keys)
+            return 0
+        finally:
+            db.close()
+        for day in pending:
+            closed_days.delete(day)
+        return sum(len(keys) for keys in pending.values())
+
+    def rebuild(self, db, since=None):
+        """(Re)build the bitmaps of every day with visits (from `since`) out of the visit log."""
+        days = {}
+        for cols in scan(db, since=since, types=["visit"]):
+            # Group the chunk by day: sort once, split at the day boundaries
+            order = np.argsort(cols["ts"], kind="stable")
+            day_of = cols["ts"][order].astype("datetime64[D]")
+            keys = np.where(cols["user"] > 0, cols["user"], GUEST)[order]
+            unique_days, starts = np.unique(day_of, return_index=True)
+            for day, day_keys in zip(unique_days.astype(datetime), np.split(keys, starts[1:])):
+                days[day] = union(days.get(day, _EMPTY), to_bitmap(day_keys))
+        query = db.query(DailyVisitors)
+        if since is not None:
+            query = query.filter(DailyVisitors.day >= since.date())
+        query.delete(synchronize_session=False)
+        for day, bitmap in days.items():
+            db.add(DailyVisitors(day=day, bitmap=_pack(bitmap), visitors=popcount(bitmap)))
+        db.commit()
+        closed_days.clear()
+        return len(days)
+
+    def reset(self):
+        with self._lock:
+            self._pending = {}
+        closed_days.clear()
+
+    # --- reads ---
+
+    def _bitmaps(self, db, start, end):
+        """[(day, bitmap)] for every day in [start, end]: stored rows plus this worker's buffer."""
+        days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+        settled = datetime.utcnow().date() - timedelta(days=1) # later days can still receive flushes
+        bitmaps = {day: closed_days.get(day) for day in days if day < settled}
+        missing = [day for day in days if bitmaps.get(day) is None]
+        if missing:
+            rows = dict(db.query(DailyVisitors.day, DailyVisitors.bitmap).filter(
+                DailyVisitors.day >= missing[0], DailyVisitors.day <= missing[-1]).all())
+            for day in missing:
+                bitmaps[day] = _unpack(rows.get(day))
+                if day < settled:
+                    closed_days.set(day, bitmaps[day])
+        with self._lock:
+            pending = {day: list(keys) for day, keys in self._pending.items() if start <= day <= end}
+        for day, keys in pending.items():
+            bitmaps[day] = union(bitmaps[day], to_bitmap(keys))
+        return [(day, bitmaps[day]) for day in days]
+
+    def _admins(self, db):
+        return [user_id for (user_id,) in db.query(User.id).filter(User.role == "admin")]
+
+    def daily(self, db, start, end):
+        """[(day, distinct non-admin visitors)] for start..end inclusive."""
+        admins = self._admins(db)
+        return [(day, popcount(without(bitmap, admins))) for day, bitmap in self._bitmaps(db, start, end)]
+
+    def unique(self, db, start, end):
+        """Distinct non-admin visitors over start..end inclusive."""
+        merged = _EMPTY
+        for _, bitmap in self._bitmaps(db, start, end):
+            merged = union(merged, bitmap)
+        return popcount(without(merged, self._admins(db)))
+
+    def active_users(self, db, today=None):
+        today = today or datetime.utcnow().date()
+        return {"dau": self.unique(db, today, today),
+                "wau": self.unique(db, today - timedelta(days=6), today),
+                "mau": self.unique(db, today - timedelta(days=29), today)}
+
+    # --- lifecycle ---
+
+    def start(self):
+        if self._flusher is not None:
+            return
+        db = SessionLocal()
+        try:
+            if db.query(DailyVisitors).first() is None:
+                built = self.rebuild(db)
+                if built:
+                    print(f"Visitor sketches: backfilled {built} days from the visit log")
+        except Exception as e:
+            db.rollback()
+            print(f"Visitor sketch backfill failed: {e}") # another worker got there first
+        finally:
+            db.close()
+        self._flusher = VisitorFlusher(self)
+        self._flusher.start()
+
+    def stop(self):
+        if self._flusher is not None:
+            self._flusher.stop()
+            self._flusher = None
+        self.flush()
+
+
+class VisitorFlusher(threading.Thread):
+    def __init__(self, sketches, interval=FLUSH_SECONDS):
+        super().__init__(name="visitor-flush", daemon=True)
+        self.sketches = sketches
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.sketches.flush()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join(timeout=5)
+
+
+visitor_sketches = VisitorSketches()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the daily visitor bitmaps from the visit log.")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild (all days, or from --since)")
+    parser.add_argument("--since", help="YYYY-MM-DD: only rebuild this day onwards")
+    args = parser.parse_args()
+    if not args.rebuild:
+        parser.error("nothing to do; pass --rebuild")
+    from database import init_db
+    init_db()
+    session = SessionLocal()
+    try:
+        since = datetime.strptime(args.since, "%Y-%m-%d") if args.since else None
+        print(f"Rebuilt {visitor_sketches.rebuild(session, since)} days")
+    finally:
+        session.close()
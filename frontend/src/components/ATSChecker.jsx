@@ -1,9 +1,10 @@
-import React, { useState } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 
 const ATSChecker = () => {
     const [resumeFile, setResumeFile] = useState(null);
     const [resumeText, setResumeText] = useState(''); // Text extracted from resume
+    const [documentId, setDocumentId] = useState(null); // Server-side handle to the parsed resume
     const [jobDescription, setJobDescription] = useState('');
     const [result, setResult] = useState(null);
     const [loading, setLoading] = useState(false);
@@ -11,6 +12,22 @@ const ATSChecker = () => {
 
     const [error, setError] = useState('');
 
+    // ATS session: after the first check the server keeps the n-gram counts, and edits to the JD
+    // send only the changed paragraphs (re-scored when typing pauses)
+    const session = useRef(null); // { id, blocks: JD paragraphs the server has }
+
+    const splitBlocks = (text) => text.split(/\n\s*\n/);
+
+    // Common prefix/suffix trim: the paragraphs [start, end) of the old list are replaced by `blocks`
+    const diffBlocks = (oldBlocks, newBlocks) => {
+        let start = 0;
+        while (start < oldBlocks.length && start < newBlocks.length && oldBlocks[start] === newBlocks[start]) start++;
+        let tail = 0;
+        while (tail < oldBlocks.length - start && tail < newBlocks.length - start
+               && oldBlocks[oldBlocks.length - 1 - tail] === newBlocks[newBlocks.length - 1 - tail]) tail++;
+        return { start, end: oldBlocks.length - tail, blocks: newBlocks.slice(start, newBlocks.length - tail) };
+    };
+
     const handleResumeUpload = async (e) => {
         const file = e.target.files[0];
         if (!file) return;
@@ -38,6 +55,8 @@ const ATSChecker = () => {
         try {
             const response = await axios.post('/scan-resume', formData);
              setResumeText(response.data.text_preview); 
+             setDocumentId(response.data.document_id);
+             session.current = null; // new resume: the next check starts a new session
         } catch (err) {
             console.error(err);
             const backendMsg = err.response?.data?.detail;
@@ -66,22 +85,55 @@ const ATSChecker = () => {
             const storedUser = localStorage.getItem('user');
             const userData = storedUser ? JSON.parse(storedUser) : {};
 
-            const response = await axios.post('/ats_check', {
-                resume_text: resumeText,
+            // The server already has the full parsed resume; only send the text if there is no handle
+            const response = await axios.post('/ats/session', {
+                ...(documentId ? { document_id: documentId } : { resume_text: resumeText }),
                 job_description: cleanedJD,
                 user_id: userData.id,
                 user_name: userData.full_name,
                 user_email: userData.email
             });
+            session.current = { id: response.data.session_id, blocks: splitBlocks(cleanedJD) };
             setResult(response.data);
         } catch (err) {
             console.error(err);
-            setError("Analysis failed. Please try again.");
+            if (err.response?.status === 410) {
+                // Handle expired: the resume has to be uploaded again
+                setResumeFile(null); setResumeText(''); setDocumentId(null); session.current = null;
+                setError(err.response.data.detail);
+            } else {
+                setError("Analysis failed. Please try again.");
+            }
         } finally {
             setLoading(false);
         }
     };
 
+    // Live re-score: once a session exists, send the changed JD paragraphs 600ms after typing stops
+    useEffect(() => {
+        const current = session.current;
+        const cleanedJD = jobDescription.trim();
+        if (!current || cleanedJD.length < 3) return;
+        const timer = setTimeout(() => {
+            // Queued per session so each edit is diffed against what the server already applied
+            current.queue = (current.queue || Promise.resolve()).then(async () => {
+                if (session.current !== current) return;
+                const newBlocks = splitBlocks(cleanedJD);
+                const edit = diffBlocks(current.blocks, newBlocks);
+                if (edit.start === edit.end && edit.blocks.length === 0) return;
+                try {
+                    const response = await axios.patch(`/ats/session/${current.id}`, { job_description_edits: [edit] });
+                    current.blocks = newBlocks;
+                    if (session.current === current) setResult(response.data);
+                } catch (err) {
+                    // Expired or served by another worker: the next "Calculate" starts a new session
+                    if (session.current === current) session.current = null;
+                }
+            });
+        }, 600);
+        return () => clearTimeout(timer);
+    }, [jobDescription]);
+
     return (
         <div className="max-w-4xl mx-auto p-2 md:p-6 text-white animate-fade-in-up w-full overflow-hidden">
             <h2 className="text-2xl md:text-3xl font-bold mb-6 md:mb-8 text-center bg-gradient-to-r from-pink-400 to-orange-400 bg-clip-text text-transparent px-4">
@@ -112,7 +164,7 @@ const ATSChecker = () => {
                             </label>
                             {resumeFile && (
                                 <button 
-                                    onClick={() => { setResumeFile(null); setResumeText(''); }}
+                                    onClick={() => { setResumeFile(null); setResumeText(''); setDocumentId(null); session.current = null; }}
                                     className="text-xs text-red-400 hover:text-red-300 transition-colors"
                                 >
                                     Remove
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 import { motion, AnimatePresence } from 'framer-motion';
 import { 
@@ -75,6 +75,11 @@ const AdminDashboard = ({ user, setPage, setUser }) => {
     const [replyForm, setReplyForm] = useState({ subject: '', content: '' });
     const [replyStatus, setReplyStatus] = useState('');
 
+    // Snapshot poll state: section versions we hold and the last ETag
+    const snapshotVersions = useRef({});
+    const snapshotEtag = useRef(null);
+    const rawUsers = useRef([]);
+
     useEffect(() => {
         // Security Check
         if (!user || user.role !== 'admin') {
@@ -83,23 +88,41 @@ const AdminDashboard = ({ user, setPage, setUser }) => {
         }
 
         fetchData();
-        // Poll for live status every 5 seconds (Real-time feel)
-        const interval = setInterval(fetchData, 5000);
-        return () => clearInterval(interval);
+        // Live updates: the server pushes an event on every admin-visible write and we fetch the
+        // changed sections (debounced). 'resync' means we fell behind; reconnects refetch too.
+        let pending = null;
+        const scheduleFetch = () => {
+            if (pending) return;
+            pending = setTimeout(() => { pending = null; fetchData(); }, 300);
+        };
+        const events = new EventSource('/admin/events');
+        events.onopen = scheduleFetch;
+        events.onmessage = scheduleFetch;
+        ['log', 'activity', 'message', 'user', 'job', 'resync'].forEach(type => events.addEventListener(type, scheduleFetch));
+        // Slow poll for what has no event: online status / active users move with heartbeats
+        const interval = setInterval(fetchData, 30000);
+        return () => {
+            events.close();
+            clearInterval(interval);
+            if (pending) clearTimeout(pending);
+        };
     }, [user]);
 
     const fetchData = async () => {
         try {
-            // Unpack responses
-            const [statsRes, usersRes, deletedUsersRes, jobsRes, logsRes, msgsRes, analyticsRes] = await Promise.all([
-                axios.get('/admin/stats'),
-                axios.get('/admin/users'),
-                axios.get('/admin/users/deleted'),
-                axios.get('/admin/jobs'),
-                axios.get('/admin/logs'),
-                axios.get('/admin/messages'),
-                axios.get('/admin/analytics')
-            ]);
+            // One request for the whole dashboard; only sections that changed since our versions are sent
+            const versions = Object.entries(snapshotVersions.current).map(([name, v]) => `${name}:${v}`).join(',');
+            const res = await axios.get('/admin/snapshot', {
+                params: versions ? { versions } : {},
+                headers: snapshotEtag.current ? { 'If-None-Match': snapshotEtag.current } : {},
+                validateStatus: (s) => s === 200 || s === 304
+            });
+            let sections = {}; // 304: nothing changed
+            if (res.status === 200) {
+                snapshotEtag.current = res.headers['etag'] || null;
+                snapshotVersions.current = res.data.versions;
+                sections = res.data.sections;
+            }
             
             // HELPER: Format UTC Date to Local string correctly
             // HELPER: Format UTC Date to India Standard Time (IST)
@@ -128,17 +151,21 @@ const AdminDashboard = ({ user, setPage, setUser }) => {
                 });
             };
 
-            setStats(statsRes.data);
-            setUsers(processUsers(usersRes.data));
+            if (sections.stats) setStats(sections.stats);
+            // Re-processed on every tick, even when unchanged: 'is_online' depends on the current time
+            if (sections.users) rawUsers.current = sections.users;
+            setUsers(processUsers(rawUsers.current));
             
             // Ensure deleted users are sorted DESC by deletion/active date
-            const sortedDeleted = [...deletedUsersRes.data].sort((a,b) => new Date(b.deleted_at || 0) - new Date(a.deleted_at || 0));
-            setDeletedUsers(sortedDeleted);
+            if (sections.deleted_users) {
+                const sortedDeleted = [...sections.deleted_users].sort((a,b) => new Date(b.deleted_at || 0) - new Date(a.deleted_at || 0));
+                setDeletedUsers(sortedDeleted);
+            }
             
-            setJobs(jobsRes.data);
-            setLogs(logsRes.data);
-            setMessages(msgsRes.data);
-            setAnalytics(analyticsRes.data); // Set Analytics
+            if (sections.jobs) setJobs(sections.jobs);
+            if (sections.logs) setLogs(sections.logs);
+            if (sections.messages) setMessages(sections.messages);
+            if (sections.analytics) setAnalytics(sections.analytics); // Set Analytics
             
             return { formatDate }; 
             
@@ -104,22 +104,8 @@ const AIInterviewMode = ({ onBack }) => {
             // First Validated Scan (checks if resume)
             const scanRes = await axios.post('/scan-resume', formData);
             
-            // Generate Questions
-            // Note: scan-resume returns skills. We need text for better questions but `scan-resume` only returns preview.
-            // Let's pass the text preview or raw extraction if possible. 
-            // Actually, we can use the `scanRes.text_preview` but that's truncated.
-            // Better: The new `/interview/generate` endpoint expects text.
-            // We'll trust the scan for now and maybe send the text preview or mock based on skills.
-            // IMPROVEMENT: Let's extract full text in frontend? No, backend.
-            // Let's call `/interview/generate` with the preview text (it's 500 chars, usually enough for context) + skills.
-            // Or better: The backend `scan_resume` validates it. We can just pass the preview text.
-            // To do it properly, we really should extract full text. 
-            // But for now, let's use the skills list to generate questions if text is short.
-            
-            const skillsStr = scanRes.data.extracted_skills.join(", ");
-            const promptText = `I have experience in ${skillsStr}. ` + scanRes.data.text_preview;
-
-            const qRes = await axios.post('/interview/generate', { resume_text: promptText });
+            // Generate Questions from the full parsed resume the server kept for this upload
+            const qRes = await axios.post('/interview/generate', { document_id: scanRes.data.document_id });
             setQuestions(qRes.data);
             setStage('interview');
             setInterviewActive(true);